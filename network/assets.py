@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.http import Http404, HttpResponse
+from django.templatetags.static import static
+from django.urls import reverse
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:  # optional: without it JavaScript gets the conservative built-in minifier below
+    rjsmin = None
+
+# Build and serving of the page's own static assets. `manage.py build_assets` minifies each file in
+# NETWORK_ASSETS, names it after its content hash, writes gzip (and brotli) variants next to it under
+# NETWORK_ASSET_ROOT and records the names in manifest.json. The {% asset %} tag links the hashed name,
+# and serve_asset answers with the smallest variant the browser accepts, cacheable for a year since the
+# name changes with the content. Unbuilt assets fall back to plain {% static %} URLs.
+
+MANIFEST_NAME = "manifest.json"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # in order of preference
+
+def asset_root():
+    return getattr(settings, "NETWORK_ASSET_ROOT", os.path.join(settings.BASE_DIR, "assets"))
+
+def minify_css(source):
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    return re.sub(r"\s*([{};,>])\s*", r"\1", source).replace(";}", "}").strip()
+
+def minify_js(source):
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    # line-based and conservative: drop indentation, blank lines and whole-line // comments, leaving lines
+    # inside template literals untouched
+    lines, in_template = [], False
+    for line in source.splitlines():
+        stripped = line if in_template else line.strip()
+        if in_template or (stripped and not stripped.startswith("//")):
+            lines.append(stripped)
+        in_template ^= len(re.findall(r"(?<!\\)`", line)) % 2 == 1
+    return "\n".join(lines) + "\n"
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+def hashed_name(name, content):
+    base, ext = os.path.splitext(name)
+    return f"{base}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+def build_assets():
+    # returns the manifest: source name -> hashed name, relative to asset_root()
+    root = asset_root()
+    manifest = {}
+    for name in getattr(settings, "NETWORK_ASSETS", []):
+        source_path = finders.find(name)
+        if source_path is None:
+            raise FileNotFoundError(f"Static asset {name} not found")
+        with open(source_path, encoding="utf-8") as f:
+            source = f.read()
+        minify = MINIFIERS.get(os.path.splitext(name)[1], lambda text: text)
+        content = minify(source).encode()
+
+        manifest[name] = hashed_name(name, content)
+        path = os.path.join(root, manifest[name])
+        write_file(path, content)
+        write_file(path + ".gz", gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            write_file(path + ".br", brotli.compress(content, quality=11))
+
+    write_file(os.path.join(root, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    load_manifest.cache_clear()
+    return manifest
+
+@lru_cache(maxsize=None)
+def load_manifest():
+    try:
+        with open(os.path.join(asset_root(), MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def asset_url(name):
+    hashed = load_manifest().get(name)
+    return reverse("serve_asset", args=[hashed]) if hashed else static(name)
+
+def accepted_encodings(header):
+    # content codings from an Accept-Encoding header, leaving out any refused with q=0
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = re.search(r"q=([0-9.]+)", params)
+        if coding and not (quality and float(quality.group(1)) == 0):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+def serve_asset(request, name):
+    if name not in load_manifest().values():
+        raise Http404("Unknown asset")
+    path = os.path.join(asset_root(), name)
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    encoding = None
+    for coding, suffix in ENCODINGS:
+        if (coding in accepted or "*" in accepted) and os.path.exists(path + suffix):
+            encoding, path = coding, path + suffix
+            break
+    with open(path, "rb") as f:
+        response = HttpResponse(f.read(), content_type=mimetypes.guess_type(name)[0] or "application/octet-stream")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -0,0 +1,19 @@
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# network.urls with the read endpoints swapped for their async twins; included by project4.urls when
+# NETWORK_ASYNC_READS is set
+ASYNC_VIEWS = {
+    "get_posts": async_views.get_posts,
+    "get_profile": async_views.get_profile,
+    "get_follow_usernames": async_views.get_follow_usernames,
+    "stream_events": async_views.stream_events,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name) if pattern.name in ASYNC_VIEWS
+    else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,106 @@
+from functools import wraps
+
+from django.contrib.auth.decorators import login_required
+
+from . import events, follow_graph
+from .encoding import JsonResponse
+from .feed_cache import acached_feed_page
+from .models import User, Post
+from .timeline import afollowing_keys
+from .views import (conditional_feed, cursor_page, event_stream_response, follow_listing, follow_rows,
+                    following_page, parse_follow_page_params, parse_page_params, parse_ids, profile_dict)
+
+# Async twins of the read endpoints in network.views, routed by network.async_urls when NETWORK_ASYNC_READS
+# is set for serving under ASGI (project4/asgi.py). They use the async ORM and cache API so a request never
+# hops to a worker thread; the sync views stay in place for WSGI.
+
+def resolve_user(view):
+    # swap the lazy request.user for the user login_required already awaited, so sync helpers can read it
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+async def apaginate_posts(posts, page_params):
+    if "after" in page_params:
+        return cursor_page(*await posts.akeyset_page(page_params["after"], page_params["batch_size"]))
+    return await posts.aserialize_page(page_params["offset"], page_params["batch_size"])
+
+async def apaginate_following(user, page_params):
+    batch_size = page_params["batch_size"]
+    if "after" in page_params:
+        keys = await afollowing_keys(user, batch_size, after=page_params["after"])
+    else:
+        offset = page_params["offset"]
+        keys = (await afollowing_keys(user, offset+batch_size))[offset:]
+
+    serialized_posts = await Post.objects.filter(id__in=[post_id for _, post_id in keys]).aserialize_page(0, len(keys))
+    return following_page(keys, serialized_posts, page_params)
+
+@login_required
+@resolve_user
+async def get_follow_usernames(request,option):
+    try:
+        after, batch_size = parse_follow_page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = [row async for row in follow_rows(request.user, option, after, batch_size)]
+    return JsonResponse(follow_listing(rows, option, batch_size))
+
+@login_required
+@resolve_user
+@conditional_feed
+async def get_posts(request):
+    try:
+        page_params = parse_page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if request.GET.get('filter') == 'all-posts':
+        page = await acached_feed_page('all-posts', page_params, lambda: apaginate_posts(Post.objects.all(), page_params))
+        return JsonResponse(page, safe=False)
+
+    elif request.GET.get('filter') == 'my-posts':
+        posts = Post.objects.filter(poster = request.user)
+
+    elif request.GET.get('filter') == 'following':
+        return JsonResponse(await apaginate_following(request.user, page_params), safe=False)
+
+    elif request.GET.get('filter') == 'ids':
+        try:
+            ids = parse_ids(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse(await Post.objects.filter(id__in=ids).aserialize_page(0, len(ids)), safe=False)
+
+    else:
+        return JsonResponse({"error": "Invalid filter parameter"}, status=400)
+
+    return JsonResponse(await apaginate_posts(posts, page_params), safe=False)
+
+@login_required
+@resolve_user
+@conditional_feed
+async def get_profile(request,user_id):
+    try:
+        page_params = parse_page_params(request)
+        target_user = await User.objects.aget(id=user_id)
+    except User.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    post_page = await apaginate_posts(Post.objects.filter(poster = target_user), page_params)
+    viewer_follows = await request.user.following.filter(id=target_user.id).aexists()
+    mutual_count = await follow_graph.amutual_count(request.user.id, target_user.id)
+    return JsonResponse(profile_dict(request, target_user, post_page, viewer_follows, mutual_count))
+
+@login_required
+async def stream_events(request):
+    try:
+        watched = events.parse_watched(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return event_stream_response(events.astream(events.start_seq(request), watched))
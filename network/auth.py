@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import transaction
+
+from .feed_cache import shared
+
+# Authenticated-user resolution without a query per request: the User that AuthenticationMiddleware
+# resolves from the session is cached for the session's lifetime, when the cache is shared by the workers. network.signals drops the entry whenever
+# the row changes (saves, including password changes, and the follow counters) and on logout, so the
+# session hash check in django.contrib.auth.get_user still sees the current password.
+
+def user_cache():
+    return caches[getattr(settings, "NETWORK_AUTH_CACHE", "default")]
+
+def caching_users():
+    # a per-process cache would keep serving a logged-out or re-passworded user from the other workers
+    enabled = getattr(settings, "NETWORK_AUTH_CACHE_USERS", None)
+    if enabled is None:
+        return shared(user_cache())
+    return enabled
+
+def user_key(user_id):
+    return f"network:user:{user_id}"
+
+def forget_users(user_ids):
+    # now, and again on commit in case a request re-cached the pre-commit row in between
+    keys = [user_key(user_id) for user_id in user_ids]
+    user_cache().delete_many(keys)
+    transaction.on_commit(lambda: user_cache().delete_many(keys))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not caching_users():
+            return super().get_user(user_id)
+        cache = user_cache()
+        user = cache.get(user_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(user_key(user_id), user, settings.SESSION_COOKIE_AGE)
+        return user
@@ -0,0 +1,29 @@
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+# Retrying write transactions that lose the SQLite write lock. busy_timeout (settings.SQLITE_PRAGMAS) already
+# makes a writer wait for the lock; this covers the writers still waiting when it runs out under a burst.
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+def retry_on_lock(view):
+    # re-run the whole view, so its transaction starts over; only from the outermost level, as a lock error
+    # inside an enclosing atomic block has to roll that block back first
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        retries = getattr(settings, "NETWORK_WRITE_RETRIES", 3)
+        backoff = getattr(settings, "NETWORK_WRITE_RETRY_BACKOFF_MS", 50) / 1000
+        for attempt in range(retries + 1):
+            try:
+                return view(request, *args, **kwargs)
+            except OperationalError as error:
+                if attempt == retries or connection.in_atomic_block or not is_lock_error(error):
+                    raise
+                time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
@@ -0,0 +1,49 @@
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .metrics import track
+
+try:
+    import orjson
+except ImportError:  # optional: several times faster than the stdlib encoder, used whenever it is installed
+    orjson = None
+
+# JSON encoding for the API. Responses are encoded with orjson when available and with the same stdlib
+# encoder JsonResponse uses otherwise; long listings such as exports are streamed as a JSON array a chunk
+# of rows at a time instead of being built and encoded whole.
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class JsonResponse(HttpResponse):
+    # drop-in for django.http.JsonResponse that encodes with dumps()
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        kwargs.setdefault("content_type", "application/json")
+        with track("encode"):
+            content = dumps(data)
+        super().__init__(content=content, **kwargs)
+
+
+def json_array_chunks(rows, serialize, chunk_size):
+    # encode `rows` (any iterable, e.g. a queryset .iterator()) as one JSON array, `chunk_size` rows per chunk;
+    # `serialize` turns a list of rows into a list of JSON-ready objects
+    rows = iter(rows)
+    separator = b"["
+    while chunk := list(islice(rows, chunk_size)):
+        yield separator + b",".join(dumps(item) for item in serialize(chunk))
+        separator = b","
+    yield b"]" if separator == b"," else b"[]"
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    def __init__(self, rows, serialize, chunk_size=500, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(json_array_chunks(rows, serialize, chunk_size), **kwargs)
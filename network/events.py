@@ -0,0 +1,147 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .models import Post
+
+# In-process pub/sub behind the /events Server-Sent Events stream. Writers publish the ids of new posts and
+# of posts whose reactions changed (see network.signals); each stream waits for new events, lets a burst
+# settle for NETWORK_EVENTS_COALESCE_MS, then sends one batch: the new post ids, and the current counts of
+# the changed posts the client has on screen, read in a single query however many reactions arrived.
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+class EventBroker:
+    def __init__(self, size=1000):
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._waiters = set()  # (event loop, asyncio.Event) of async streams waiting for the next publish
+
+    @property
+    def last_seq(self):
+        with self._condition:
+            return self._seq
+
+    def publish(self, kind, ids):
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, kind, tuple(ids)))
+            self._condition.notify_all()
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def since(self, seq):
+        # events after `seq`, and whether some were already dropped from the buffer (or seq is from elsewhere)
+        with self._condition:
+            events = [event for event in self._events if event[0] > seq]
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            return events, seq > self._seq or oldest > seq + 1
+
+    def wait(self, seq, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: self._seq > seq, timeout)
+
+    async def await_(self, seq, timeout):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            if self._seq > seq:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._condition:
+                self._waiters.discard(waiter)
+
+
+broker = EventBroker(setting("NETWORK_EVENTS_BUFFER", 1000))
+
+def parse_watched(request):
+    # ids of the posts the client has on screen, from ?posts=1,2,3
+    try:
+        ids = {int(post_id) for post_id in request.GET.get("posts", "").split(",") if post_id}
+    except ValueError:
+        raise ValueError("Invalid posts parameter")
+    if len(ids) > setting("NETWORK_EVENTS_MAX_WATCHED", 200):
+        raise ValueError("Invalid posts parameter")
+    return ids
+
+def start_seq(request):
+    # resume after the Last-Event-ID an EventSource sends on reconnect, or the ?lastEventId the client sends
+    # when it reopens the stream itself (a new EventSource starts without one), else start from now
+    try:
+        return int(request.headers.get("Last-Event-ID") or request.GET.get("lastEventId", ""))
+    except ValueError:
+        return broker.last_seq
+
+def sse(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data)}"]
+    return "\n".join(lines) + "\n\n"
+
+def collect(events, watched):
+    new_ids = sorted({post_id for _, kind, ids in events if kind == "post" for post_id in ids}, reverse=True)
+    changed = {post_id for _, kind, ids in events if kind == "reaction" for post_id in ids} & watched
+    return new_ids, changed
+
+def render(seq, new_ids, counts):
+    chunks = []
+    if new_ids:
+        chunks.append(sse("posts", {"ids": new_ids}, seq))
+    if counts:
+        chunks.append(sse("reactions", {"posts": [
+            {"id": post_id, "like_count": likes, "dislike_count": dislikes} for post_id, likes, dislikes in counts
+        ]}, seq))
+    return "".join(chunks) or sse("progress", {}, seq)  # nothing for this client, but its position moves on
+
+def reaction_counts(ids):
+    return Post.objects.filter(id__in=ids).values_list("id", "like_count", "dislike_count")
+
+def stream(seq, watched):
+    # blocking generator for WSGI; it ends after NETWORK_EVENTS_MAX_SECONDS and the EventSource reconnects
+    deadline = time.monotonic() + setting("NETWORK_EVENTS_MAX_SECONDS", 300)
+    yield "retry: 3000\n\n"
+    while time.monotonic() < deadline:
+        if not broker.wait(seq, setting("NETWORK_EVENTS_HEARTBEAT_SECONDS", 15)):
+            yield ": keep-alive\n\n"
+            continue
+        time.sleep(setting("NETWORK_EVENTS_COALESCE_MS", 1000) / 1000)
+        events, overflowed = broker.since(seq)
+        if not events and not overflowed:
+            continue
+        seq = broker.last_seq if overflowed else events[-1][0]
+        if overflowed:
+            yield sse("reset", {}, seq)
+            continue
+        new_ids, changed = collect(events, watched)
+        yield render(seq, new_ids, list(reaction_counts(changed)) if changed else [])
+
+async def astream(seq, watched):
+    # async twin of stream() for ASGI, so an open stream doesn't hold a worker thread
+    deadline = time.monotonic() + setting("NETWORK_EVENTS_MAX_SECONDS", 300)
+    yield "retry: 3000\n\n"
+    while time.monotonic() < deadline:
+        if not await broker.await_(seq, setting("NETWORK_EVENTS_HEARTBEAT_SECONDS", 15)):
+            yield ": keep-alive\n\n"
+            continue
+        await asyncio.sleep(setting("NETWORK_EVENTS_COALESCE_MS", 1000) / 1000)
+        events, overflowed = broker.since(seq)
+        if not events and not overflowed:
+            continue
+        seq = broker.last_seq if overflowed else events[-1][0]
+        if overflowed:
+            yield sse("reset", {}, seq)
+            continue
+        new_ids, changed = collect(events, watched)
+        yield render(seq, new_ids, [row async for row in reaction_counts(changed)] if changed else [])
@@ -0,0 +1,119 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+# Serialized pages of the all-posts feed are cached under the current feed generation. Any write that can
+# change a page bumps the generation, which orphans every cached page at once (they then age out by timeout).
+
+# Follow changes bump a separate generation: they don't touch the all-posts pages, but they do change
+# profiles and Following feeds, whose ETags (network.views.feed_etag) are built from both generations.
+
+GENERATION_KEY = "network:feed-generation"
+FOLLOW_GENERATION_KEY = "network:follow-generation"
+
+def feed_cache():
+    return caches[getattr(settings, "NETWORK_FEED_CACHE", "default")]
+
+def shared(cache):
+    # whether every worker process sees the same entries
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+def etags_enabled():
+    # the ETags stand for generations, so every worker has to see the same ones: with a per-process cache one
+    # worker would answer 304 for a page another worker's writes have changed
+    enabled = getattr(settings, "NETWORK_FEED_ETAGS", None)
+    if enabled is None:
+        return shared(feed_cache())
+    return enabled
+
+def pages_cached():
+    # a write only orphans the pages in its own worker's cache, so with a per-process cache the others would
+    # keep serving theirs until the timeout
+    enabled = getattr(settings, "NETWORK_FEED_CACHE_PAGES", None)
+    if enabled is None:
+        return shared(feed_cache())
+    return enabled
+
+def generation(key):
+    cache = feed_cache()
+    value = cache.get(key)
+    if value is None:
+        # seed from the clock so an evicted counter can't restart at a generation that still has pages cached
+        cache.add(key, time.time_ns(), timeout=None)
+        value = cache.get(key)
+    return value
+
+async def ageneration(key):
+    cache = feed_cache()
+    value = await cache.aget(key)
+    if value is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        value = await cache.aget(key)
+    return value
+
+def feed_generation():
+    return generation(GENERATION_KEY)
+
+def follow_generation():
+    return generation(FOLLOW_GENERATION_KEY)
+
+async def afeed_generation():
+    return await ageneration(GENERATION_KEY)
+
+async def afollow_generation():
+    return await ageneration(FOLLOW_GENERATION_KEY)
+
+def _bump(key):
+    cache = feed_cache()
+    try:
+        cache.incr(key)
+    except ValueError: # key missing or evicted
+        cache.add(key, time.time_ns(), timeout=None)
+
+def bump_generation(key):
+    # bump now so readers stop being served the old pages, and again on commit so a page rebuilt from
+    # pre-commit data in between is orphaned too
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+def bump_feed_generation():
+    bump_generation(GENERATION_KEY)
+
+def bump_follow_generation():
+    bump_generation(FOLLOW_GENERATION_KEY)
+
+def page_key(filter_name, page_params, generation=None):
+    if "after" in page_params:
+        after = page_params["after"]
+        position = "start" if after is None else f"{after[0].isoformat()}.{after[1]}"
+        position = f"cursor:{position}"
+    else:
+        position = f"offset:{page_params['offset']}"
+    generation = feed_generation() if generation is None else generation
+    return f"network:feed:{generation}:{filter_name}:{position}:{page_params['batch_size']}"
+
+def cached_feed_page(filter_name, page_params, build):
+    if not pages_cached():
+        return build()
+    cache = feed_cache()
+    key = page_key(filter_name, page_params)
+    page = cache.get(key)
+    if page is None:
+        page = build()
+        cache.set(key, page, getattr(settings, "NETWORK_FEED_CACHE_TIMEOUT", 300))
+    return page
+
+async def acached_feed_page(filter_name, page_params, abuild):
+    if not pages_cached():
+        return await abuild()
+    cache = feed_cache()
+    key = page_key(filter_name, page_params, await afeed_generation())
+    page = await cache.aget(key)
+    if page is None:
+        page = await abuild()
+        await cache.aset(key, page, getattr(settings, "NETWORK_FEED_CACHE_TIMEOUT", 300))
+    return page
@@ -0,0 +1,354 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from heapq import nsmallest
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count
+
+from .models import User
+
+# "Who to follow" and mutual-follow counts from an in-memory snapshot of the follow graph. Two-hop walks
+# through the following join table cost a query per hop and grow with everyone's follow lists; the snapshot
+# holds the whole graph as two compressed sparse row arrays (each user's followees, and each user's
+# followers, sorted) built from one bulk query, and answers the same questions in memory.
+#
+# The snapshot is per process. Follows and unfollows made in this process are applied on commit by
+# network.signals to a small overlay, which is folded into fresh arrays once it grows past COMPACT_AFTER
+# changes; so are deleted users' follows, which cascade without m2m_changed. Changes made by other
+# processes (other workers, seed_network, the admin) are picked up when the snapshot is rebuilt after
+# NETWORK_FOLLOW_GRAPH_MAX_AGE seconds, in a background thread while the stale one keeps answering. With
+# NETWORK_FOLLOW_GRAPH_ENABLED off, or a graph larger than NETWORK_FOLLOW_GRAPH_MAX_EDGES, the same answers
+# come from SQL.
+
+logger = logging.getLogger(__name__)
+
+Follow = User.following.through
+COMPACT_AFTER = 10000
+
+def enabled():
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH_ENABLED", True)
+
+def max_age():
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH_MAX_AGE", 300)
+
+def max_edges():
+    return getattr(settings, "NETWORK_FOLLOW_GRAPH_MAX_EDGES", 5_000_000)
+
+def rank(candidates, degree, limit):
+    # most shared connections first, then the more followed account, then the older one
+    return nsmallest(limit, candidates.items(), key=lambda item: (-item[1], -degree(item[0]), item[0]))
+
+
+class Adjacency:
+    # compressed sparse rows: the neighbours of user id u are targets[offsets[row[u]]:offsets[row[u] + 1]],
+    # in ascending id order
+    def __init__(self, pairs):
+        # pairs: (user id, neighbour id), sorted
+        self.row = {}
+        self.offsets = array("q", [0])
+        self.targets = array("q")
+        for source, target in pairs:
+            if source not in self.row:
+                if self.row:
+                    self.offsets.append(len(self.targets))
+                self.row[source] = len(self.row)
+            self.targets.append(target)
+        if self.row:
+            self.offsets.append(len(self.targets))
+
+    def __len__(self):
+        return len(self.targets)
+
+    def bounds(self, user_id):
+        row = self.row.get(user_id)
+        return (0, 0) if row is None else (self.offsets[row], self.offsets[row + 1])
+
+    def neighbours(self, user_id):
+        start, end = self.bounds(user_id)
+        return self.targets[start:end]
+
+    def degree(self, user_id):
+        start, end = self.bounds(user_id)
+        return end - start
+
+    def __contains__(self, pair):
+        source, target = pair
+        start, end = self.bounds(source)
+        index = bisect_left(self.targets, target, start, end)
+        return index < end and self.targets[index] == target
+
+    def pairs(self):
+        for source in self.row:
+            for target in self.neighbours(source):
+                yield source, target
+
+    def transposed(self):
+        # the same edges reversed, by counting sort: sources come out in ascending order, so every reversed
+        # row is sorted without building and sorting a list of pairs
+        degrees = Counter(self.targets)
+        reversed_ = Adjacency(())
+        position = {}
+        for target in sorted(degrees):
+            reversed_.row[target] = len(reversed_.row)
+            position[target] = reversed_.offsets[-1]
+            reversed_.offsets.append(reversed_.offsets[-1] + degrees[target])
+        reversed_.targets = array("q", bytes(reversed_.targets.itemsize * len(self.targets)))
+        for source, target in self.pairs():
+            reversed_.targets[position[target]] = source
+            position[target] += 1
+        return reversed_
+
+
+class Overlay:
+    # follows and unfollows since the snapshot: added pairs are never in it, removed pairs always are
+    def __init__(self):
+        self.added, self.removed = set(), set()
+        self.added_to = {}        # user id -> neighbour ids added
+        self.removed_count = Counter()
+
+    def __len__(self):
+        return len(self.added) + len(self.removed)
+
+    def neighbours(self, user_id, base, pair):
+        added, removed = self.added_to.get(user_id), self.removed_count[user_id]
+        if not (added or removed):
+            return base
+        if removed:
+            base = [neighbour for neighbour in base if pair(neighbour) not in self.removed]
+        return sorted({*base, *added}) if added else base
+
+    def degree(self, user_id, base_degree):
+        return base_degree + len(self.added_to.get(user_id, ())) - self.removed_count[user_id]
+
+
+class FollowGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = None  # background rebuild thread
+        self.reset()
+
+    def reset(self):
+        # drop the snapshot; the next query rebuilds it from the database
+        rebuilding = self._rebuilding
+        if rebuilding is not None:
+            rebuilding.join()
+        with self._lock:
+            self._following = self._followers = None
+            self._built = 0.0
+            self._too_large = False
+            self._replay = None
+            self._overlays()
+
+    def _overlays(self):
+        self._following_changes, self._followers_changes = Overlay(), Overlay()
+
+    def build(self, edges=None):
+        # edges: a callable returning (follower id, followee id) pairs, e.g. self.edges to compact; streamed
+        # from the join table (in the order of its unique index) when not given. Changes applied while the
+        # arrays are built may be missing from them, so they are recorded and replayed onto the new arrays
+        # (replaying a change they already have is a no-op).
+        with self._lock:
+            self._replay = []
+        try:
+            if edges is None:
+                if Follow.objects.count() > max_edges():
+                    with self._lock:
+                        self._following = self._followers = None
+                        self._built, self._too_large = time.monotonic(), True
+                        self._overlays()
+                    return
+                edges = (Follow.objects.order_by("from_user_id", "to_user_id")
+                         .values_list("from_user_id", "to_user_id").iterator(chunk_size=10000))
+            else:
+                edges = sorted(edges())
+            following = Adjacency(edges)
+            followers = following.transposed()
+            with self._lock:
+                self._following, self._followers = following, followers
+                self._built, self._too_large = time.monotonic(), False
+                self._overlays()
+                for change in self._replay:
+                    change()
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def fresh(self):
+        return (self._following is not None or self._too_large) and time.monotonic() - self._built < max_age()
+
+    def loaded(self):
+        # whether queries can be answered from memory right now, without a rebuild
+        return self._following is not None and self.fresh()
+
+    def ensure(self):
+        # True when the snapshot can answer. A missing one is built first (once, whichever thread gets
+        # there); a stale one keeps answering while a background thread rebuilds it.
+        if self._following is None:
+            if not self.fresh():
+                with self._build_lock:
+                    if not self.fresh():
+                        self.build()
+        elif not self.fresh():
+            self.rebuild_in_background()
+        return self._following is not None
+
+    def rebuild_in_background(self):
+        if not self._build_lock.acquire(blocking=False):
+            return  # already being rebuilt
+        def rebuild():
+            try:
+                self.build()
+            except Exception:
+                logger.exception("Follow graph rebuild failed; the stale snapshot keeps answering")
+            finally:
+                self._build_lock.release()
+                close_old_connections()
+        self._rebuilding = threading.Thread(target=rebuild, name="follow-graph-rebuild", daemon=True)
+        self._rebuilding.start()
+
+    def _change(self, change):
+        # change() updates the overlays with the lock held; it is also replayed onto a build in progress
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(change)
+            if self._following is None:
+                return
+            change()
+            compact = len(self._following_changes) > COMPACT_AFTER
+        if compact and self._build_lock.acquire(blocking=False):  # else a build in progress folds them in
+            try:
+                self.build(self.edges)
+            finally:
+                self._build_lock.release()
+
+    def apply(self, pairs, followed):
+        # record committed follows (followed=True) or unfollows of (follower, followee) pairs
+        pairs = list(pairs)
+        self._change(lambda: self._record(pairs, followed))
+
+    def remove_user(self, user_id):
+        # a deleted user's follows go with them by cascade, which sends no m2m_changed
+        def remove():
+            pairs = [(user_id, followee) for followee in self._following_of(user_id)]
+            self._record(pairs + [(follower, user_id) for follower in self._followers_of(user_id)], False)
+        self._change(remove)
+
+    def _record(self, pairs, followed):
+        following, followers = self._following_changes, self._followers_changes
+        for follower, followee in pairs:
+            pair = (follower, followee)
+            if followed and pair in following.removed:
+                following.removed.discard(pair)
+                followers.removed.discard((followee, follower))
+                following.removed_count[follower] -= 1
+                followers.removed_count[followee] -= 1
+            elif followed and pair not in following.added and pair not in self._following:
+                following.added.add(pair)
+                followers.added.add((followee, follower))
+                following.added_to.setdefault(follower, set()).add(followee)
+                followers.added_to.setdefault(followee, set()).add(follower)
+            elif not followed and pair in following.added:
+                following.added.discard(pair)
+                followers.added.discard((followee, follower))
+                following.added_to[follower].discard(followee)
+                followers.added_to[followee].discard(follower)
+            elif not followed and pair not in following.removed and pair in self._following:
+                following.removed.add(pair)
+                followers.removed.add((followee, follower))
+                following.removed_count[follower] += 1
+                followers.removed_count[followee] += 1
+
+    def edges(self):
+        # current (follower, followee) pairs, snapshot and overlay merged
+        with self._lock:
+            following, overlay = self._following, self._following_changes
+            removed, added = set(overlay.removed), set(overlay.added)
+        return [pair for pair in following.pairs() if pair not in removed] + list(added)
+
+    def _following_of(self, user_id):
+        return self._following_changes.neighbours(user_id, self._following.neighbours(user_id),
+                                                lambda followee: (user_id, followee))
+
+    def _followers_of(self, user_id):
+        return self._followers_changes.neighbours(user_id, self._followers.neighbours(user_id),
+                                                lambda follower: (user_id, follower))
+
+    def following(self, user_id):
+        # ids user_id follows, ascending
+        with self._lock:
+            return self._following_of(user_id)
+
+    def followers(self, user_id):
+        with self._lock:
+            return self._followers_of(user_id)
+
+    def degree(self, user_id):
+        # (followers, following)
+        with self._lock:
+            return (self._followers_changes.degree(user_id, self._followers.degree(user_id)),
+                    self._following_changes.degree(user_id, self._following.degree(user_id)))
+
+    def suggestions(self, user_id, limit):
+        # accounts followed by the accounts user_id follows, with how many of them follow each
+        following = self.following(user_id)
+        candidates = Counter()
+        for followee in following:
+            candidates.update(self.following(followee))
+        for user in {user_id, *following}.intersection(candidates):
+            del candidates[user]
+        return rank(candidates, lambda candidate: self.degree(candidate)[0], limit)
+
+    def follows(self, follower_id, followee_id):
+        pair = (follower_id, followee_id)
+        with self._lock:
+            changes = self._following_changes
+            return pair in changes.added or (pair not in changes.removed and pair in self._following)
+
+    def mutual_count(self, viewer_id, target_id):
+        # how many of the accounts viewer_id follows also follow target_id: a binary search in each of their
+        # (short) following lists rather than a walk of the target's possibly huge follower list
+        return sum(1 for followee in self.following(viewer_id) if self.follows(followee, target_id))
+
+
+graph = FollowGraph()
+
+# SQL versions of the same answers, used when the snapshot is disabled or too large
+
+def viewer_following(user_id):
+    return Follow.objects.filter(from_user_id=user_id).values("to_user_id")
+
+def sql_suggestions(user_id, limit):
+    rows = (Follow.objects.filter(from_user_id__in=viewer_following(user_id))
+            .exclude(to_user_id=user_id)
+            .exclude(to_user_id__in=viewer_following(user_id))
+            .values("to_user_id")
+            .annotate(shared=Count("*"))
+            .order_by("-shared", "-to_user__follower_count", "to_user_id")
+            .values_list("to_user_id", "shared")[:limit])
+    return list(rows)
+
+def mutual_count_query(viewer_id, target_id):
+    return Follow.objects.filter(from_user_id__in=viewer_following(viewer_id), to_user_id=target_id)
+
+def suggestions(user_id, limit):
+    # [(user id, number of user_id's followees following them)], best first
+    if enabled() and graph.ensure():
+        return graph.suggestions(user_id, limit)
+    return sql_suggestions(user_id, limit)
+
+def mutual_count(viewer_id, target_id):
+    if enabled() and graph.ensure():
+        return graph.mutual_count(viewer_id, target_id)
+    return mutual_count_query(viewer_id, target_id).count()
+
+async def amutual_count(viewer_id, target_id):
+    # never builds the snapshot, which would block the event loop; the sync views keep it loaded
+    if enabled() and graph.loaded():
+        return graph.mutual_count(viewer_id, target_id)
+    return await mutual_count_query(viewer_id, target_id).acount()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from network.assets import asset_root, brotli, build_assets
+
+
+class Command(BaseCommand):
+    help = "Minify, content-hash and precompress the assets in NETWORK_ASSETS into NETWORK_ASSET_ROOT."
+
+    def handle(self, *args, **options):
+        try:
+            manifest = build_assets()
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        for name, hashed in manifest.items():
+            self.stdout.write(f"{name} -> {hashed}")
+        variants = "gzip and brotli" if brotli is not None else "gzip (install brotli for .br variants)"
+        self.stdout.write(self.style.SUCCESS(f"{len(manifest)} asset(s) built into {asset_root()} with {variants}"))
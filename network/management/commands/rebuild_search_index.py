@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from network.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text post search index from the posts table."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"{indexed} post(s) indexed"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from network.feed_cache import bump_feed_generation
+from network.models import Post, User, through_count_subquery
+
+# (model, stored counter, through table, through column pointing back at the model)
+COUNTERS = [
+    (Post, "like_count", Post.liked_by.through, "post"),
+    (Post, "dislike_count", Post.disliked_by.through, "post"),
+    (User, "following_count", User.following.through, "from_user"),
+    (User, "follower_count", User.following.through, "to_user"),
+]
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like/dislike/follower/following counters from the join tables and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true",
+                            help="Only report drift (exit with an error if any is found), don't fix it.")
+
+    def handle(self, *args, **options):
+        total_drift = 0
+        with transaction.atomic():
+            for model, counter, through, field in COUNTERS:
+                actual = through_count_subquery(through, field)
+                drifted = list(model.objects.annotate(actual=actual)
+                               .exclude(**{counter: F("actual")})
+                               .values_list("pk", counter, "actual"))
+                for pk, stored, expected in drifted:
+                    self.stdout.write(f"{model.__name__} {pk} {counter}: stored {stored}, actual {expected}")
+                if drifted and not options["check"]:
+                    model.objects.filter(pk__in=[pk for pk, _, _ in drifted]).update(**{counter: actual})
+                    if model is Post:
+                        bump_feed_generation()
+                total_drift += len(drifted)
+
+        if options["check"] and total_drift:
+            raise CommandError(f"{total_drift} counter(s) drifted")
+        verb = "found" if options["check"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{total_drift} drifted counter(s) {verb}"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from network.models import User
+from network.seeding import seed_network
+
+
+class Command(BaseCommand):
+    help = "Seed a reproducible synthetic dataset (users, power-law follow graph, posts, reactions) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts-per-user", type=int, default=10)
+        parser.add_argument("--following-per-user", type=int, default=20)
+        parser.add_argument("--reactions-per-post", type=int, default=5)
+        parser.add_argument("--exponent", type=float, default=1.2,
+                            help="Power-law exponent of follower popularity; higher concentrates followers.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--prefix", default="seed", help="Username prefix for the generated users.")
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}_user_").exists():
+            raise CommandError(f"Users with prefix '{options['prefix']}' already exist; pick another --prefix.")
+
+        summary = seed_network(
+            users=options["users"],
+            posts_per_user=options["posts_per_user"],
+            following_per_user=options["following_per_user"],
+            reactions_per_post=options["reactions_per_post"],
+            exponent=options["exponent"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+        )
+        self.stdout.write(self.style.SUCCESS(", ".join(f"{count} {name}" for name, count in summary.items())))
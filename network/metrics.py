@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Per-view request metrics recorded by network.middleware.RequestMetricsMiddleware. Samples are kept in
+# bounded per-process windows, so the percentiles describe the most recent requests this worker served.
+
+METRICS = ("total", "db", "queries", "serialize", "encode", "bytes")
+
+_current = ContextVar("network_request_timings", default=None)
+_lock = threading.Lock()
+_samples = defaultdict(lambda: {metric: deque(maxlen=window_size()) for metric in METRICS})
+
+def window_size():
+    return getattr(settings, "NETWORK_METRICS_WINDOW", 1000)
+
+def start_request():
+    timings = defaultdict(float)
+    return timings, _current.set(timings)
+
+def finish_request(token):
+    _current.reset(token)
+
+@contextmanager
+def track(span):
+    # add the time spent in the block to `span` for the request being measured; a no-op otherwise
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[span] += (time.perf_counter() - start) * 1000
+
+def time_query(execute, sql, params, many, context):
+    # database execute wrapper counting and timing the queries of the request being measured; a no-op
+    # otherwise. The ContextVar follows the request into the threads the async ORM runs queries in.
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings["queries"] += 1
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings["db"] += (time.perf_counter() - start) * 1000
+
+def instrument(connection, **kwargs):
+    # connection_created receiver (see NetworkConfig.ready): every connection, including those the async ORM
+    # opens in its worker threads, gets time_query, which costs a ContextVar lookup when nothing is measured
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+def record(view_name, sample):
+    with _lock:
+        windows = _samples[view_name]
+        for metric in METRICS:
+            windows[metric].append(sample[metric])
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def snapshot():
+    with _lock:
+        windows = {view: {metric: list(values) for metric, values in metrics.items()}
+                   for view, metrics in _samples.items()}
+    return {
+        view: {"count": len(metrics["total"]),
+               **{metric: {"p50": percentile(values, 0.50),
+                           "p95": percentile(values, 0.95),
+                           "p99": percentile(values, 0.99)}
+                  for metric, values in metrics.items()}}
+        for view, metrics in windows.items() if metrics["total"]
+    }
+
+def reset():
+    with _lock:
+        _samples.clear()
@@ -0,0 +1,66 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+
+# Times each request per URL name (wall time, DB query count and time, serialization and JSON encoding time,
+# response size), adds a Server-Timing header and feeds the rolling windows in network.metrics. Drops itself
+# from the middleware stack entirely unless NETWORK_METRICS_ENABLED is set. Runs natively in either mode, so
+# async views under ASGI aren't pushed onto a thread.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "NETWORK_METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.measured(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.measured(request, response, timings, start)
+
+    def measured(self, request, response, timings, start):
+        total = (time.perf_counter() - start) * 1000
+
+        size = 0 if response.streaming else len(response.content)
+        match = getattr(request, "resolver_match", None)
+        view_name = match.url_name if match and match.url_name else "unresolved"
+        metrics.record(view_name, {
+            "total": total,
+            "db": timings["db"],
+            "queries": int(timings["queries"]),
+            "serialize": timings["serialize"],
+            "encode": timings["encode"],
+            "bytes": size,
+        })
+
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={total:.2f}",
+            f'db;dur={timings["db"]:.2f};desc="{int(timings["queries"])} queries"',
+            f'serialize;dur={timings["serialize"]:.2f}',
+            f'encode;dur={timings["encode"]:.2f}',
+        ])
+        return response
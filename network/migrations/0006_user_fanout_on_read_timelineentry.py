@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_timelines(apps, schema_editor):
+    # what network.timeline does for each follow: accounts over the fan-out threshold go on the pull path,
+    # and everyone else's recent posts are copied into their followers' timelines
+    User = apps.get_model("network", "User")
+    Post = apps.get_model("network", "Post")
+    TimelineEntry = apps.get_model("network", "TimelineEntry")
+    threshold = getattr(settings, "NETWORK_FANOUT_THRESHOLD", 1000)
+    limit = getattr(settings, "NETWORK_TIMELINE_BACKFILL_LIMIT", 500)
+
+    followers = {}
+    for follower_id, followee_id in User.following.through.objects.values_list("from_user_id", "to_user_id"):
+        followers.setdefault(followee_id, []).append(follower_id)
+    pulled = {followee_id for followee_id, follower_ids in followers.items() if len(follower_ids) > threshold}
+    User.objects.filter(id__in=pulled).update(fanout_on_read=True)
+
+    for followee_id, follower_ids in followers.items():
+        if followee_id in pulled:
+            continue
+        recent_posts = list(Post.objects.filter(poster_id=followee_id)
+                            .order_by("-timestamp", "-id")
+                            .values_list("id", "timestamp")[:limit])
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=follower_id, post_id=post_id, poster_id=followee_id, timestamp=timestamp)
+             for follower_id in follower_ids for post_id, timestamp in recent_posts],
+            batch_size=5000, ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0005_post_disliked_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='fanout_on_read',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='network.post')),
+                ('poster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-timestamp', '-post'], name='timeline_owner_recent_idx'), models.Index(fields=['owner', 'poster'], name='timeline_owner_poster_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
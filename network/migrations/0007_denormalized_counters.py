@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:17
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def through_count(through, field):
+    counts = (through.objects.filter(**{field: OuterRef("pk")})
+              .order_by()
+              .values(field)
+              .annotate(total=Count("*"))
+              .values("total"))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Post = apps.get_model("network", "Post")
+    User = apps.get_model("network", "User")
+    Post.objects.update(
+        like_count=through_count(Post.liked_by.through, "post"),
+        dislike_count=through_count(Post.disliked_by.through, "post"),
+    )
+    User.objects.update(
+        following_count=through_count(User.following.through, "from_user"),
+        follower_count=through_count(User.following.through, "to_user"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0006_user_fanout_on_read_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='dislike_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0007_denormalized_counters'),
+    ]
+
+    # the auto-created reaction through tables can't declare Meta indexes, so their (user, post) reverse
+    # lookup indexes are created directly
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-timestamp', '-id'], name='post_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['poster', '-timestamp', '-id'], name='post_poster_recent_idx'),
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX "network_post_liked_by_user_post_idx" ON "network_post_liked_by" ("user_id", "post_id");',
+            reverse_sql='DROP INDEX "network_post_liked_by_user_post_idx";',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX "network_post_disliked_by_user_post_idx" ON "network_post_disliked_by" ("user_id", "post_id");',
+            reverse_sql='DROP INDEX "network_post_disliked_by_user_post_idx";',
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0008_feed_indexes'),
+    ]
+
+    # FTS5 index over post bodies and poster usernames (see network.search). Triggers keep it in sync so
+    # writes that skip model signals, like bulk_create and queryset updates, are indexed too.
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE network_post_search USING fts5(body, poster, tokenize='unicode61 remove_diacritics 2');",
+                "INSERT INTO network_post_search(rowid, body, poster) "
+                "SELECT p.id, p.body, u.username FROM network_post p JOIN network_user u ON u.id = p.poster_id;",
+                "CREATE TRIGGER network_post_search_insert AFTER INSERT ON network_post BEGIN "
+                "INSERT INTO network_post_search(rowid, body, poster) "
+                "SELECT NEW.id, NEW.body, username FROM network_user WHERE id = NEW.poster_id; END;",
+                "CREATE TRIGGER network_post_search_update AFTER UPDATE OF body, poster_id ON network_post BEGIN "
+                "DELETE FROM network_post_search WHERE rowid = OLD.id; "
+                "INSERT INTO network_post_search(rowid, body, poster) "
+                "SELECT NEW.id, NEW.body, username FROM network_user WHERE id = NEW.poster_id; END;",
+                "CREATE TRIGGER network_post_search_delete AFTER DELETE ON network_post BEGIN "
+                "DELETE FROM network_post_search WHERE rowid = OLD.id; END;",
+                "CREATE TRIGGER network_post_search_username AFTER UPDATE OF username ON network_user BEGIN "
+                "UPDATE network_post_search SET poster = NEW.username "
+                "WHERE rowid IN (SELECT id FROM network_post WHERE poster_id = NEW.id); END;",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER network_post_search_username;",
+                "DROP TRIGGER network_post_search_delete;",
+                "DROP TRIGGER network_post_search_update;",
+                "DROP TRIGGER network_post_search_insert;",
+                "DROP TABLE network_post_search;",
+            ],
+        ),
+    ]
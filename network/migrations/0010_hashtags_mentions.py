@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:54
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# frozen copies of network.tags' parsing as of this migration, so later changes there can't alter it
+HASHTAG_RE = re.compile(r"(?<![\w#])#(\w{1,64})(?!\w)")
+MENTION_RE = re.compile(r"(?<![\w@])@(\w(?:[\w.@+-]{0,148}\w)?)")
+
+
+def extract_hashtags(body):
+    return {name for name in (tag.lower() for tag in HASHTAG_RE.findall(body)) if len(name) <= 64}
+
+
+def extract_mentions(body):
+    return set(MENTION_RE.findall(body))
+
+
+def activity_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def index_existing_posts(apps, schema_editor):
+    Post = apps.get_model("network", "Post")
+    User = apps.get_model("network", "User")
+    Hashtag = apps.get_model("network", "Hashtag")
+    PostHashtag = apps.get_model("network", "PostHashtag")
+    Mention = apps.get_model("network", "Mention")
+    HashtagActivity = apps.get_model("network", "HashtagActivity")
+
+    hashtag_ids, user_ids, activity = {}, dict(User.objects.values_list("username", "id")), {}
+    links, mentions = [], []
+    for post_id, body, timestamp in Post.objects.values_list("id", "body", "timestamp").iterator():
+        for name in extract_hashtags(body):
+            if name not in hashtag_ids:
+                hashtag_ids[name] = Hashtag.objects.create(name=name).id
+            links.append(PostHashtag(post_id=post_id, hashtag_id=hashtag_ids[name], timestamp=timestamp))
+            bucket = (hashtag_ids[name], activity_hour(timestamp))
+            activity[bucket] = activity.get(bucket, 0) + 1
+        mentions += [Mention(post_id=post_id, user_id=user_ids[username], timestamp=timestamp)
+                     for username in extract_mentions(body) if username in user_ids]
+    PostHashtag.objects.bulk_create(links, batch_size=1000)
+    Mention.objects.bulk_create(mentions, batch_size=1000)
+    HashtagActivity.objects.bulk_create(
+        [HashtagActivity(hashtag_id=hashtag_id, hour=hour, count=count) for (hashtag_id, hour), count in activity.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0009_post_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HashtagActivity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='network.hashtag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='hashtag_activity_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hashtag', 'hour'), name='unique_hashtag_hour')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='network.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-timestamp', '-post'], name='mention_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'user'), name='unique_post_mention')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostHashtag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('hashtag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_links', to='network.hashtag')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtag_links', to='network.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hashtag', '-timestamp', '-post'], name='hashtag_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'hashtag'), name='unique_post_hashtag')],
+            },
+        ),
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
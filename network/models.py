@@ -1,5 +1,85 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .metrics import track
+from .reaction_buffer import buffer
+
+
+def through_count_subquery(through, field):
+    # correlated COUNT over an M2M through table, used to recompute the stored counters in bulk
+    counts = (through.objects.filter(**{field: OuterRef("pk")})
+              .order_by()
+              .values(field)
+              .annotate(total=Count("*"))
+              .values("total"))
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+# what Post.serialize reads, fetched as plain row tuples (poster username via a join) by the feed queries
+FEED_VALUES = ("id", "poster__username", "poster_id", "body", "timestamp", "like_count", "dislike_count")
+TIMESTAMP_FORMAT = "%b %d %Y, %I:%M %p"
+
+
+class PostQuerySet(models.QuerySet):
+    def feed_rows(self):
+        # newest first, as FEED_VALUES tuples: poster joined and counts read from the stored counters, one
+        # query per page regardless of its size, and no Post or User instances built
+        return self.order_by('-timestamp', '-id').values_list(*FEED_VALUES)
+
+    def with_viewer_reactions(self, user):
+        # annotate whether `user` likes/dislikes each post, for the compact toggle responses
+        return self.annotate(
+            liked=Exists(Post.liked_by.through.objects.filter(post_id=OuterRef("pk"), user_id=user.id)),
+            disliked=Exists(Post.disliked_by.through.objects.filter(post_id=OuterRef("pk"), user_id=user.id)),
+        )
+
+    def serialize_page(self, offset, batch_size):
+        return serialize_rows(list(self.feed_rows()[offset:offset+batch_size]))
+
+    async def aserialize_page(self, offset, batch_size):
+        return serialize_rows([row async for row in self.feed_rows()[offset:offset+batch_size]])
+
+    def seek(self, after):
+        # seek past the (timestamp, id) key of the previous page's last post instead of counting rows off,
+        # so every page costs the same
+        posts = self.feed_rows()
+        if after is not None:
+            timestamp, post_id = after
+            # written as a range plus a residual test (not a plain OR) so SQLite walks the index in order
+            posts = posts.filter(Q(timestamp__lte=timestamp), Q(timestamp__lt=timestamp) | Q(id__lt=post_id))
+        return posts
+
+    def keyset_page(self, after, batch_size):
+        return serialize_keyed_page(list(self.seek(after)[:batch_size]), batch_size)
+
+    async def akeyset_page(self, after, batch_size):
+        return serialize_keyed_page([row async for row in self.seek(after)[:batch_size]], batch_size)
+
+
+def serialize_rows(rows):
+    # FEED_VALUES tuples -> the same dicts Post.serialize builds; counts include reactions still waiting in
+    # the write-behind buffer (network.reaction_buffer)
+    with track("serialize"):
+        return buffer.adjust([
+            {
+                "id": post_id,
+                "poster": username,
+                "user_id": user_id,
+                "body": body,
+                "timestamp": timestamp.strftime(TIMESTAMP_FORMAT),
+                "like_count": like_count,
+                "dislike_count": dislike_count,
+            }
+            for post_id, username, user_id, body, timestamp, like_count, dislike_count in rows
+        ])
+
+def serialize_keyed_page(rows, batch_size):
+    # returns the page's last (timestamp, id) key only when more posts may follow
+    last_key = (rows[-1][4], rows[-1][0]) if len(rows) == batch_size else None
+    return serialize_rows(rows), last_key
+
 
 class Post(models.Model):
     poster = models.ForeignKey("User", on_delete=models.CASCADE, related_name="posts")
@@ -7,6 +87,18 @@ class Post(models.Model):
     disliked_by = models.ManyToManyField("User", related_name="dislikes")
     body = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # denormalized liked_by/disliked_by sizes, kept in step by network.signals
+    like_count = models.PositiveIntegerField(default=0)
+    dislike_count = models.PositiveIntegerField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        # one index per feed access path, matching its (-timestamp, -id) ordering so pages are read in order
+        indexes = [
+            models.Index(fields=["-timestamp", "-id"], name="post_recent_idx"),
+            models.Index(fields=["poster", "-timestamp", "-id"], name="post_poster_recent_idx"),
+        ]
 
     def serialize(self):
         return {
@@ -14,22 +106,88 @@ class Post(models.Model):
             "poster": self.poster.username,
             "user_id": self.poster.id,
             "body": self.body,
-            "timestamp": self.timestamp.strftime("%b %d %Y, %I:%M %p"),
-            "like_count": self.liked_by.count(),
-            "dislike_count": self.disliked_by.count(),
+            "timestamp": self.timestamp.strftime(TIMESTAMP_FORMAT),
+            "like_count": self.like_count,
+            "dislike_count": self.dislike_count,
         }
 
 class User(AbstractUser):
     following = models.ManyToManyField("User", related_name="followers")
+    # set once the user's follower count passes NETWORK_FANOUT_THRESHOLD; their posts are then merged into
+    # followers' timelines at read time instead of being copied at write time
+    fanout_on_read = models.BooleanField(default=False, db_index=True)
+    # denormalized followers/following sizes, kept in step by network.signals
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
     
     def serialize(self):
-        following = self.following.all()
-        followers = self.followers.all()
+        # full lists, only suitable for small accounts; the API pages through them in get_follow_usernames
+        following = list(self.following.values_list("id", "username"))
+        followers = list(self.followers.values_list("id", "username"))
         return {
             "id": self.id,
-            "follower_ids" : [f.id for f in followers],
-            "following_ids" : [f.id for f in following],
-            "follower_usernames": [f.username for f in followers],
-            "following_usernames": [f.username for f in following],
+            "follower_ids" : [user_id for user_id, _ in followers],
+            "following_ids" : [user_id for user_id, _ in following],
+            "follower_usernames": [username for _, username in followers],
+            "following_usernames": [username for _, username in following],
         }
-    
\ No newline at end of file
+
+class TimelineEntry(models.Model):
+    # one row per (follower, post) for the materialized Following feed, written by network.timeline
+    owner = models.ForeignKey("User", on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name="timeline_entries")
+    poster = models.ForeignKey("User", on_delete=models.CASCADE, related_name="+")
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "post"], name="unique_timeline_entry"),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "-timestamp", "-post"], name="timeline_owner_recent_idx"),
+            models.Index(fields=["owner", "poster"], name="timeline_owner_poster_idx"),
+        ]
+
+class Hashtag(models.Model):
+    name = models.CharField(max_length=64, unique=True)  # stored lowercase
+
+class PostHashtag(models.Model):
+    # one row per (post, hashtag), written by network.tags when the post is composed
+    post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name="hashtag_links")
+    hashtag = models.ForeignKey("Hashtag", on_delete=models.CASCADE, related_name="post_links")
+    timestamp = models.DateTimeField()  # copy of the post's, so a tag feed is read off this index alone
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "hashtag"], name="unique_post_hashtag"),
+        ]
+        indexes = [
+            models.Index(fields=["hashtag", "-timestamp", "-post"], name="hashtag_recent_idx"),
+        ]
+
+class Mention(models.Model):
+    post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name="mentions")
+    user = models.ForeignKey("User", on_delete=models.CASCADE, related_name="mentions")
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "user"], name="unique_post_mention"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-timestamp", "-post"], name="mention_recent_idx"),
+        ]
+
+class HashtagActivity(models.Model):
+    # posts using a hashtag per hour; trending tags sum the recent buckets instead of scanning posts
+    hashtag = models.ForeignKey("Hashtag", on_delete=models.CASCADE, related_name="activity")
+    hour = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["hashtag", "hour"], name="unique_hashtag_hour"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"], name="hashtag_activity_hour_idx"),
+        ]
@@ -0,0 +1,94 @@
+import threading
+
+from django.conf import settings
+
+# Pending likes/dislikes for the optional write-behind mode (NETWORK_REACTION_BUFFER_ENABLED). Reaction views
+# record into this buffer instead of writing, and network.reactions flushes it to the join tables in one
+# transaction every NETWORK_REACTION_BUFFER_FLUSH_MS or NETWORK_REACTION_BUFFER_MAX_ITEMS. Until then post
+# serialization adds the pending deltas to the stored counts, so a reaction shows up in the very next read.
+# The buffer is per process; anything in it when the process dies is lost.
+
+def enabled():
+    return getattr(settings, "NETWORK_REACTION_BUFFER_ENABLED", False)
+
+def max_items():
+    return getattr(settings, "NETWORK_REACTION_BUFFER_MAX_ITEMS", 500)
+
+
+class ReactionBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (user_id, post_id, reaction) -> (desired state, state in the database when first buffered);
+        # later clicks on the same key only replace the desired state
+        self._pending = {}
+        # batches drained by a flush whose transaction hasn't committed yet: still counted by adjust(), since
+        # the database doesn't show them until then
+        self._in_flight = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def record(self, user_id, post_id, reaction, state, stored):
+        key = (user_id, post_id, reaction)
+        with self._lock:
+            if key in self._in_flight:
+                stored = self._in_flight[key][0]  # what the database holds once the flush commits
+            _, stored = self._pending.get(key, (None, stored))
+            self._pending[key] = (state, stored)
+            return len(self._pending)
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._in_flight.update(pending)
+            return pending
+
+    def clear(self):
+        with self._lock:
+            self._pending, self._in_flight = {}, {}
+
+    def settle(self, batch):
+        # a drained batch is in the database, or was dropped for good
+        with self._lock:
+            for key in batch:
+                self._in_flight.pop(key, None)
+
+    def requeue(self, batch):
+        # put back a batch whose flush failed, without overriding anything recorded since (whose stored state,
+        # taken from the batch, never made it to the database)
+        with self._lock:
+            for key, (state, stored) in batch.items():
+                self._in_flight.pop(key, None)
+                if key in self._pending:
+                    self._pending[key] = (self._pending[key][0], stored)
+                else:
+                    self._pending[key] = (state, stored)
+
+    def adjust(self, posts, viewer_id=None):
+        # add pending and in-flight deltas to serialized posts' counts; with viewer_id, also the viewer's
+        # liked/disliked flags
+        with self._lock:
+            if not (self._pending or self._in_flight):
+                return posts
+            entries = list(self._in_flight.items()) + list(self._pending.items())
+        deltas, viewer_states = {}, {}
+        for (user_id, post_id, reaction), (state, stored) in entries:
+            if state != stored:
+                key = (post_id, f"{reaction}_count")
+                deltas[key] = deltas.get(key, 0) + (1 if state else -1)
+            if user_id == viewer_id:
+                viewer_states[(post_id, f"{reaction}d")] = state  # pending entries come last and win
+        adjusted = []
+        for post in posts:
+            post = dict(post)
+            for field in ("like_count", "dislike_count"):
+                post[field] = max(0, post[field] + deltas.get((post["id"], field), 0))
+            for field in ("liked", "disliked"):
+                if field in post and (post["id"], field) in viewer_states:
+                    post[field] = viewer_states[(post["id"], field)]
+            adjusted.append(post)
+        return adjusted
+
+
+buffer = ReactionBuffer()
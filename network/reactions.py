@@ -0,0 +1,112 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .events import broker
+from .feed_cache import bump_feed_generation
+from .models import Post, User, through_count_subquery
+from .reaction_buffer import buffer, max_items
+
+# Recording and flushing the write-behind reaction buffer (see network.reaction_buffer).
+
+logger = logging.getLogger(__name__)
+
+REACTION_THROUGH = {"like": Post.liked_by.through, "dislike": Post.disliked_by.through}
+
+def flush_interval():
+    return getattr(settings, "NETWORK_REACTION_BUFFER_FLUSH_MS", 200) / 1000
+
+def record_reactions(user, operations):
+    # operations: {(post_id, reaction): desired state}, already validated by the caller
+    size = 0
+    for reaction, through in REACTION_THROUGH.items():
+        post_ids = [post_id for post_id, op_reaction in operations if op_reaction == reaction]
+        if not post_ids:
+            continue
+        # reads don't take SQLite's write lock, so this check doesn't queue behind other writers
+        stored = set(through.objects.filter(user_id=user.id, post_id__in=post_ids).values_list("post_id", flat=True))
+        for post_id in post_ids:
+            size = buffer.record(user.id, post_id, reaction, operations[(post_id, reaction)], post_id in stored)
+    bump_feed_generation()  # cached pages were serialized without these deltas
+    flusher.wake(now=size >= max_items())
+
+def existing(pending):
+    # the buffered operations whose post and user still exist: rows for deleted ones would fail the whole
+    # insert on a foreign key, on every flush
+    post_ids = set(Post.objects.filter(id__in={post_id for _, post_id, _ in pending}).values_list("id", flat=True))
+    user_ids = set(User.objects.filter(id__in={user_id for user_id, _, _ in pending}).values_list("id", flat=True))
+    return {key: value for key, value in pending.items() if key[1] in post_ids and key[0] in user_ids}
+
+def flush_reactions():
+    # write everything buffered in one transaction: one INSERT and one DELETE per reaction and user, then
+    # recount the touched posts from the join tables. Reads keep counting the batch until it has committed.
+    pending = buffer.drain()
+    if not pending:
+        return 0
+    try:
+        with transaction.atomic():
+            batch = existing(pending)
+            for reaction, through in REACTION_THROUGH.items():
+                added, removed = [], {}
+                for (user_id, post_id, op_reaction), (state, _) in batch.items():
+                    if op_reaction != reaction:
+                        continue
+                    if state:
+                        added.append(through(user_id=user_id, post_id=post_id))
+                    else:
+                        removed.setdefault(user_id, []).append(post_id)
+                through.objects.bulk_create(added, ignore_conflicts=True)
+                for user_id, post_ids in removed.items():
+                    through.objects.filter(user_id=user_id, post_id__in=post_ids).delete()
+
+            post_ids = {post_id for _, post_id, _ in batch}
+            Post.objects.filter(id__in=post_ids).update(
+                like_count=through_count_subquery(Post.liked_by.through, "post"),
+                dislike_count=through_count_subquery(Post.disliked_by.through, "post"),
+            )
+            bump_feed_generation()
+            transaction.on_commit(lambda: broker.publish("reaction", post_ids))
+    except IntegrityError:
+        # permanent (e.g. a post deleted after the check above): retrying the same rows can't succeed
+        buffer.settle(pending)
+        logger.exception("Dropped %d buffered reactions that could not be written", len(pending))
+        return 0
+    except Exception:
+        buffer.requeue(pending)
+        raise
+    transaction.on_commit(lambda: buffer.settle(pending))  # at once, unless called inside an outer transaction
+    return len(batch)
+
+
+class Flusher:
+    # background thread flushing the buffer every flush_interval(), or at once when woken with now=True
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def wake(self, now=False):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="reaction-buffer-flusher", daemon=True)
+                self._thread.start()
+                atexit.register(flush_reactions)
+        if now:
+            self._wake.set()
+
+    def run(self):
+        while True:
+            self._wake.wait(flush_interval())
+            self._wake.clear()
+            try:
+                flush_reactions()
+            except Exception:
+                logger.exception("Reaction buffer flush failed; the reactions stay buffered for the next one")
+            finally:
+                close_old_connections()
+
+
+flusher = Flusher()
@@ -0,0 +1,50 @@
+import re
+
+from django.db import connection
+
+from .models import FEED_VALUES, Post, serialize_rows
+
+# Full-text search over post bodies and poster usernames. network_post_search is an SQLite FTS5 table keyed by
+# post id; triggers on network_post and network_user (migration 0009) keep it in step with every write path,
+# bulk_create included. Results are ranked by bm25 and paged on (rank, id).
+
+SEARCH_TABLE = "network_post_search"
+MAX_TERMS = 10
+
+def match_expression(query):
+    # each word as a quoted prefix term, so user input can't inject FTS5 operators; all terms must match
+    terms = re.findall(r"\w+", query)[:MAX_TERMS]
+    if not terms:
+        raise ValueError("Invalid search query")
+    return " ".join(f'"{term}"*' for term in terms)
+
+def search_keys(query, batch_size, after=None):
+    # [(rank, post_id)] of the next page; bm25 ranks are negative, better matches lower
+    sql = f"SELECT rank, rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s"
+    params = [match_expression(query)]
+    if after is not None:
+        rank, post_id = after
+        sql += " AND (rank > %s OR (rank = %s AND rowid > %s))"
+        params += [rank, rank, post_id]
+    sql += " ORDER BY rank, rowid LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [batch_size])
+        return cursor.fetchall()
+
+def search_page(query, batch_size, after=None):
+    # serialized posts in rank order, and the last key when more results may follow
+    keys = search_keys(query, batch_size, after)
+    rows = {row[0]: row for row in Post.objects.filter(id__in=[post_id for _, post_id in keys]).values_list(*FEED_VALUES)}
+    serialized_posts = serialize_rows([rows[post_id] for _, post_id in keys if post_id in rows])
+    return serialized_posts, keys[-1] if len(keys) == batch_size else None
+
+def rebuild_index():
+    # repopulate the table from scratch, e.g. after restoring a database copied without it
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, body, poster) "
+            "SELECT p.id, p.body, u.username FROM network_post p JOIN network_user u ON u.id = p.poster_id"
+        )
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
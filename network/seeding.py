@@ -0,0 +1,84 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import Post, TimelineEntry, User, through_count_subquery
+from .timeline import fanout_threshold
+
+# Reproducible synthetic social graph for benchmarks: follower counts follow a Zipf-like power law (a few
+# accounts are followed by most users), posts are spread evenly and reactions lean towards popular posters.
+
+def seed_network(users=1000, posts_per_user=10, following_per_user=20, reactions_per_post=5,
+                 exponent=1.2, seed=42, prefix="seed", batch_size=5000):
+    rng = random.Random(seed)
+    password = make_password("password")  # hash once; every seeded user shares it
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            [User(username=f"{prefix}_user_{i}", email=f"{prefix}_user_{i}@example.com", password=password)
+             for i in range(users)],
+            batch_size=batch_size,
+        )
+        user_ids = list(User.objects.filter(username__startswith=f"{prefix}_user_")
+                        .order_by("id").values_list("id", flat=True))
+        # rank 1 is the most followed account
+        cum_weights = list(accumulate(1 / (rank ** exponent) for rank in range(1, len(user_ids) + 1)))
+
+        follows = set()
+        for follower_id in user_ids:
+            for followee_id in rng.choices(user_ids, cum_weights=cum_weights, k=following_per_user):
+                if followee_id != follower_id:
+                    follows.add((follower_id, followee_id))
+        Follow = User.following.through
+        Follow.objects.bulk_create(
+            [Follow(from_user_id=follower_id, to_user_id=followee_id) for follower_id, followee_id in sorted(follows)],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+
+        Post.objects.bulk_create(
+            [Post(poster_id=user_id, body=f"Seeded post {n} by user {user_id}")
+             for n in range(posts_per_user) for user_id in user_ids],
+            batch_size=batch_size,
+        )
+        posts = list(Post.objects.filter(poster_id__in=user_ids).values_list("id", "poster_id", "timestamp"))
+
+        likes, dislikes = set(), set()
+        for post_id, poster_id, _ in posts:
+            for reactor_id in rng.choices(user_ids, cum_weights=cum_weights, k=reactions_per_post):
+                if reactor_id != poster_id:
+                    (likes if rng.random() < 0.8 else dislikes).add((post_id, reactor_id))
+        for through, rows in ((Post.liked_by.through, likes), (Post.disliked_by.through, dislikes)):
+            through.objects.bulk_create([through(post_id=post_id, user_id=user_id) for post_id, user_id in sorted(rows)],
+                                        batch_size=batch_size, ignore_conflicts=True)
+
+        # bulk_create skips the m2m_changed handlers, so fill in the counters and timelines they would have
+        Post.objects.filter(poster_id__in=user_ids).update(
+            like_count=through_count_subquery(Post.liked_by.through, "post"),
+            dislike_count=through_count_subquery(Post.disliked_by.through, "post"),
+        )
+        User.objects.filter(id__in=user_ids).update(
+            following_count=through_count_subquery(Follow, "from_user"),
+            follower_count=through_count_subquery(Follow, "to_user"),
+        )
+        User.objects.filter(id__in=user_ids, follower_count__gt=fanout_threshold()).update(fanout_on_read=True)
+
+        followers = {}
+        for follower_id, followee_id in follows:
+            followers.setdefault(followee_id, []).append(follower_id)
+        pulled = set(User.objects.filter(id__in=user_ids, fanout_on_read=True).values_list("id", flat=True))
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=follower_id, post_id=post_id, poster_id=poster_id, timestamp=timestamp)
+             for post_id, poster_id, timestamp in posts if poster_id not in pulled
+             for follower_id in followers.get(poster_id, ())],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+
+    return {
+        "users": len(user_ids),
+        "follows": len(follows),
+        "posts": len(posts),
+        "likes": len(likes),
+        "dislikes": len(dislikes),
+    }
@@ -0,0 +1,115 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .auth import forget_users
+from .events import broker
+from .feed_cache import bump_feed_generation, bump_follow_generation
+from .follow_graph import graph
+from .models import Post, User
+from .tags import unindex_post
+
+# M2M field -> (counter on the model declaring it, counter on the related model)
+COUNTED_RELATIONS = {
+    Post._meta.get_field("liked_by"): ("like_count", None),
+    Post._meta.get_field("disliked_by"): ("dislike_count", None),
+    User._meta.get_field("following"): ("following_count", "follower_count"),
+}
+COUNTED_THROUGH = {field.remote_field.through: field for field in COUNTED_RELATIONS}
+
+def bump(model, pks, counter, delta):
+    if counter and pks and delta:
+        model.objects.filter(pk__in=pks).update(**{counter: F(counter) + delta})
+
+@receiver(m2m_changed)
+def update_relation_counters(sender, instance, action, reverse, model, pk_set, **kwargs):
+    # runs inside the same transaction as the M2M insert/delete, so counters never drift from the join tables
+    field = COUNTED_THROUGH.get(sender)
+    if field is None:
+        return
+
+    if action in ("pre_remove", "pre_clear"):
+        # remove() reports the requested pks whether or not they were related and clear() reports none,
+        # so remember which rows are actually about to go
+        own_column, other_column = field.m2m_column_name(), field.m2m_reverse_name()
+        if reverse:
+            own_column, other_column = other_column, own_column
+        rows = sender.objects.filter(**{own_column: instance.pk})
+        if action == "pre_remove":
+            rows = rows.filter(**{f"{other_column}__in": pk_set})
+        instance._removed_pks = set(rows.values_list(other_column, flat=True))
+        return
+    if action in ("post_remove", "post_clear"):
+        pk_set, delta = instance.__dict__.pop("_removed_pks", set()), -1
+    elif action == "post_add":
+        delta = 1
+    else:
+        return
+
+    if field.model is Post:
+        bump_feed_generation()
+        changed_posts = set(pk_set) if reverse else {instance.pk}
+        if pk_set:
+            transaction.on_commit(lambda: broker.publish("reaction", changed_posts))
+    else:
+        bump_follow_generation()
+        forget_users({instance.pk, *pk_set}) # cached logged-in users carry the counters
+        pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]  # (follower, followee)
+        transaction.on_commit(lambda: graph.apply(pairs, followed=delta > 0))
+
+    source_counter, target_counter = COUNTED_RELATIONS[field]
+    instance_counter, related_counter = (target_counter, source_counter) if reverse else (source_counter, target_counter)
+    bump(type(instance), [instance.pk], instance_counter, delta * len(pk_set))
+    bump(model, pk_set, related_counter, delta)
+    if instance_counter:
+        instance.refresh_from_db(fields=[instance_counter])
+
+@receiver(pre_delete, sender=User)
+def release_deleted_user_counts(sender, instance, **kwargs):
+    # deleting a user cascades their follow and reaction rows without m2m_changed, so take them back out of
+    # the other side's counters here, in the deleting transaction
+    followees = set(instance.following.values_list("id", flat=True))
+    followers = set(instance.followers.values_list("id", flat=True))
+    liked = list(instance.likes.values_list("id", flat=True))
+    disliked = list(instance.dislikes.values_list("id", flat=True))
+    bump(User, followees, "follower_count", -1)
+    bump(User, followers, "following_count", -1)
+    bump(Post, liked, "like_count", -1)
+    bump(Post, disliked, "dislike_count", -1)
+    if followees or followers:
+        bump_follow_generation()
+        forget_users(followees | followers)
+    if liked or disliked:
+        bump_feed_generation()
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_feed_cache(sender, **kwargs):
+    bump_feed_generation()
+
+@receiver(post_save, sender=Post)
+def announce_new_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: broker.publish("post", [instance.pk]))
+
+@receiver(pre_delete, sender=Post)
+def forget_post_tags(sender, instance, **kwargs):
+    # the side rows would cascade anyway, but the hourly hashtag counts have to be taken back
+    unindex_post(instance)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_users([instance.pk])
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user_follows(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: graph.remove_user(user_id))
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, user, **kwargs):
+    if user is not None:
+        forget_users([user.pk])
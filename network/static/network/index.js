@@ -29,6 +29,30 @@ document.addEventListener("DOMContentLoaded", function () {
   }
 
   let currentFilter = "all-posts";
+  let feedOnScreen = true; // false while a profile's posts are shown
+
+  // Last ETag and body per URL; the server answers a matching If-None-Match with an empty 304
+  const etagCache = new Map();
+
+  function fetchJsonWithEtag(url) {
+    const cached = etagCache.get(url);
+    const headers = cached ? { "If-None-Match": cached.etag } : {};
+    return fetch(url, { headers, cache: "no-store" }).then((response) => {
+      if (response.status === 304 && cached) {
+        return cached.data;
+      }
+      if (!response.ok) {
+        throw new Error(`Request to ${url} failed`);
+      }
+      return response.json().then((data) => {
+        const etag = response.headers.get("ETag");
+        if (etag) {
+          etagCache.set(url, { etag, data });
+        }
+        return data;
+      });
+    });
+  }
 
   const postManager = (function () {
     let offset = 0;
@@ -38,6 +62,12 @@ document.addEventListener("DOMContentLoaded", function () {
       offset = 0;
     }
 
+    // New posts announced by /events go on top, so the next page starts that much further down
+    function prependPosts(posts) {
+      renderPosts(posts, true, true);
+      offset += posts.length;
+    }
+
     function loadPosts(filter, append = false) {
       spinner.style.display = "block";
       const params = new URLSearchParams({
@@ -45,15 +75,7 @@ document.addEventListener("DOMContentLoaded", function () {
         offset,
         batchSize,
       });
-      fetch(
-        `/posts-data?${params.toString()}`
-      )
-        .then((response) => {
-          if (!response.ok) {
-            throw new Error("Posts could not be successfully retrieved");
-          }
-          return response.json();
-        })
+      fetchJsonWithEtag(`/posts-data?${params.toString()}`)
         .then((posts) => {
           renderPosts(posts, append);
           offset += posts.length;
@@ -73,21 +95,9 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     function handleTogglingRequest(toggleArg) {
-      const refId = toggleArg.id;
-      let errorVar;
-      let urlPath;
-      if (toggleArg.type === "user") {
-        errorVar = "follow";
-        urlPath = "follow-status/";
-      } else {
-        urlPath =
-          toggleArg.opinion === "like" ? "like-update/" : "dislike-update/";
-        errorVar = toggleArg.opinion === "like" ? "like" : "dislike";
-      }
-
+      // follows only: reactions go through reactionQueue
       spinner.style.display = "block";
-      const params = new URLSearchParams({ offset, batchSize, });
-      fetch(`/${urlPath}${refId}?${params.toString()}`, {
+      fetch(`/follow-status/${toggleArg.id}`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
@@ -98,21 +108,15 @@ document.addEventListener("DOMContentLoaded", function () {
           if (response.ok) {
             return response.json();
           } else {
-            throw new Error(`Failed to toggle ${errorVar} status`);
+            throw new Error("Failed to toggle follow status");
           }
         })
 
         .then((updatedResponse) => {
-          if (toggleArg.type === "user") {
-            const updatedProfile = updatedResponse.profile;
-            renderProfile(updatedProfile);
-          } else {
-            const updatedPosts = updatedResponse.posts;
-            renderPosts(updatedPosts, false);
-          }
+          applyFollowDelta(updatedResponse.user);
         })
         .catch((error) => {
-          handleUserError(`Failed to toggle ${errorVar} status`, error);
+          handleUserError("Failed to toggle follow status", error);
         })
         .finally(() => {
           spinner.style.display = "none";
@@ -157,6 +161,7 @@ document.addEventListener("DOMContentLoaded", function () {
 
     return {
       resetOffset,
+      prependPosts,
       loadPosts,
       handleNewPost,
       handleTogglingRequest,
@@ -261,9 +266,9 @@ document.addEventListener("DOMContentLoaded", function () {
           return;
         }
 
-        const unfollowButton = event.target.closest(".unfollow-button");
-        if (unfollowButton) {
-          const userId = unfollowButton.dataset.userId;
+        const followButton = event.target.closest(".unfollow-button, .follow-back-button");
+        if (followButton) {
+          const userId = followButton.dataset.userId;
           handleFollowRequest(event, userId);
         }
       });
@@ -278,10 +283,11 @@ document.addEventListener("DOMContentLoaded", function () {
     postManager.handleTogglingRequest(toggleArg);
   }
 
-  function handleFollowDisplay(event, option) {
+  function handleFollowDisplay(event, option, cursor = "") {
     event.preventDefault();
     spinner.style.display = "block";
-    fetch(`/follow-usernames/${option}`, {
+    const params = new URLSearchParams({ cursor, batchSize: 50 });
+    fetch(`/follow-usernames/${option}?${params.toString()}`, {
       method: "GET",
       headers: {
         "Content-Type": "application/json",
@@ -295,7 +301,7 @@ document.addEventListener("DOMContentLoaded", function () {
         return response.json();
       })
       .then((data) => {
-        renderUsernames(data.usernames, data.ids, option);
+        renderUsernames(data.usernames, data.ids, option, data.next_cursor, cursor !== "");
       })
       .catch((error) => {
         handleUserError("Could not retrieve data", error);
@@ -305,16 +311,70 @@ document.addEventListener("DOMContentLoaded", function () {
       });
   }
 
+  // Reaction clicks are queued for a moment and sent together to /reactions, so a quick run of clicks
+  // costs one request; repeated clicks on the same post and reaction collapse into one operation.
+  const reactionQueue = (function () {
+    const pending = new Map();
+    let timer = null;
+
+    function flush() {
+      timer = null;
+      const operations = Array.from(pending.values());
+      pending.clear();
+      if (!operations.length) {
+        return;
+      }
+      fetch("/reactions", {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "X-CSRFToken": getCookie("csrftoken"),
+        },
+        body: JSON.stringify({ operations }),
+      })
+        .then((response) => {
+          if (!response.ok) {
+            throw new Error("Failed to update reactions");
+          }
+          return response.json();
+        })
+        .then((data) => {
+          data.posts.forEach(applyPostDelta);
+          // the rest of the batch is applied; only these operations failed (e.g. the post was deleted)
+          if (data.errors.length) {
+            handleUserError(data.errors[0].error, data.errors);
+          }
+        })
+        .catch((error) => {
+          handleUserError("Failed to update reactions", error);
+        });
+    }
+
+    function add(postId, reaction) {
+      pending.set(`${postId}:${reaction}`, {
+        post_id: Number(postId),
+        reaction,
+        state: true,
+      });
+      if (pending.size >= 100) {
+        clearTimeout(timer);
+        flush();
+      } else if (!timer) {
+        timer = setTimeout(flush, 250);
+      }
+    }
+
+    return { add };
+  })();
+
   function handleLikeUpdate(event, postId) {
     event.preventDefault();
-    const toggleArg = { type: "post", id: postId, opinion: "like" };
-    postManager.handleTogglingRequest(toggleArg);
+    reactionQueue.add(postId, "like");
   }
 
   function handleDislikeUpdate(event, postId) {
     event.preventDefault();
-    const toggleArg = { type: "post", id: postId, opinion: "dislike" };
-    postManager.handleTogglingRequest(toggleArg);
+    reactionQueue.add(postId, "dislike");
   }
 
   function handleLoginSubmit(event) {
@@ -362,6 +422,7 @@ document.addEventListener("DOMContentLoaded", function () {
   function handlePostRequest(event, postRequest) {
     event.preventDefault();
     currentFilter = postRequest;
+    feedOnScreen = true;
     postManager.resetOffset();
     postManager.loadPosts(postRequest, false);
   }
@@ -369,15 +430,10 @@ document.addEventListener("DOMContentLoaded", function () {
   function handleProfileRequest(event, userId) {
     event.preventDefault();
     console.log("Fetching profile for userId:", userId);
+    feedOnScreen = false;
 
     spinner.style.display = "block";
-    fetch(`/profile-data/${userId}`)
-      .then((response) => {
-        if (!response.ok) {
-          throw new Error("Profile could not be retrieved");
-        }
-        return response.json();
-      })
+    fetchJsonWithEtag(`/profile-data/${userId}`)
       .then((profile) => {
         const profilePosts = profile.posts;
         renderProfile(profile);
@@ -391,7 +447,43 @@ document.addEventListener("DOMContentLoaded", function () {
       });
   }
 
+  let currentProfile = null;
+
+  function applyPostDelta(post) {
+    document
+      .querySelectorAll(`.post[data-post-id="${post.id}"]`)
+      .forEach((postElement) => {
+        postElement.querySelector(".like-count").innerHTML = post.like_count;
+        postElement.querySelector(".dislike-count").innerHTML =
+          post.dislike_count;
+      });
+  }
+
+  function applyFollowDelta(user) {
+    if (currentProfile && currentProfile.user_id === user.id) {
+      currentProfile.follower_count = user.follower_count;
+      currentProfile.following_count = user.following_count;
+      currentProfile.viewer_follows = user.viewer_follows;
+      renderProfile(currentProfile);
+    } else if (currentProfile && currentProfile.user_id === currentProfile.viewer_id) {
+      currentProfile.following_count = user.viewer_following_count;
+    }
+
+    const usernamesView = document.getElementById("usernames-view");
+    if (usernamesView && !user.viewer_follows) {
+      usernamesView
+        .querySelectorAll(`.unfollow-button[data-user-id="${user.id}"]`)
+        .forEach((button) => button.closest("li").remove());
+    }
+    if (usernamesView && user.viewer_follows) {
+      usernamesView
+        .querySelectorAll(`.follow-back-button[data-user-id="${user.id}"]`)
+        .forEach((button) => button.remove());
+    }
+  }
+
   function renderProfile(profile) {
+    currentProfile = profile;
     const usernamesView = document.getElementById("usernames-view");
     const postsView = document.getElementById("posts-view");
     const newPostsView = document.getElementById("new-post-view");
@@ -416,7 +508,7 @@ document.addEventListener("DOMContentLoaded", function () {
     if (profile.user_id !== profile.viewer_id) {
       const followUnfollowBtn = document.createElement("button");
 
-      if (profile.follower_ids.includes(profile.viewer_id)) {
+      if (profile.viewer_follows) {
         followUnfollowBtn.innerHTML = "Unfollow";
         followUnfollowBtn.id = "unfollow-btn";
         followUnfollowBtn.dataset.userId = profile.user_id;
@@ -429,7 +521,83 @@ document.addEventListener("DOMContentLoaded", function () {
     }
   }
 
-  function renderPosts(posts, append) {
+  // Live updates over Server-Sent Events: the server sends the ids of new posts and, coalesced per
+  // second, the counts of on-screen posts whose reactions changed. The stream is reopened (debounced)
+  // whenever the set of on-screen posts changes, resuming from the last event id seen (EventSource only
+  // sends it itself when it reconnects on its own).
+  const liveUpdates = (function () {
+    let source = null;
+    let watched = "";
+    let timer = null;
+    let lastEventId = "";
+
+    function onScreenPostIds() {
+      return Array.from(document.querySelectorAll("#posts-view .post"))
+        .map((postElement) => postElement.dataset.postId)
+        .slice(0, 200)
+        .join(",");
+    }
+
+    function connect() {
+      const ids = onScreenPostIds();
+      if (source && ids === watched) {
+        return;
+      }
+      if (source) {
+        source.close();
+      }
+      watched = ids;
+      const params = new URLSearchParams({ posts: ids });
+      if (lastEventId) {
+        params.set("lastEventId", lastEventId);
+      }
+      source = new EventSource(`/events?${params.toString()}`);
+      ["posts", "reactions", "reset", "progress"].forEach((type) =>
+        source.addEventListener(type, (event) => {
+          lastEventId = event.lastEventId || lastEventId;
+        })
+      );
+      source.addEventListener("posts", (event) => {
+        const newIds = JSON.parse(event.data).ids;
+        if (!feedOnScreen || currentFilter !== "all-posts" || !newIds.length) {
+          return;
+        }
+        const params = new URLSearchParams({ filter: "ids", ids: newIds.join(",") });
+        fetch(`/posts-data?${params.toString()}`)
+          .then((response) => (response.ok ? response.json() : []))
+          .then((posts) =>
+            postManager.prependPosts(
+              posts.filter(
+                (post) => !document.querySelector(`.post[data-post-id="${post.id}"]`)
+              )
+            )
+          );
+      });
+      source.addEventListener("reactions", (event) => {
+        JSON.parse(event.data).posts.forEach(applyPostDelta);
+      });
+      source.addEventListener("reset", () => {
+        // missed too many events to catch up; start over from the first page
+        if (!feedOnScreen) {
+          return;
+        }
+        postManager.resetOffset();
+        postManager.loadPosts(currentFilter, false);
+      });
+    }
+
+    function refresh() {
+      if (!isAuthenticated || typeof EventSource === "undefined") {
+        return;
+      }
+      clearTimeout(timer);
+      timer = setTimeout(connect, 500);
+    }
+
+    return { refresh };
+  })();
+
+  function renderPosts(posts, append, prepend = false) {
     const usernamesView = document.getElementById("usernames-view");
     const postsView = document.getElementById("posts-view");
     const newPostsView = document.getElementById("new-post-view");
@@ -446,10 +614,12 @@ document.addEventListener("DOMContentLoaded", function () {
     newPostsView.style.display = "block"; // Show the new-posts-view
     profileView.style.display = "block";
 
+    const newPostElements = [];
     posts.forEach((post) => {
       // Dynamically create HTML for each post
       const postElement = document.createElement("div");
       postElement.classList.add("post"); // Add a class for styling
+      postElement.dataset.postId = post.id;
 
       postElement.innerHTML = `
         <div>
@@ -464,16 +634,51 @@ document.addEventListener("DOMContentLoaded", function () {
         <div style="display:inline-block; cursor: pointer"
              class="dislike-button"
              data-post-id="${post.id}">👎</div>
-        <div style="display:inline-block">Likes: ${post.like_count}</div>
-        <div style="display:inline-block">Dislikes: ${post.dislike_count}</div>
+        <div style="display:inline-block">Likes: <span class="like-count">${post.like_count}</span></div>
+        <div style="display:inline-block">Dislikes: <span class="dislike-count">${post.dislike_count}</span></div>
         <br></br>
       `;
 
-      postsView.appendChild(postElement); // Append the new post to the posts view
+      if (prepend) {
+        newPostElements.push(postElement);
+      } else {
+        postsView.appendChild(postElement); // Append the new post to the posts view
+      }
     });
+    postsView.prepend(...newPostElements);
+    liveUpdates.refresh();
+  }
+
+  // Follow state for a page of followers comes from one /relationships request rather than from anyone's
+  // full follower list: followers the viewer doesn't follow get a "Follow back" button.
+  function markFollowBacks(ul, ids) {
+    fetch(`/relationships?ids=${ids.join(",")}`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error("Data could not be retrieved");
+        }
+        return response.json();
+      })
+      .then((data) => {
+        data.relationships.forEach((relationship) => {
+          const link = ul.querySelector(`.following-user-link[data-user-id="${relationship.user_id}"]`);
+          if (!link || relationship.following) {
+            return;
+          }
+          const followBackBtn = document.createElement("button");
+          followBackBtn.innerHTML = "Follow back";
+          followBackBtn.style.marginLeft = "10px";
+          followBackBtn.classList.add("follow-back-button");
+          followBackBtn.dataset.userId = relationship.user_id;
+          link.closest("li").appendChild(followBackBtn);
+        });
+      })
+      .catch((error) => {
+        handleUserError("Could not retrieve follow status", error);
+      });
   }
 
-  function renderUsernames(usernames, ids, option) {
+  function renderUsernames(usernames, ids, option, nextCursor, append) {
     const usernamesView = document.getElementById("usernames-view");
     const postsView = document.getElementById("posts-view");
     const profileView = document.getElementById("profile-view");
@@ -481,13 +686,23 @@ document.addEventListener("DOMContentLoaded", function () {
     postsView.style.display = "none";
     profileView.style.display = "none";
     usernamesView.style.display = "block";
-    usernamesView.innerHTML = "";
 
-    const h3 = document.createElement("h3");
-    h3.innerHTML =
-      option === "following" ? "You are following:" : "You are followed by:";
+    const previousMoreBtn = usernamesView.querySelector(".more-usernames-button");
+    if (previousMoreBtn) {
+      previousMoreBtn.remove();
+    }
+
+    let ul = usernamesView.querySelector("ul");
+    if (!append || !ul) {
+      usernamesView.innerHTML = "";
+      const h3 = document.createElement("h3");
+      h3.innerHTML =
+        option === "following" ? "You are following:" : "You are followed by:";
+      usernamesView.appendChild(h3);
+      ul = document.createElement("ul");
+      usernamesView.appendChild(ul);
+    }
 
-    const ul = document.createElement("ul");
     usernames.forEach((username, index) => {
       const li = document.createElement("li");
       li.innerHTML = `
@@ -508,7 +723,18 @@ document.addEventListener("DOMContentLoaded", function () {
       ul.appendChild(li);
     });
 
-    usernamesView.appendChild(h3);
-    usernamesView.appendChild(ul);
+    if (option === "followers" && ids.length) {
+      markFollowBacks(ul, ids);
+    }
+
+    if (nextCursor) {
+      const moreBtn = document.createElement("button");
+      moreBtn.innerHTML = "Show more";
+      moreBtn.classList.add("more-usernames-button");
+      moreBtn.addEventListener("click", (event) =>
+        handleFollowDisplay(event, option, nextCursor)
+      );
+      usernamesView.appendChild(moreBtn);
+    }
   }
 });
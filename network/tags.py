@@ -0,0 +1,73 @@
+import re
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Hashtag, HashtagActivity, Mention, PostHashtag, User
+
+# Hashtags and @mentions are parsed once when a post is written and stored in indexed side tables, so the
+# tag and mention feeds and the trending list never scan post bodies.
+
+# a word longer than Hashtag.name's max_length isn't a hashtag at all, rather than one cut short
+HASHTAG_MAX_LENGTH = Hashtag._meta.get_field("name").max_length
+HASHTAG_RE = re.compile(rf"(?<![\w#])#(\w{{1,{HASHTAG_MAX_LENGTH}}})(?!\w)")
+MENTION_RE = re.compile(r"(?<![\w@])@(\w(?:[\w.@+-]{0,148}\w)?)")
+
+def extract_hashtags(body):
+    # lowercasing can lengthen a few characters (e.g. "İ"), so the limit is checked again afterwards
+    return {name for name in (tag.lower() for tag in HASHTAG_RE.findall(body)) if len(name) <= HASHTAG_MAX_LENGTH}
+
+def extract_mentions(body):
+    return set(MENTION_RE.findall(body))
+
+def activity_hour(timestamp):
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def bump_activity(hashtag_ids, timestamp, delta):
+    hour = activity_hour(timestamp)
+    if delta > 0:
+        HashtagActivity.objects.bulk_create(
+            [HashtagActivity(hashtag_id=hashtag_id, hour=hour) for hashtag_id in hashtag_ids],
+            ignore_conflicts=True,
+        )
+    HashtagActivity.objects.filter(hashtag_id__in=hashtag_ids, hour=hour).update(count=F("count") + delta)
+
+def unindex_post(post):
+    # forget a post's tags and mentions, taking its hashtags back out of the hourly counts
+    hashtag_ids = list(PostHashtag.objects.filter(post=post).values_list("hashtag_id", flat=True))
+    if hashtag_ids:
+        bump_activity(hashtag_ids, post.timestamp, -1)
+        PostHashtag.objects.filter(post=post).delete()
+    Mention.objects.filter(post=post).delete()
+
+def index_post(post, reindex=False):
+    # call inside the transaction that saves the post; pass reindex=True after editing its body
+    if reindex:
+        unindex_post(post)
+
+    names = extract_hashtags(post.body)
+    if names:
+        Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+        hashtag_ids = list(Hashtag.objects.filter(name__in=names).values_list("id", flat=True))
+        PostHashtag.objects.bulk_create(
+            [PostHashtag(post=post, hashtag_id=hashtag_id, timestamp=post.timestamp) for hashtag_id in hashtag_ids],
+            ignore_conflicts=True,
+        )
+        bump_activity(hashtag_ids, post.timestamp, 1)
+
+    usernames = extract_mentions(post.body)
+    if usernames:
+        user_ids = User.objects.filter(username__in=usernames).values_list("id", flat=True)
+        Mention.objects.bulk_create(
+            [Mention(post=post, user_id=user_id, timestamp=post.timestamp) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+
+def trending_hashtags(hours, limit):
+    since = activity_hour(timezone.now() - timedelta(hours=hours - 1))
+    return list(HashtagActivity.objects.filter(hour__gte=since, count__gt=0)
+                .values("hashtag__name")
+                .annotate(total=Sum("count"))
+                .order_by("-total", "hashtag__name")
+                .values_list("hashtag__name", "total")[:limit])
@@ -0,0 +1,10 @@
+from django import template
+
+from network.assets import asset_url
+
+register = template.Library()
+
+@register.simple_tag
+def asset(name):
+    # URL of the built, content-hashed copy of a static asset (see network.assets), or its plain static URL
+    return asset_url(name)
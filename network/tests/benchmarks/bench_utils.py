@@ -0,0 +1,81 @@
+import json
+import os
+import statistics
+import subprocess
+import time
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Benchmarks seed their own data and take minutes, so they only run when NETWORK_BENCHMARKS=1 is set:
+#   NETWORK_BENCHMARKS=1 python -m pytest network/tests/benchmarks
+# Results are merged into a JSON report (NETWORK_BENCHMARK_REPORT, default benchmark_report.json) that can be
+# diffed between commits.
+
+requires_benchmarks = pytest.mark.skipif(
+    not os.environ.get("NETWORK_BENCHMARKS"), reason="set NETWORK_BENCHMARKS=1 to run benchmarks"
+)
+
+# keyword arguments for network.seeding.seed_network
+DATA_SIZES = {
+    "small": {"users": 100, "posts_per_user": 10, "following_per_user": 10, "reactions_per_post": 3},
+    "medium": {"users": 1000, "posts_per_user": 10, "following_per_user": 20, "reactions_per_post": 5},
+    "large": {"users": 5000, "posts_per_user": 20, "following_per_user": 50, "reactions_per_post": 10},
+}
+
+def selected_sizes():
+    return os.environ.get("NETWORK_BENCHMARK_SIZES", "small,medium").split(",")
+
+def repeats():
+    return int(os.environ.get("NETWORK_BENCHMARK_REPEATS", 5))
+
+def report_path():
+    return os.environ.get("NETWORK_BENCHMARK_REPORT", os.path.join(settings.BASE_DIR, "benchmark_report.json"))
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def response_bytes(response):
+    if getattr(response, "streaming", False):
+        return len(b"".join(response.streaming_content))
+    return len(response.content)
+
+def measure(request, runs=None, before=None):
+    # time `request()` (a zero-argument callable returning a response) and record queries and size of the
+    # last run; `before()` runs untimed ahead of each run
+    timings = []
+    for _ in range(runs or repeats()):
+        if before:
+            before()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            size = response_bytes(response)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "status": response.status_code,
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "queries": len(queries),
+        "db_ms": round(sum(float(q["time"]) for q in queries) * 1000, 3),
+        "bytes": size,
+    }
+
+def write_report(section, results):
+    # merge one suite's results into the shared report so suites can be run separately
+    path = report_path()
+    report = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            report = json.load(f)
+    report["revision"] = git_revision()
+    report[section] = results
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
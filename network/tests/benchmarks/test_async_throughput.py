@@ -0,0 +1,82 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from network.models import User
+from network.seeding import seed_network
+from .bench_utils import DATA_SIZES, requires_benchmarks, selected_sizes, write_report
+
+pytestmark = requires_benchmarks
+
+CONCURRENCY = 16
+REQUESTS = 200
+READ_ENDPOINTS = [
+    ("get_posts", None, {"filter": "following", "offset": 0, "batchSize": 25}),
+    ("get_posts", None, {"filter": "my-posts", "cursor": "", "batchSize": 25}),
+    ("get_profile", "target", {"offset": 0, "batchSize": 25}),
+    ("get_follow_usernames", "followers", {"batchSize": 50}),
+]
+
+@pytest.fixture(scope="module")
+def throughput_results():
+    results = {}
+    yield results
+    write_report("async_throughput", results)
+
+def wsgi_requests_per_second(cookies, url, params):
+    # sync views through the WSGI handler, CONCURRENCY worker threads as a threaded WSGI server would use
+    def worker(count):
+        client = Client()
+        client.cookies = cookies
+        for _ in range(count):
+            assert client.get(url, data=params).status_code == 200
+        connections.close_all()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        list(pool.map(worker, [REQUESTS // CONCURRENCY] * CONCURRENCY))
+    return REQUESTS / (time.perf_counter() - start)
+
+def asgi_requests_per_second(cookies, url, params):
+    # async views through the ASGI handler, CONCURRENCY requests in flight on one event loop
+    async def worker(count):
+        client = AsyncClient()
+        client.cookies = cookies
+        for _ in range(count):
+            assert (await client.get(url, data=params)).status_code == 200
+
+    async def run():
+        await asyncio.gather(*[worker(REQUESTS // CONCURRENCY) for _ in range(CONCURRENCY)])
+
+    start = time.perf_counter()
+    async_to_sync(run)()
+    return REQUESTS / (time.perf_counter() - start)
+
+@pytest.mark.parametrize("size", selected_sizes())
+def test_wsgi_vs_asgi_read_throughput(client, transactional_db, settings, size, throughput_results):
+    # -- Set-up --
+    seed_network(**DATA_SIZES[size], prefix=f"bench_{size}")
+    viewer = User.objects.order_by('-following_count').first()
+    target = User.objects.order_by('-follower_count').first()
+    client.force_login(viewer)
+    cookies = client.cookies
+
+    # -- Act --
+    for view_name, arg, params in READ_ENDPOINTS:
+        args = [target.id] if arg == "target" else [arg] if arg else None
+        settings.ROOT_URLCONF = "project4.urls"
+        wsgi_rps = wsgi_requests_per_second(cookies, reverse(view_name, args=args), params)
+        settings.ROOT_URLCONF = "network.async_urls"
+        asgi_rps = asgi_requests_per_second(cookies, reverse(view_name, args=args), params)
+
+        key = f"{size}/{view_name}:{params.get('filter', arg)}"
+        throughput_results[key] = {"wsgi_rps": round(wsgi_rps, 1), "asgi_rps": round(asgi_rps, 1),
+                                   "concurrency": CONCURRENCY, "requests": REQUESTS}
+
+    # -- Assert --
+    assert all(result["asgi_rps"] > 0 for result in throughput_results.values())
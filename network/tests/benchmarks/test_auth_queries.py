@@ -0,0 +1,48 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+from network.models import User
+from network.seeding import seed_network
+from .bench_utils import DATA_SIZES, measure, requires_benchmarks, selected_sizes, write_report
+
+pytestmark = requires_benchmarks
+
+# Queries and time per /posts-data request with the stock session/auth setup (database sessions, ModelBackend)
+# against the project's (cached_db sessions, network.auth.CachedModelBackend).
+SETUPS = {
+    "stock": ("django.contrib.sessions.backends.db", "django.contrib.auth.backends.ModelBackend"),
+    "cached": ("django.contrib.sessions.backends.cached_db", "network.auth.CachedModelBackend"),
+}
+FEED_PARAMS = [
+    {"filter": "all-posts", "offset": 0, "batchSize": 25},
+    {"filter": "following", "cursor": "", "batchSize": 25},
+]
+
+@pytest.fixture(scope="module")
+def auth_results():
+    results = {}
+    yield results
+    write_report("auth_queries", results)
+
+@pytest.mark.parametrize("size", selected_sizes())
+def test_per_request_queries(db, settings, size, auth_results):
+    # -- Set-up --
+    seed_network(**DATA_SIZES[size], prefix=f"bench_{size}")
+    viewer = User.objects.order_by('-following_count').first()
+
+    # -- Act --
+    for setup, (session_engine, backend) in SETUPS.items():
+        settings.SESSION_ENGINE = session_engine
+        settings.AUTHENTICATION_BACKENDS = [backend]
+        client = Client()  # a new handler, so the session middleware picks up the engine
+        client.force_login(viewer)
+        for params in FEED_PARAMS:
+            client.get(reverse("get_posts"), data=params)  # warm the session and user caches
+            auth_results[f"{size}/{setup}/{params['filter']}"] = measure(
+                lambda: client.get(reverse("get_posts"), data=params))
+
+    # -- Assert --
+    for params in FEED_PARAMS:
+        stock = auth_results[f"{size}/stock/{params['filter']}"]
+        cached = auth_results[f"{size}/cached/{params['filter']}"]
+        assert cached["queries"] <= stock["queries"] - 2
@@ -0,0 +1,76 @@
+import json
+import time
+import tracemalloc
+
+import pytest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from network import encoding
+from network.models import Post, User, serialize_rows
+from network.seeding import seed_network
+from .bench_utils import DATA_SIZES, repeats, requires_benchmarks, selected_sizes, write_report
+
+pytestmark = requires_benchmarks
+
+PAGE_SIZES = [25, 100, 1000]
+
+@pytest.fixture(scope="module")
+def encoding_results():
+    results = {}
+    yield results
+    write_report("encoding", results)
+
+def median_ms(encode, data):
+    timings = []
+    for _ in range(repeats()):
+        start = time.perf_counter()
+        encode(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(sorted(timings)[len(timings) // 2], 3)
+
+def peak_kib(produce):
+    tracemalloc.start()
+    try:
+        produce()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+@pytest.mark.parametrize("size", selected_sizes())
+def test_encode_time_and_export_memory(client, db, size, encoding_results):
+    # -- Set-up --
+    seed_network(**DATA_SIZES[size], prefix=f"bench_{size}")
+    pages = {page_size: Post.objects.serialize_page(0, page_size) for page_size in PAGE_SIZES}
+    exporter = User.objects.order_by('-id').first()
+    Post.objects.bulk_create([Post(poster=exporter, body=f"Exported post {i} " * 10) for i in range(5000)])
+    client.force_login(exporter)
+
+    # -- Act --
+    for page_size in PAGE_SIZES:
+        encoding_results[f"{size}/serialize/posts={page_size}"] = {
+            "instances_ms": median_ms(lambda n: [post.serialize() for post in
+                                                 Post.objects.select_related("poster").order_by('-timestamp', '-id')[:n]],
+                                      page_size),
+            "rows_ms": median_ms(lambda n: Post.objects.serialize_page(0, n), page_size),
+        }
+    for page_size, page in pages.items():
+        encoding_results[f"{size}/encode/posts={page_size}"] = {
+            "stdlib_ms": median_ms(lambda data: json.dumps(data, cls=DjangoJSONEncoder).encode(), page),
+            "orjson_ms": median_ms(encoding.dumps, page) if encoding.orjson else None,
+        }
+
+    def buffered_export():
+        rows = Post.objects.filter(poster=exporter).feed_rows()
+        return encoding.JsonResponse(serialize_rows(list(rows)), safe=False).content
+
+    def streamed_export():
+        response = client.get(reverse("export_posts"))
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    encoding_results[f"{size}/export/posts=5000"] = {
+        "buffered_peak_kib": peak_kib(buffered_export),
+        "streamed_peak_kib": peak_kib(streamed_export),
+    }
+
+    # -- Assert --
+    assert json.loads(b"".join(client.get(reverse("export_posts")).streaming_content))
@@ -0,0 +1,58 @@
+import pytest
+from django.urls import reverse
+from network.models import User, Post
+from network.seeding import seed_network
+from network.urls import urlpatterns
+from .bench_utils import DATA_SIZES, measure, requires_benchmarks, selected_sizes, write_report
+
+pytestmark = requires_benchmarks
+
+BATCH_SIZES = [5, 25, 100]
+POST_ROUTES = {"compose", "toggle_follow_status", "toggle_like_status", "toggle_dislike_status", "batch_reactions"}
+FEED_FILTERS = ["all-posts", "my-posts", "following"]
+STREAM_ROUTES = {"stream_events"}  # long-lived responses, not request/response timings
+
+@pytest.fixture(scope="module")
+def endpoint_results():
+    results = {}
+    yield results
+    write_report("endpoints", results)
+
+def route_kwargs(pattern, target_user, target_post):
+    values = {"user_id": target_user.id, "post_id": target_post.id, "option": "following",
+              "name": "bench", "username": target_user.username}
+    return {name: values[name] for name in pattern.pattern.converters}
+
+@pytest.mark.parametrize("size", selected_sizes())
+def test_endpoint_timings(client, db, settings, size, endpoint_results):
+    # -- Set-up --
+    settings.NETWORK_THROTTLE_ENABLED = False  # every write route is posted repeatedly by one user
+    seed_network(**DATA_SIZES[size], prefix=f"bench_{size}")
+    target_user = User.objects.order_by('-follower_count').first()      # the most followed account
+    viewer = User.objects.order_by('-following_count').first()          # the busiest Following feed
+    target_post = Post.objects.filter(poster=target_user).order_by('-id').first()
+
+    # -- Act --
+    for pattern in urlpatterns:
+        if pattern.name in STREAM_ROUTES:
+            continue
+        url = reverse(pattern.name, kwargs=route_kwargs(pattern, target_user, target_post))
+        method = "post" if pattern.name in POST_ROUTES else "get"
+        filters = FEED_FILTERS if pattern.name == "get_posts" else ["all-posts"]
+        for feed_filter in filters:
+            for batch_size in BATCH_SIZES:
+                params = f"?filter={feed_filter}&offset=0&batchSize={batch_size}"
+                body = {"poster": viewer.username, "body": "Benchmark post"}
+
+                def request():
+                    if method == "post":
+                        return client.post(url + params, body, content_type="application/json")
+                    return client.get(url + params)
+
+                name = pattern.name if pattern.name != "get_posts" else f"get_posts:{feed_filter}"
+                # logout ends the session, so log back in (untimed) before every request
+                endpoint_results[f"{size}/{name}/batch={batch_size}"] = measure(
+                    request, before=lambda: client.force_login(viewer))
+
+    # -- Assert --
+    assert all(result["status"] < 500 for key, result in endpoint_results.items() if key.startswith(size))
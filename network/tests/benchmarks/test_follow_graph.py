@@ -0,0 +1,77 @@
+import time
+import tracemalloc
+
+import pytest
+from network import follow_graph
+from network.follow_graph import FollowGraph
+from network.models import User
+from network.seeding import seed_network
+from .bench_utils import requires_benchmarks, write_report
+
+pytestmark = requires_benchmarks
+
+# Follow suggestions, mutual counts and degrees from the in-memory snapshot against the SQL fallback, on
+# follow graphs of about 16k, 120k and 430k edges (seed_network drops duplicate draws of popular accounts).
+GRAPH_SIZES = {
+    "16k": {"users": 2000, "following_per_user": 10},
+    "120k": {"users": 10000, "following_per_user": 16},
+    "430k": {"users": 25000, "following_per_user": 24},
+}
+VIEWERS = 50
+LIMIT = 10
+
+@pytest.fixture(scope="module")
+def graph_results():
+    results = {}
+    yield results
+    write_report("follow_graph", results)
+
+def per_call_us(call, arguments):
+    start = time.perf_counter()
+    for args in arguments:
+        call(*args)
+    return round((time.perf_counter() - start) / len(arguments) * 1e6, 1)
+
+@pytest.mark.parametrize("size", list(GRAPH_SIZES))
+def test_snapshot_against_sql(db, size, graph_results):
+    # -- Set-up --
+    seeded = seed_network(**GRAPH_SIZES[size], posts_per_user=0, reactions_per_post=0, prefix=f"graph_{size}")
+    users = list(User.objects.order_by('id').values_list('id', flat=True))
+    viewers = users[::len(users) // VIEWERS][:VIEWERS]
+    popular = list(User.objects.order_by('-follower_count').values_list('id', flat=True)[:VIEWERS])
+    pairs = list(zip(viewers, popular))
+    graph = FollowGraph()
+
+    # -- Act --
+    start = time.perf_counter()
+    graph.build()
+    build_ms = (time.perf_counter() - start) * 1000
+    tracemalloc.start()
+    FollowGraph().build()
+    peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+
+    graph_results[size] = {
+        "edges": seeded["follows"],
+        "build_ms": round(build_ms, 1),
+        "build_peak_kib": round(peak_kib, 1),
+        "suggestions_us": {"graph": per_call_us(graph.suggestions, [(viewer, LIMIT) for viewer in viewers]),
+                           "sql": per_call_us(follow_graph.sql_suggestions, [(viewer, LIMIT) for viewer in viewers])},
+        "mutual_count_us": {"graph": per_call_us(graph.mutual_count, pairs),
+                            "sql": per_call_us(lambda viewer, target:
+                                               follow_graph.mutual_count_query(viewer, target).count(), pairs)},
+        "degree_us": {"graph": per_call_us(graph.degree, [(user,) for user in popular])},
+        "apply_follow_us": per_call_us(lambda viewer, target: graph.apply([(viewer, target)], followed=True), pairs),
+    }
+
+    # -- Assert --
+    assert seeded["follows"] > 15000
+    fresh = FollowGraph()
+    fresh.build()
+    for viewer in viewers:
+        assert fresh.suggestions(viewer, LIMIT) == follow_graph.sql_suggestions(viewer, LIMIT)
+    for viewer, target in pairs:
+        assert fresh.mutual_count(viewer, target) == follow_graph.mutual_count_query(viewer, target).count()
+    result = graph_results[size]
+    assert result["suggestions_us"]["graph"] < result["suggestions_us"]["sql"]
+    assert result["mutual_count_us"]["graph"] < result["mutual_count_us"]["sql"]
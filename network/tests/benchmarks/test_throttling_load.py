@@ -0,0 +1,101 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from network.models import User
+from network.seeding import seed_network
+from .bench_utils import DATA_SIZES, requires_benchmarks, selected_sizes, write_report
+
+pytestmark = requires_benchmarks
+
+# One client floods /login with password guesses (each costs a full password hash) from FLOOD_THREADS
+# threads while a legitimate user reads their Following feed at a steady pace from another address.
+# Compares that user's latency with no flood, with the flood and throttling off, and with it on.
+FLOOD_THREADS = 4
+LEGIT_REQUESTS = 50
+LEGIT_INTERVAL = 0.02  # seconds between the legitimate user's requests
+WARMUP_SECONDS = 5     # flood time before measuring, past the first burst of hashed guesses
+FEED_PARAMS = {"filter": "following", "cursor": "", "batchSize": 25}
+
+@pytest.fixture(scope="module")
+def throttling_results():
+    results = {}
+    yield results
+    write_report("throttling_load", results)
+
+def percentile(timings, fraction):
+    return round(sorted(timings)[min(len(timings) - 1, int(len(timings) * fraction))], 3)
+
+def flood(stop, statuses):
+    client = Client(REMOTE_ADDR="10.9.9.9")
+    while not stop.is_set():
+        response = client.post(reverse("login"), {"username": "victim", "password": "guess"},
+                               content_type="application/json")
+        statuses.append(response.status_code)
+    connections.close_all()
+
+def legitimate_latencies(cookies):
+    client = Client(REMOTE_ADDR="10.1.1.1")
+    client.cookies = cookies
+    timings, statuses = [], []
+    for _ in range(LEGIT_REQUESTS):
+        start = time.perf_counter()
+        statuses.append(client.get(reverse("get_posts"), data=FEED_PARAMS).status_code)
+        timings.append((time.perf_counter() - start) * 1000)
+        time.sleep(LEGIT_INTERVAL)
+    connections.close_all()
+    return timings, statuses
+
+def run_phase(cookies, flooding):
+    stop, flood_statuses = threading.Event(), []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(FLOOD_THREADS) as pool:
+        flooders = [pool.submit(flood, stop, flood_statuses) for _ in range(FLOOD_THREADS if flooding else 0)]
+        try:
+            if flooding:
+                time.sleep(WARMUP_SECONDS)
+            timings, statuses = legitimate_latencies(cookies)
+        finally:
+            stop.set()
+        for flooder in flooders:
+            flooder.result()
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "p50_ms": percentile(timings, 0.5),
+        "p95_ms": percentile(timings, 0.95),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "legit_errors": sum(status != 200 for status in statuses),
+        "flood_requests": len(flood_statuses),
+        "flood_throttled": flood_statuses.count(429),
+    }
+
+@pytest.mark.parametrize("size", selected_sizes())
+def test_legitimate_latency_under_login_flood(client, transactional_db, settings, size, throttling_results):
+    # -- Set-up --
+    seed_network(**DATA_SIZES[size], prefix=f"bench_{size}")
+    viewer = User.objects.order_by('-following_count').first()
+    client.force_login(viewer)
+    cookies = client.cookies
+    # a burst of one guess per flooding thread: a flood of many connections, each slowed down by hashing
+    settings.NETWORK_THROTTLE_RATES = {**settings.NETWORK_THROTTLE_RATES, "auth": (FLOOD_THREADS, 60)}
+
+    # -- Act --
+    results = {}
+    for phase, flooding, throttled in [("idle", False, True), ("flood/unthrottled", True, False),
+                                       ("flood/throttled", True, True)]:
+        settings.NETWORK_THROTTLE_ENABLED = throttled
+        results[phase] = run_phase(cookies, flooding)
+        throttling_results[f"{size}/{phase}"] = results[phase]
+
+    # -- Assert --
+    assert all(result["legit_errors"] == 0 for result in results.values())
+    assert results["flood/unthrottled"]["flood_throttled"] == 0
+    capacity, period = settings.NETWORK_THROTTLE_RATES["auth"]
+    throttled = results["flood/throttled"]
+    let_through = throttled["flood_requests"] - throttled["flood_throttled"]
+    assert let_through <= capacity + throttled["seconds"] * capacity / period  # the burst plus what refilled
@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.conf import settings
+from network.db import is_lock_error
+from .bench_utils import requires_benchmarks, write_report
+
+pytestmark = requires_benchmarks
+
+# The test database is in memory, where WAL and file locking don't apply, so this drives a like-shaped write
+# transaction (insert the reaction row, bump the post's counter) against a throwaway database file: once as
+# the stock backend would (default journal, a connection per request, deferred transactions) and once with
+# settings.SQLITE_PRAGMAS, persistent connections, BEGIN IMMEDIATE and the retry/backoff of network.db.
+
+CONCURRENCY = [1, 4, 16]
+WRITES_PER_WORKER = 200
+POSTS = 50
+
+@pytest.fixture(scope="module")
+def write_results():
+    results = {}
+    yield results
+    write_report("write_concurrency", results)
+
+def create_schema(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE post (id INTEGER PRIMARY KEY, like_count INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE post_like (post_id INTEGER, user_id INTEGER, UNIQUE (post_id, user_id));
+    """)
+    conn.executemany("INSERT INTO post (id) VALUES (?)", [(i,) for i in range(POSTS)])
+    conn.commit()
+    conn.close()
+
+def tuned_connection(path):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+def like(conn, worker, i, begin):
+    conn.execute(begin)
+    try:
+        conn.execute("INSERT OR IGNORE INTO post_like VALUES (?, ?)", (i % POSTS, worker * WRITES_PER_WORKER + i))
+        conn.execute("UPDATE post SET like_count = like_count + 1 WHERE id = ?", (i % POSTS,))
+        conn.execute("COMMIT")
+    except sqlite3.OperationalError:
+        conn.execute("ROLLBACK")
+        raise
+
+def run_writers(path, concurrency, tuned):
+    errors = []
+    local = threading.local()
+    backoff = getattr(settings, "NETWORK_WRITE_RETRY_BACKOFF_MS", 50) / 1000
+
+    def write(worker, i):
+        if not tuned:
+            conn = sqlite3.connect(path, isolation_level=None)  # 5 s busy timeout, as Django's default
+            try:
+                like(conn, worker, i, "BEGIN")
+            finally:
+                conn.close()
+            return
+        if not hasattr(local, "conn"):
+            local.conn = tuned_connection(path)
+        for attempt in range(settings.NETWORK_WRITE_RETRIES + 1):
+            try:
+                return like(local.conn, worker, i, "BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as error:
+                if attempt == settings.NETWORK_WRITE_RETRIES or not is_lock_error(error):
+                    raise
+                time.sleep(backoff * 2 ** attempt)
+
+    def worker(worker_id):
+        for i in range(WRITES_PER_WORKER):
+            try:
+                write(worker_id, i)
+            except sqlite3.OperationalError as error:
+                errors.append(str(error))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    writes = concurrency * WRITES_PER_WORKER
+    return {"writes_per_second": round((writes - len(errors)) / elapsed, 1), "lock_errors": len(errors)}
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+def test_write_throughput(concurrency, write_results):
+    results = {}
+    for label, tuned in [("stock", False), ("tuned", True)]:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.sqlite3")
+            create_schema(path)
+            results[label] = run_writers(path, concurrency, tuned)
+    write_results[f"writers={concurrency}"] = results
+
+    assert results["tuned"]["lock_errors"] == 0
@@ -0,0 +1,15 @@
+import pytest
+from django.core.cache import cache
+from network.follow_graph import graph
+
+@pytest.fixture(autouse=True)
+def clear_cache(): # the feed cache outlives each test's rolled-back database, so start every test empty
+    cache.clear()
+    yield
+    cache.clear()
+
+@pytest.fixture(autouse=True)
+def reset_follow_graph(): # likewise the in-memory follow graph, which would otherwise keep earlier tests' follows
+    graph.reset()
+    yield
+    graph.reset()
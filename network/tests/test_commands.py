@@ -0,0 +1,88 @@
+import gzip
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from network.assets import load_manifest
+from network.models import User, Post
+from network.search import search_keys
+
+def test_recount_counters_reports_and_fixes_drift(db):
+    # -- Set-up --
+    user = User.objects.create(username="testuser")
+    reactor = User.objects.create(username="testreactor")
+    post = Post.objects.create(poster=user, body="Test post body")
+    post.liked_by.add(reactor)
+    reactor.following.add(user)
+    Post.objects.filter(id=post.id).update(like_count=7)
+    User.objects.filter(id=user.id).update(follower_count=0)
+
+    # -- Act / Assert --
+    with pytest.raises(CommandError):
+        call_command("recount_counters", "--check", stdout=StringIO())
+
+    out = StringIO()
+    call_command("recount_counters", stdout=out)
+    assert "like_count: stored 7, actual 1" in out.getvalue()
+    assert "2 drifted counter(s) fixed" in out.getvalue()
+
+    post.refresh_from_db()
+    user.refresh_from_db()
+    assert post.like_count == 1
+    assert user.follower_count == 1
+
+    call_command("recount_counters", "--check", stdout=StringIO())
+
+def test_seed_network_is_reproducible_and_consistent(db):
+    # -- Act --
+    call_command("seed_network", "--users", "30", "--posts-per-user", "2", "--following-per-user", "5",
+                 "--reactions-per-post", "3", "--prefix", "a", stdout=StringIO())
+    call_command("seed_network", "--users", "30", "--posts-per-user", "2", "--following-per-user", "5",
+                 "--reactions-per-post", "3", "--prefix", "b", stdout=StringIO())
+
+    # -- Assert --
+    def graph(prefix):
+        users = User.objects.filter(username__startswith=f"{prefix}_user_").order_by("id")
+        return [(u.follower_count, u.following_count, u.posts.count()) for u in users]
+
+    assert graph("a") == graph("b")
+    assert User.objects.count() == 60
+    assert Post.objects.count() == 120
+    out = StringIO()
+    call_command("recount_counters", "--check", stdout=out)  # bulk-created rows got their counters filled in
+    with pytest.raises(CommandError):
+        call_command("seed_network", "--users", "1", "--prefix", "a", stdout=StringIO())
+
+def test_rebuild_search_index_restores_missing_rows(db):
+    # -- Set-up --
+    user = User.objects.create(username="testuser")
+    Post.objects.bulk_create([Post(poster=user, body=f"Searchable post {i}") for i in range(3)])
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM network_post_search")
+
+    # -- Act --
+    out = StringIO()
+    call_command("rebuild_search_index", stdout=out)
+
+    # -- Assert --
+    assert "3 post(s) indexed" in out.getvalue()
+    assert len(search_keys("searchable", 10)) == 3
+
+def test_build_assets_is_reproducible(settings, tmp_path):
+    # -- Set-up --
+    settings.NETWORK_ASSET_ROOT = str(tmp_path)
+
+    # -- Act --
+    first, second = StringIO(), StringIO()
+    call_command("build_assets", stdout=first)
+    call_command("build_assets", stdout=second)
+
+    # -- Assert --
+    assert first.getvalue() == second.getvalue() # same content, same names
+    manifest = json.loads((tmp_path / "manifest.json").read_text())
+    assert set(manifest) == {"network/index.js", "network/styles.css"}
+    for hashed in manifest.values():
+        assert gzip.decompress((tmp_path / f"{hashed}.gz").read_bytes()) == (tmp_path / hashed).read_bytes()
+    load_manifest.cache_clear()
@@ -1,5 +1,16 @@
+import json
+import random
+import threading
 import pytest
-from network.models import User, Post
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+from network import follow_graph
+from network.encoding import dumps
+from network.follow_graph import FollowGraph
+from network.models import User, Post, TimelineEntry, PostHashtag, Mention
+from network.timeline import following_sources
+from network.views import link_keys
 
 def test_post_serialize_outputs_expected_fields(db):
     user = User.objects.create_user(
@@ -175,4 +186,307 @@ def test_user_deletion_cascades_to_posts(db):
 
     user.delete()
 
-    assert Post.objects.count() == 0
\ No newline at end of file
+    assert Post.objects.count() == 0
+
+def test_post_serialize_page_matches_serialize(db):
+    user = User.objects.create_user(
+    username="testuser",
+    email="test@example.com",
+    password="password123"
+    )
+    reactor = User.objects.create_user(
+    username="testreactor",
+    email="test@example.com",
+    password="password123"
+    )
+    post1 = Post.objects.create(poster = user, body = "First")
+    post2 = Post.objects.create(poster = user, body = "Second")
+    post1.liked_by.add(reactor)
+    post2.disliked_by.add(reactor)
+
+    page = Post.objects.serialize_page(0, 5)
+
+    assert page == [post2.serialize(), post1.serialize()]
+
+@pytest.mark.parametrize("batch_size", [1, 5, 50])
+def test_post_serialize_page_runs_single_query(db, django_assert_num_queries, batch_size):
+    users = [User.objects.create(username=f"user{i}") for i in range(5)]
+    for i in range(60):
+        post = Post.objects.create(poster = users[i % 5], body = f"Post {i}")
+        post.liked_by.add(users[(i + 1) % 5])
+        post.disliked_by.add(users[(i + 2) % 5], users[(i + 3) % 5])
+
+    with django_assert_num_queries(1) as captured:
+        page = Post.objects.serialize_page(0, batch_size)
+
+    assert "liked_by" not in captured.captured_queries[0]["sql"]
+    assert len(page) == batch_size
+    assert all(p["like_count"] == 1 and p["dislike_count"] == 2 for p in page)
+
+def test_reaction_counters_follow_m2m_changes(db):
+    user = User.objects.create(username="testuser")
+    reactor1 = User.objects.create(username="testreactor1")
+    reactor2 = User.objects.create(username="testreactor2")
+    post = Post.objects.create(poster = user, body = "Test post body")
+
+    post.liked_by.add(reactor1, reactor2)
+    post.liked_by.add(reactor1)            # already liked, must not double count
+    reactor2.dislikes.add(post)            # reverse side of the relation
+    post.liked_by.remove(reactor1, user)   # user never liked it
+    post.refresh_from_db()
+
+    assert post.like_count == 1
+    assert post.dislike_count == 1
+
+    reactor2.dislikes.clear()
+    post.liked_by.clear()
+    post.refresh_from_db()
+
+    assert post.like_count == 0
+    assert post.dislike_count == 0
+
+def test_follow_counters_follow_m2m_changes(db):
+    user1 = User.objects.create(username="testuser1")
+    user2 = User.objects.create(username="testuser2")
+    user3 = User.objects.create(username="testuser3")
+
+    user1.following.add(user2, user3)
+    user3.followers.add(user2)
+    user1.following.remove(user3)
+
+    assert user1.following_count == 1     # instance the change was made through is refreshed
+    for user in (user1, user2, user3):
+        user.refresh_from_db()
+    assert (user1.follower_count, user1.following_count) == (0, 1)
+    assert (user2.follower_count, user2.following_count) == (1, 1)
+    assert (user3.follower_count, user3.following_count) == (1, 0)
+
+def test_counters_released_when_a_user_is_deleted(db):
+    poster = User.objects.create(username="poster")
+    follower1 = User.objects.create(username="follower1")
+    follower2 = User.objects.create(username="follower2")
+    post = Post.objects.create(poster=poster, body="Test post body")
+    poster.followers.add(follower1, follower2)
+    follower1.following.add(follower2)
+    post.liked_by.add(follower1)
+    post.disliked_by.add(follower2)
+
+    follower1.delete()
+    User.objects.filter(id=follower2.id).delete()  # queryset deletes too
+
+    poster.refresh_from_db()
+    post.refresh_from_db()
+    assert (poster.follower_count, poster.following_count) == (0, 0)
+    assert (post.like_count, post.dislike_count) == (0, 0)
+
+def query_plan(queryset): # SQLite's EXPLAIN QUERY PLAN detail lines for a queryset
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+def feed_access_paths():
+    # built by the same queryset methods the views page with
+    after = (timezone.now(), 10)
+    following, (pulled,) = following_sources(1, [1], 5)
+    following_cursor, (pulled_cursor,) = following_sources(1, [1], 5, after)
+    return {
+        "all-posts": Post.objects.feed_rows()[5:10],
+        "all-posts cursor": Post.objects.seek(after)[:5],
+        "profile": Post.objects.filter(poster_id=1).feed_rows()[5:10],
+        "profile cursor": Post.objects.filter(poster_id=1).seek(after)[:5],
+        "following": following,
+        "following cursor": following_cursor,
+        "following pulled": pulled,
+        "following pulled cursor": pulled_cursor,
+        "tag cursor": link_keys(PostHashtag.objects.filter(hashtag__name="python"), after)[:5],
+        "mentions cursor": link_keys(Mention.objects.filter(user_id=1), after)[:5],
+        "liked by user": Post.liked_by.through.objects.filter(user_id=1).values_list('post_id', flat=True),
+        "disliked by user": Post.disliked_by.through.objects.filter(user_id=1).values_list('post_id', flat=True),
+    }
+
+@pytest.mark.parametrize("access_path", [
+    "all-posts", "all-posts cursor", "profile", "profile cursor", "following", "following cursor",
+    "following pulled", "following pulled cursor", "tag cursor", "mentions cursor", "liked by user", "disliked by user",
+])
+def test_feed_queries_use_indexes(db, access_path):
+    plan = query_plan(feed_access_paths()[access_path])
+
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") and "INDEX" not in step for step in plan), plan
+
+@pytest.mark.parametrize("hour", [0, 9, 12, 23])
+def test_feed_rows_serialize_byte_identical_to_serialize(db, hour):
+    # -- Set-up --
+    poster = User.objects.create(username="pöster")
+    reactors = [User.objects.create(username=f"reactor{i}") for i in range(3)]
+    for i in range(4):
+        post = Post.objects.create(poster=poster, body=f'Post {i} with "quotes", ünïcode and #tags')
+        Post.objects.filter(id=post.id).update(timestamp=timezone.now().replace(hour=hour, minute=i * 7))
+        post.liked_by.add(*reactors[:i])
+        post.disliked_by.add(*reactors[i:])
+    instances = list(Post.objects.select_related("poster").order_by('-timestamp', '-id'))
+
+    # -- Act --
+    page = Post.objects.serialize_page(0, 10)
+    keyed_page, _ = Post.objects.keyset_page(None, 10)
+
+    # -- Assert --
+    expected = [post.serialize() for post in instances]
+    assert json.dumps(page) == json.dumps(expected) # same keys, key order and values
+    assert dumps(keyed_page) == dumps(expected)
+
+def random_follows(seed, users=30, follows=6):
+    rng = random.Random(seed)
+    people = [User.objects.create(username=f"user{i}") for i in range(users)]
+    for person in people:
+        person.following.add(*rng.sample([other for other in people if other != person], follows))
+    return people
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_follow_graph_answers_match_sql(db, seed):
+    # -- Set-up --
+    people = random_follows(seed)
+    people[0].followers.clear()  # someone nobody follows
+    graph = FollowGraph()
+    graph.build()
+
+    # -- Act / Assert --
+    for person in people:
+        person.refresh_from_db()
+        assert graph.suggestions(person.id, 10) == follow_graph.sql_suggestions(person.id, 10)
+        assert graph.degree(person.id) == (person.follower_count, person.following_count)
+        for other in people[:5]:
+            assert graph.mutual_count(person.id, other.id) == follow_graph.mutual_count_query(person.id, other.id).count()
+
+def test_follow_graph_applies_follows_incrementally_and_compacts(db, monkeypatch):
+    # -- Set-up --
+    people = random_follows(4, users=12, follows=3)
+    graph = FollowGraph()
+    graph.build()
+    rng = random.Random(5)
+    monkeypatch.setattr(follow_graph, "COMPACT_AFTER", 8)
+
+    # -- Act / Assert --
+    for _ in range(40):  # follows, unfollows and re-follows, some of them repeats or no-ops
+        follower, followee = rng.sample(people, 2)
+        followed = rng.random() < 0.5
+        if followed:
+            follower.following.add(followee)
+        else:
+            follower.following.remove(followee)
+        graph.apply([(follower.id, followee.id)], followed)
+
+        rebuilt = FollowGraph()
+        rebuilt.build()
+        assert sorted(graph.edges()) == sorted(rebuilt.edges())
+        for person in people:
+            assert list(graph.following(person.id)) == list(rebuilt.following(person.id))
+            assert list(graph.followers(person.id)) == list(rebuilt.followers(person.id))
+            assert graph.degree(person.id) == rebuilt.degree(person.id)
+            assert graph.suggestions(person.id, 5) == rebuilt.suggestions(person.id, 5)
+
+def test_follow_graph_replays_follows_applied_while_building(db):
+    # -- Set-up --
+    people = random_follows(7, users=6, follows=2)
+    graph = FollowGraph()
+    graph.build()
+    new_pair = next((a.id, b.id) for a in people for b in people if a != b and not graph.follows(a.id, b.id))
+    old_pair = (people[0].id, graph.following(people[0].id)[0])
+
+    def edges():  # the follow and unfollow land after the edges were read
+        read = graph.edges()
+        graph.apply([new_pair], followed=True)
+        graph.apply([old_pair], followed=False)
+        return read
+
+    # -- Act --
+    graph.build(edges)
+
+    # -- Assert --
+    assert graph.follows(*new_pair)
+    assert not graph.follows(*old_pair)
+
+def test_stale_follow_graph_answers_while_rebuilt_in_background(transactional_db, monkeypatch):
+    # -- Set-up --
+    people = random_follows(8, users=6, follows=2)
+    follow_graph.graph.ensure()
+    follower, followee = next((a, b) for a in people for b in people
+                              if a != b and not follow_graph.graph.follows(a.id, b.id))
+    follow_graph.Follow.objects.create(from_user=follower, to_user=followee)  # as another process would
+    monkeypatch.setattr(follow_graph.graph, "_built", follow_graph.graph._built - follow_graph.max_age())
+    release, build = threading.Event(), follow_graph.graph.build
+    monkeypatch.setattr(follow_graph.graph, "build", lambda: release.wait() and build())
+
+    # -- Act --
+    answers = follow_graph.graph.ensure()
+    stale = follow_graph.graph.follows(follower.id, followee.id)
+    release.set()
+    follow_graph.graph._rebuilding.join()
+
+    # -- Assert --
+    assert answers and not stale
+    assert follow_graph.graph.follows(follower.id, followee.id)
+    assert follow_graph.graph.loaded()
+
+def test_follow_graph_forgets_deleted_users(db, django_capture_on_commit_callbacks):
+    # -- Set-up --
+    people = random_follows(9, users=8, follows=3)
+    viewer = people[0]
+    followee = viewer.following.first()
+    target = followee.following.first()
+    follow_graph.graph.ensure()
+
+    # -- Act --
+    with django_capture_on_commit_callbacks(execute=True):
+        followee.delete()
+
+    # -- Assert --
+    assert follow_graph.graph.mutual_count(viewer.id, target.id) == \
+        follow_graph.mutual_count_query(viewer.id, target.id).count()
+    assert followee.id not in follow_graph.graph.following(viewer.id)
+
+def test_follow_graph_falls_back_to_sql_past_max_edges(db, settings, django_assert_num_queries):
+    # -- Set-up --
+    people = random_follows(6, users=8, follows=2)
+    settings.NETWORK_FOLLOW_GRAPH_MAX_EDGES = 10
+
+    # -- Act --
+    suggestions = follow_graph.suggestions(people[0].id, 5)
+
+    # -- Assert --
+    assert not follow_graph.graph.loaded()
+    assert suggestions == follow_graph.sql_suggestions(people[0].id, 5)
+    with django_assert_num_queries(1):  # no second attempt at building until the snapshot would be stale
+        follow_graph.mutual_count(people[0].id, people[1].id)
+
+def migrate(target):
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate([("network", target)])
+    return executor.loader.project_state([("network", target)]).apps
+
+def test_timeline_migration_backfills_existing_follows(transactional_db, settings):
+    # -- Set-up --
+    settings.NETWORK_FANOUT_THRESHOLD = 1
+    settings.NETWORK_TIMELINE_BACKFILL_LIMIT = 2
+    latest = MigrationExecutor(connection).loader.graph.leaf_nodes("network")[0][1]
+    old_apps = migrate("0005_post_disliked_by")
+    OldUser, OldPost = old_apps.get_model("network", "User"), old_apps.get_model("network", "Post")
+    reader, other, poster, star = [OldUser.objects.create(username=name) for name in ["reader", "other", "poster", "star"]]
+    reader.following.add(poster, star)
+    other.following.add(star)
+    posts = [OldPost.objects.create(poster=poster, body=f"Post {i}") for i in range(3)]
+    OldPost.objects.create(poster=star, body="Star post")
+
+    # -- Act --
+    try:
+        new_apps = migrate("0006_user_fanout_on_read_timelineentry")
+        entries = set(new_apps.get_model("network", "TimelineEntry").objects.values_list("owner_id", "post_id"))
+        pulled = set(new_apps.get_model("network", "User").objects.filter(fanout_on_read=True).values_list("id", flat=True))
+    finally:
+        migrate(latest)
+
+    # -- Assert --
+    assert entries == {(reader.id, post.id) for post in posts[1:]}  # the newest two of the poster's posts
+    assert pulled == {star.id}  # followed by two accounts, over the threshold of one
@@ -1,6 +1,22 @@
+import gzip
+import os
+import subprocess
+import sys
 import pytest
-from django.urls import reverse
-from network.models import User, Post
+from django.contrib.staticfiles import finders
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.http import JsonResponse as DjangoJsonResponse
+from network import assets, encoding, events, feed_cache, follow_graph, metrics, reaction_buffer, reactions, throttling, views
+from network.assets import build_assets, load_manifest
+from network.auth import user_key
+from network.db import retry_on_lock
+from network.middleware import RequestMetricsMiddleware
+from network.models import Hashtag, User, Post
+from network.throttling import BucketStore
 import json
 
 @pytest.fixture
@@ -63,7 +79,7 @@ class UserSessionHelper:   #Class to instantiate user instance, PLUS create a lo
         data = self.post_data(self.user, body)
         url = reverse_django_url(view_name, args, kwargs)
         if offset is not None and batch_size is not None:
-            url = f"{url}?offset={offset}&batchSize={batch_size}"
+            url = f"{url}?offset={offset}&batchSize={batch_size}&response=full"  # toggles page in full mode
         response = self.client.post(url,
                    **prepare_json(data))
         return response
@@ -176,7 +192,7 @@ def test_cannot_follow_yourself(client, db, user_factory):
 
     # -- Act --
     response = client.post(
-        reverse_django_url("toggle_follow_status", args=[user.id]),
+        reverse_django_url("toggle_follow_status", args=[user.id]) + "?response=full",
     ) 
 
     # -- Assert --
@@ -285,6 +301,15 @@ def test_allposts_filter(client, db, user_factory, post_data, posts_option, post
     ("get_follow_usernames", "get"),
     ("get_posts", "get"),
     ("get_profile", "get"),
+    ("stream_events", "get"),
+    ("batch_reactions", "post"),
+    ("search_posts", "get"),
+    ("export_posts", "get"),
+    ("get_tag_posts", "get"),
+    ("get_mention_posts", "get"),
+    ("get_trending_tags", "get"),
+    ("get_follow_suggestions", "get"),
+    ("get_relationships", "get"),
     ("toggle_follow_status", "post"),
     ("toggle_like_status", "post"),
     ("toggle_dislike_status", "post"),
@@ -309,9 +334,16 @@ def test_protected_views_redirect_unauthenticated_users(client, db, view_name, m
         post = Post.objects.create(poster=user, body="Test post body")
         args = [post.id]
     
-    elif view_name in ["get_posts", "compose"]: 
+    elif view_name in ["get_posts", "compose", "stream_events", "batch_reactions", "search_posts",
+                       "get_trending_tags", "export_posts", "get_follow_suggestions", "get_relationships"]: 
         args = []
 
+    elif view_name == "get_tag_posts":
+        args = ["python"]
+
+    elif view_name == "get_mention_posts":
+        args = [user.username]
+
     elif view_name == "get_follow_usernames":
         args = ["following"]
 
@@ -419,7 +451,7 @@ def test_post_serialization_returns_expected_structure(client, db, user_factory,
 
     elif view_name in ["toggle_like_status", "toggle_dislike_status"]:
         url = reverse_django_url(view_name, args = [post.id])
-        url_with_params = f"{url}?offset=0&batchSize=5"
+        url_with_params = f"{url}?offset=0&batchSize=5&response=full"
         response = client.post(url_with_params)
 
     elif view_name == "get_posts":
@@ -443,3 +475,1261 @@ def test_post_serialization_returns_expected_structure(client, db, user_factory,
         assert len(list_of_dicts) >= 1
         assert isinstance(list_of_dicts,list)
         assert list_of_dicts[0]["id"] == post.id
+
+@pytest.mark.parametrize("view_name, method", [
+    ("get_posts", "get"),
+    ("get_profile", "get"),
+    ("compose", "post"),
+    ("toggle_like_status", "post"),
+])
+def test_post_views_query_count_independent_of_batch_size(client, db, user_factory, post_data, view_name, method):
+    # -- Set-up --
+    poster = user_factory("poster")
+    reactor = user_factory("reactor")
+    for i in range(30):
+        post = Post.objects.create(poster=poster, body=f"Post {i}")
+        post.liked_by.add(reactor)
+    client.force_login(reactor)
+
+    if view_name == "get_profile":
+        url = reverse_django_url(view_name, args=[poster.id])
+    elif view_name == "toggle_like_status":
+        url = reverse_django_url(view_name, args=[Post.objects.latest('id').id])
+    else:
+        url = reverse_django_url(view_name)
+
+    client.get(reverse_django_url("get_follow_usernames", args=["following"])) # caches the logged-in user
+    follow_graph.graph.ensure() # loads the follow graph profiles read mutual counts from
+
+    # -- Act --
+    query_counts = []
+    for batch_size in [1, 5, 25]:
+        params = f"?filter=all-posts&offset=0&batchSize={batch_size}"
+        with CaptureQueriesContext(connection) as queries:
+            if method == "post":
+                response = client.post(url + params, **prepare_json(post_data(reactor)))
+            else:
+                response = client.get(url + params)
+        assert response.status_code == 200
+        query_counts.append(len(queries))
+
+    # -- Assert --
+    assert len(set(query_counts)) == 1
+
+@pytest.mark.parametrize("view_name", ["get_posts", "get_profile"])
+def test_cursor_pagination_walks_every_post_once(client, db, user_factory, view_name):
+    # -- Set-up --
+    poster = user_factory("poster")
+    posts = [Post.objects.create(poster=poster, body=f"Post {i}") for i in range(12)]
+    Post.objects.filter(id__in=[p.id for p in posts[3:9]]).update(timestamp=posts[3].timestamp) # force ties
+    client.force_login(poster)
+
+    if view_name == "get_profile":
+        url = reverse_django_url(view_name, args=[poster.id])
+    else:
+        url = reverse_django_url(view_name)
+
+    # -- Act --
+    seen_ids = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(url, data={"filter": "all-posts", "cursor": cursor, "batchSize": 5})
+        assert response.status_code == 200
+        page = response.json()
+        seen_ids += [post["id"] for post in page["posts"]]
+        cursor = page["next_cursor"]
+
+    # -- Assert --
+    expected = list(Post.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+    assert seen_ids == expected
+
+@pytest.mark.parametrize("cursor", ["garbage", "bm90LWEta2V5", "MjAyNS0wMS0wMXxhYmM="])
+def test_invalid_cursor_is_rejected(client, db, user_factory, cursor):
+    user = user_factory("user")
+    client.force_login(user)
+
+    response = client.get(reverse_django_url("get_posts"),
+                          data={"filter": "all-posts", "cursor": cursor, "batchSize": 5})
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "Invalid pagination parameters"
+
+def get_following_ids(client):
+    response = client.get(reverse_django_url("get_posts"),
+                          data={"filter": "following", "offset": 0, "batchSize": 20})
+    assert response.status_code == 200
+    return [post["id"] for post in response.json()]
+
+def test_following_filter_returns_only_followed_posters(client, db, user_factory, post_data):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    followed_session = UserSessionHelper(client, "followed", user_factory, post_data)
+    stranger_session = UserSessionHelper(client, "stranger", user_factory, post_data)
+    followed_session.setup_session_and_post("compose", body="Followed post")
+    stranger_session.setup_session_and_post("compose", body="Stranger post")
+
+    # -- Act --
+    client.force_login(viewer)
+    client.post(reverse_django_url("toggle_follow_status", args=[followed_session.user.id]))
+    backfilled = get_following_ids(client)
+
+    new_post = followed_session.setup_session_and_post("compose", body="Fanned out post").json()[0]
+    client.force_login(viewer)
+    fanned_out = get_following_ids(client)
+
+    client.post(reverse_django_url("toggle_follow_status", args=[followed_session.user.id]))
+    unfollowed = get_following_ids(client)
+
+    # -- Assert --
+    followed_posts = list(Post.objects.filter(poster=followed_session.user).order_by('-id').values_list('id', flat=True))
+    assert backfilled == followed_posts[1:]
+    assert fanned_out == followed_posts
+    assert fanned_out[0] == new_post["id"]
+    assert unfollowed == []
+
+def test_following_feed_merges_high_follower_accounts_at_read_time(client, db, settings, user_factory, post_data):
+    # -- Set-up --
+    settings.NETWORK_FANOUT_THRESHOLD = 1
+    viewer = user_factory("viewer")
+    other_follower = user_factory("other_follower")
+    popular_session = UserSessionHelper(client, "popular", user_factory, post_data)
+    regular_session = UserSessionHelper(client, "regular", user_factory, post_data)
+    popular_session.setup_session_and_post("compose", body="Fanned out before threshold")
+    regular_session.setup_session_and_post("compose", body="Regular post")
+
+    client.force_login(viewer)
+    client.post(reverse_django_url("toggle_follow_status", args=[popular_session.user.id]))
+    client.post(reverse_django_url("toggle_follow_status", args=[regular_session.user.id]))
+    other_follower.following.add(popular_session.user)
+
+    # -- Act --
+    popular_session.setup_session_and_post("compose", body="Pulled at read time")
+    client.force_login(viewer)
+    following_ids = get_following_ids(client)
+
+    # -- Assert --
+    popular_session.user.refresh_from_db()
+    assert popular_session.user.fanout_on_read
+    expected = list(Post.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+    assert following_ids == expected
+
+@pytest.mark.parametrize("option", ["following", "followers"])
+def test_follow_usernames_pages_with_cursor(client, db, user_factory, option):
+    # -- Set-up --
+    user = user_factory("user")
+    others = [User.objects.create(username=f"other{i}") for i in range(7)]
+    for other in others:
+        if option == "following":
+            user.following.add(other)
+        else:
+            other.following.add(user)
+    client.force_login(user)
+    url = reverse_django_url("get_follow_usernames", args=[option])
+
+    # -- Act --
+    pages = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get(url, data={"cursor": cursor, "batchSize": 3})
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = pages[-1]["next_cursor"]
+
+    # -- Assert --
+    assert [len(page["ids"]) for page in pages] == [3, 3, 1]
+    assert all(page["option"] == option for page in pages)
+    ids = [user_id for page in pages for user_id in page["ids"]]
+    usernames = [username for page in pages for username in page["usernames"]]
+    assert ids == [other.id for other in reversed(others)]       # most recent follow first
+    assert usernames == [other.username for other in reversed(others)]
+
+def test_profile_carries_counts_and_viewer_follow_state_only(client, db, user_factory):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    target = user_factory("target")
+    viewer.following.add(target)
+    client.force_login(viewer)
+
+    # -- Act --
+    profile = client.get(reverse_django_url("get_profile", args=[target.id])).json()
+    own_profile = client.get(reverse_django_url("get_profile", args=[viewer.id])).json()
+
+    # -- Assert --
+    assert profile["viewer_follows"] is True
+    assert own_profile["viewer_follows"] is False
+    assert (profile["follower_count"], profile["following_count"]) == (1, 0)
+    assert not any(key in profile for key in ["follower_ids", "following_ids", "follower_usernames", "following_usernames"])
+
+def test_all_posts_feed_served_from_cache_until_a_write(client, db, settings, user_factory, post_data):
+    # -- Set-up --
+    settings.NETWORK_FEED_CACHE_PAGES = True
+    poster = user_factory("poster")
+    reactor = user_factory("reactor")
+    post = Post.objects.create(poster=poster, body="First post")
+    client.force_login(reactor)
+    url = reverse_django_url("get_posts")
+    params = {"filter": "all-posts", "offset": 0, "batchSize": 5}
+
+    def fetch():
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data=params)
+        assert response.status_code == 200
+        post_queries = [q for q in queries if "network_post" in q["sql"]]
+        return response.json(), len(post_queries)
+
+    # -- Act / Assert --
+    first, first_queries = fetch()
+    cached, cached_queries = fetch()
+    assert first_queries == 1
+    assert cached_queries == 0
+    assert cached == first
+
+    client.post(reverse_django_url("toggle_like_status", args=[post.id]))
+    after_like, after_like_queries = fetch()
+    assert after_like_queries == 1
+    assert after_like[0]["like_count"] == 1
+
+    new_post = Post.objects.create(poster=poster, body="Second post")
+    after_compose, _ = fetch()
+    assert after_compose[0]["id"] == new_post.id
+
+    new_post.delete()
+    after_delete, _ = fetch()
+    assert [p["id"] for p in after_delete] == [post.id]
+
+@pytest.mark.parametrize("cache_pages, cached", [
+    (None, False),  # the default local-memory cache isn't shared between workers
+    (True, True),
+])
+def test_all_posts_feed_pages_cached_only_in_a_shared_cache(client, db, settings, user_factory,
+                                                            cache_pages, cached):
+    # -- Set-up --
+    settings.NETWORK_FEED_CACHE_PAGES = cache_pages
+    viewer = user_factory("viewer")
+    Post.objects.create(poster=viewer, body="Test post body")
+    client.force_login(viewer)
+    params = {"filter": "all-posts", "offset": 0, "batchSize": 5}
+    client.get(reverse_django_url("get_posts"), data=params)
+
+    # -- Act --
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse_django_url("get_posts"), data=params)
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert any("network_post" in q["sql"] for q in queries) is not cached
+
+@pytest.mark.parametrize("view_name, liked, disliked", [
+    ("toggle_like_status", True, False),
+    ("toggle_dislike_status", False, True),
+])
+def test_reaction_toggle_delta_response(client, db, user_factory, view_name, liked, disliked):
+    # -- Set-up --
+    poster = user_factory("poster")
+    reactor = user_factory("reactor")
+    post = Post.objects.create(poster=poster, body="Test post body")
+    for i in range(20):
+        Post.objects.create(poster=poster, body=f"Filler {i}")
+    client.force_login(reactor)
+
+    # -- Act --
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(reverse_django_url(view_name, args=[post.id]))
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert response.json() == {"post": {"id": post.id,
+                                        "like_count": int(liked),
+                                        "dislike_count": int(disliked),
+                                        "liked": liked,
+                                        "disliked": disliked}}
+    assert not any("ORDER BY" in q["sql"] for q in queries) # no feed page or profile rebuilt
+
+def test_follow_toggle_delta_response(client, db, user_factory):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    target = user_factory("target")
+    client.force_login(viewer)
+    url = reverse_django_url("toggle_follow_status", args=[target.id])
+
+    # -- Act --
+    followed = client.post(url).json()
+    unfollowed = client.post(url).json()
+
+    # -- Assert --
+    assert followed == {"user": {"id": target.id, "follower_count": 1, "following_count": 0,
+                                 "viewer_follows": True, "viewer_following_count": 1}}
+    assert unfollowed == {"user": {"id": target.id, "follower_count": 0, "following_count": 0,
+                                   "viewer_follows": False, "viewer_following_count": 0}}
+
+@pytest.fixture
+def metrics_enabled(settings):
+    settings.NETWORK_METRICS_ENABLED = True
+    metrics.reset()
+    yield
+    metrics.reset()
+
+def test_metrics_middleware_adds_server_timing_and_aggregates(client, db, user_factory, metrics_enabled):
+    # -- Set-up --
+    user = user_factory("user")
+    staff = user_factory("staff")
+    staff.is_staff = True
+    staff.save()
+    Post.objects.create(poster=user, body="Test post body")
+    client.force_login(user)
+
+    # -- Act --
+    for _ in range(3):
+        response = client.get(reverse_django_url("get_posts"), data={"filter": "my-posts"})
+    forbidden = client.get(reverse_django_url("get_metrics"))
+    client.force_login(staff)
+    report = client.get(reverse_django_url("get_metrics")).json()
+
+    # -- Assert --
+    timing = response["Server-Timing"]
+    assert timing.startswith("total;dur=")
+    assert 'db;dur=' in timing and 'queries"' in timing and "serialize;dur=" in timing
+    assert forbidden.status_code == 403
+    assert report["enabled"] is True
+    stats = report["views"]["get_posts"]
+    assert stats["count"] == 3
+    assert stats["queries"]["p50"] >= 1
+    assert stats["bytes"]["p99"] == len(response.content)
+    assert stats["total"]["p50"] <= stats["total"]["p95"] <= stats["total"]["p99"]
+
+def test_metrics_middleware_measures_async_views_natively(async_client, db, settings, user_factory,
+                                                          metrics_enabled):
+    # -- Set-up --
+    settings.ROOT_URLCONF = "network.async_urls"
+    user = user_factory("user")
+    Post.objects.create(poster=user, body="Test post body")
+    async_client.force_login(user)
+
+    # -- Act --
+    response = async_to_sync(async_client.get)(reverse_django_url("get_posts"), data={"filter": "my-posts"})
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert iscoroutinefunction(RequestMetricsMiddleware(async_client.handler.get_response_async))
+    stats = metrics.snapshot()["get_posts"]
+    assert stats["count"] == 1
+    assert stats["queries"]["p50"] >= 1
+    assert 'queries"' in response["Server-Timing"]
+
+def test_metrics_middleware_is_dropped_when_disabled(client, db, user_factory):
+    user = user_factory("user")
+    client.force_login(user)
+
+    response = client.get(reverse_django_url("get_posts"), data={"filter": "my-posts"})
+
+    assert "Server-Timing" not in response
+
+@pytest.mark.parametrize("view_name, filter", [
+    ("get_posts", "all-posts"),
+    ("get_posts", "my-posts"),
+    ("get_posts", "following"),
+    ("get_profile", None),
+])
+def test_feed_views_answer_conditional_get(client, db, settings, user_factory, view_name, filter):
+    # -- Set-up --
+    settings.NETWORK_FEED_ETAGS = True
+    viewer = user_factory("viewer")
+    poster = user_factory("poster")
+    other = user_factory("other")
+    post = Post.objects.create(poster=poster, body="Test post body")
+    client.force_login(viewer)
+    args = [poster.id] if view_name == "get_profile" else None
+    url = reverse_django_url(view_name, args=args)
+    params = {"offset": 0, "batchSize": 5}
+    if filter:
+        params["filter"] = filter
+
+    def conditional_get(etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, data=params, HTTP_IF_NONE_MATCH=etag)
+        return response, [q for q in queries if "network_post" in q["sql"]]
+
+    first = client.get(url, data=params)
+    etag = first["ETag"]
+
+    # -- Act / Assert --
+    response, post_queries = conditional_get(etag)
+    assert response.status_code == 304
+    assert post_queries == []
+
+    for write in [lambda: post.liked_by.add(other),
+                  lambda: viewer.following.add(other),
+                  lambda: Post.objects.create(poster=other, body="Another post")]:
+        write()
+        response, _ = conditional_get(etag)
+        assert response.status_code == 200
+        etag = response["ETag"]
+
+    other_viewer = user_factory("other_viewer")
+    client.force_login(other_viewer)
+    response, _ = conditional_get(etag)
+    assert response.status_code == 200
+
+@pytest.mark.parametrize("etags, params, tagged", [
+    (None, {"filter": "all-posts"}, False),  # the default local-memory cache isn't shared between workers
+    (True, {"filter": "all-posts"}, True),
+    (True, {"filter": "bogus"}, False),
+    (True, {"filter": "all-posts", "offset": -1}, False),
+])
+def test_feed_etags_need_a_shared_cache_and_a_successful_response(client, db, settings, user_factory,
+                                                                  etags, params, tagged):
+    # -- Set-up --
+    settings.NETWORK_FEED_ETAGS = etags
+    client.force_login(user_factory("viewer"))
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_posts"), data=params)
+
+    # -- Assert --
+    assert response.has_header("ETag") is tagged
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.mark.parametrize("entry_point, async_reads", [("project4.wsgi", False), ("project4.asgi", True)])
+def test_each_entry_point_serves_its_own_kind_of_read_views(entry_point, async_reads):
+    # -- Act --
+    script = (f"import {entry_point}\n"
+              "from asgiref.sync import iscoroutinefunction\n"
+              "from django.urls import resolve, reverse\n"
+              "print(iscoroutinefunction(resolve(reverse('get_posts')).func))")
+    environment = {name: value for name, value in os.environ.items() if name != "NETWORK_ASYNC_READS"}
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=environment,
+                            cwd=PROJECT_ROOT, check=True)
+
+    # -- Assert --
+    assert result.stdout.strip() == str(async_reads)
+
+@pytest.mark.parametrize("view_name, args, params", [
+    ("get_posts", None, {"filter": "all-posts", "offset": 0, "batchSize": 5}),
+    ("get_posts", None, {"filter": "my-posts", "cursor": "", "batchSize": 2}),
+    ("get_posts", None, {"filter": "following", "offset": 1, "batchSize": 5}),
+    ("get_posts", None, {"filter": "bogus"}),
+    ("get_posts", None, {"filter": "all-posts", "offset": -1}),
+    ("get_profile", "poster", {"cursor": "", "batchSize": 2}),
+    ("get_profile", 999999, {}),
+    ("get_follow_usernames", "following", {"batchSize": 1}),
+    ("get_follow_usernames", "followers", {}),
+])
+def test_async_read_views_match_sync_views(client, async_client, db, settings, user_factory, view_name, args, params):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    poster = user_factory("poster")
+    viewer.following.add(poster)
+    poster.following.add(viewer)
+    for i in range(4):
+        Post.objects.create(poster=poster, body=f"Post {i}")
+        Post.objects.create(poster=viewer, body=f"Own post {i}")
+    if args == "poster":
+        args = poster.id
+    args = [args] if args is not None else None
+    client.force_login(viewer)
+    async_client.force_login(viewer)
+
+    # -- Act --
+    sync_response = client.get(reverse_django_url(view_name, args=args), data=params)
+    settings.ROOT_URLCONF = "network.async_urls"
+    url = reverse_django_url(view_name, args=args)
+    async_response = async_to_sync(async_client.get)(url, data=params)
+
+    # -- Assert --
+    assert iscoroutinefunction(resolve(url).func)
+    assert async_response.status_code == sync_response.status_code
+    assert async_response.json() == sync_response.json()
+
+def test_async_feed_reads_generations_with_the_async_cache_api(async_client, db, settings, user_factory,
+                                                              monkeypatch):
+    # -- Set-up --
+    settings.NETWORK_FEED_ETAGS = True
+    settings.ROOT_URLCONF = "network.async_urls"
+    viewer = user_factory("viewer")
+    Post.objects.create(poster=viewer, body="Test post body")
+    async_client.force_login(viewer)
+    url, params = reverse_django_url("get_posts"), {"filter": "all-posts", "offset": 0, "batchSize": 5}
+
+    def blocking_call(key):
+        raise AssertionError("sync cache call on the event loop")
+    monkeypatch.setattr(feed_cache, "generation", blocking_call)
+
+    # -- Act --
+    first = async_to_sync(async_client.get)(url, data=params)
+    second = async_to_sync(async_client.get)(url, data=params, headers={"If-None-Match": first["ETag"]})
+
+    # -- Assert --
+    assert first.status_code == 200 and len(first.json()) == 1
+    assert second.status_code == 304
+
+def test_event_stream_coalesces_a_burst_of_reactions(client, db, settings, user_factory,
+                                                    django_capture_on_commit_callbacks):
+    # -- Set-up --
+    settings.NETWORK_EVENTS_COALESCE_MS = 10
+    poster = user_factory("poster")
+    watched = Post.objects.create(poster=poster, body="On screen")
+    unwatched = Post.objects.create(poster=poster, body="Off screen")
+    reactors = [user_factory(f"reactor{i}") for i in range(5)]
+    client.force_login(poster)
+    response = client.get(reverse_django_url("stream_events"), data={"posts": str(watched.id)})
+    chunks = iter(response.streaming_content)
+
+    # -- Act --
+    with django_capture_on_commit_callbacks(execute=True):
+        for reactor in reactors:
+            watched.liked_by.add(reactor)
+        unwatched.disliked_by.add(reactors[0])
+        new_post = Post.objects.create(poster=poster, body="Fresh post")
+    retry = next(chunks).decode()
+    batch = next(chunks).decode()
+
+    # -- Assert --
+    assert response["Content-Type"] == "text/event-stream"
+    assert retry.startswith("retry:")
+    received = {}
+    for block in batch.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        received[fields["event"]] = json.loads(fields["data"])
+    assert received == {
+        "posts": {"ids": [new_post.id]},
+        "reactions": {"posts": [{"id": watched.id, "like_count": 5, "dislike_count": 0}]},
+    }
+
+@pytest.mark.parametrize("resume", ["header", "query"])
+def test_event_stream_resumes_after_the_last_event_id(client, db, settings, user_factory,
+                                                      django_capture_on_commit_callbacks, resume):
+    # -- Set-up --
+    settings.NETWORK_EVENTS_COALESCE_MS = 10
+    poster = user_factory("poster")
+    client.force_login(poster)
+    seen = events.broker.last_seq
+    with django_capture_on_commit_callbacks(execute=True):
+        missed = Post.objects.create(poster=poster, body="Posted while the stream was closed")
+    kwargs = {"HTTP_LAST_EVENT_ID": str(seen)} if resume == "header" else {}
+    params = {"posts": ""} if resume == "header" else {"posts": "", "lastEventId": str(seen)}
+
+    # -- Act --
+    response = client.get(reverse_django_url("stream_events"), data=params, **kwargs)
+    chunks = iter(response.streaming_content)
+    next(chunks)  # retry interval
+    batch = next(chunks).decode()
+
+    # -- Assert --
+    assert f"id: {events.broker.last_seq}" in batch
+    assert json.dumps({"ids": [missed.id]}) in batch
+
+@pytest.mark.parametrize("posts", ["1,abc", ",".join(str(i) for i in range(201))])
+def test_event_stream_rejects_invalid_watch_list(client, db, user_factory, posts):
+    # -- Set-up --
+    client.force_login(user_factory("viewer"))
+
+    # -- Act --
+    response = client.get(reverse_django_url("stream_events"), data={"posts": posts})
+
+    # -- Assert --
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid posts parameter"}
+
+@pytest.mark.parametrize("ids, status", [("", 400), ("1,x", 400), (",".join(["1"] * 101), 400), (None, 200)])
+def test_get_posts_by_ids(client, db, user_factory, ids, status):
+    # -- Set-up --
+    poster = user_factory("poster")
+    posts = [Post.objects.create(poster=poster, body=f"Post {i}") for i in range(3)]
+    client.force_login(poster)
+    if ids is None:
+        ids = f"{posts[0].id},{posts[2].id},999999"
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_posts"), data={"filter": "ids", "ids": ids})
+
+    # -- Assert --
+    assert response.status_code == status
+    if status == 200:
+        assert [p["id"] for p in response.json()] == [posts[2].id, posts[0].id]
+
+@pytest.mark.parametrize("post_count", [2, 20])
+def test_batch_reactions_apply_in_one_request(client, db, user_factory, post_count):
+    # -- Set-up --
+    poster = user_factory("poster")
+    reactor = user_factory("reactor")
+    posts = [Post.objects.create(poster=poster, body=f"Post {i}") for i in range(post_count)]
+    posts[0].liked_by.add(reactor)
+    client.force_login(reactor)
+    operations = [{"post_id": post.id, "reaction": "like", "state": True} for post in posts[1:]]
+    operations += [
+        {"post_id": posts[0].id, "reaction": "like", "state": False},
+        {"post_id": posts[0].id, "reaction": "dislike", "state": False},
+        {"post_id": posts[0].id, "reaction": "dislike", "state": True},  # last one for a post and reaction wins
+    ]
+
+    # -- Act --
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(reverse_django_url("batch_reactions"), {"operations": operations},
+                               content_type="application/json")
+
+    # -- Assert --
+    assert response.status_code == 200
+    results = {post["id"]: post for post in response.json()["posts"]}
+    assert results[posts[0].id] == {"id": posts[0].id, "like_count": 0, "dislike_count": 1,
+                                    "liked": False, "disliked": True}
+    assert all(results[post.id]["like_count"] == 1 and results[post.id]["liked"] for post in posts[1:])
+    assert Post.objects.filter(liked_by=reactor).count() == post_count - 1
+    assert len(queries) <= 20 # set-based: the same statements however many posts are in the batch
+
+@pytest.mark.parametrize("payload, status", [
+    ({"operations": []}, 400),
+    ({"operations": [{"post_id": "1", "reaction": "like", "state": True}]}, 400),
+    ({"operations": [{"post_id": 1, "reaction": "love", "state": True}]}, 400),
+    ({"operations": [{"post_id": 1, "reaction": "like", "state": "yes"}]}, 400),
+])
+def test_batch_reactions_reject_invalid_operations(client, db, user_factory, payload, status):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    client.force_login(viewer)
+
+    # -- Act --
+    response = client.post(reverse_django_url("batch_reactions"), payload, content_type="application/json")
+
+    # -- Assert --
+    assert response.status_code == status
+    assert not Post.objects.filter(liked_by=viewer).exists()
+
+def test_batch_reactions_apply_valid_operations_and_report_the_rest(client, db, user_factory):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    poster = user_factory("poster")
+    own_post = Post.objects.create(poster=viewer, body="Own post")
+    other_post = Post.objects.create(poster=poster, body="Other post")
+    deleted_post = Post.objects.create(poster=poster, body="Deleted post")
+    deleted_id = deleted_post.id
+    deleted_post.delete()
+    client.force_login(viewer)
+    operations = [{"post_id": other_post.id, "reaction": "like", "state": True},
+                  {"post_id": deleted_id, "reaction": "like", "state": True},
+                  {"post_id": own_post.id, "reaction": "dislike", "state": True}]
+
+    # -- Act --
+    response = client.post(reverse_django_url("batch_reactions"), {"operations": operations},
+                           content_type="application/json")
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert [post["id"] for post in response.json()["posts"]] == [other_post.id]
+    assert response.json()["errors"] == [
+        {"post_id": deleted_id, "reaction": "like", "error": "Post not found"},
+        {"post_id": own_post.id, "reaction": "dislike", "error": "Users cannot react to their own posts."},
+    ]
+    assert list(Post.objects.filter(liked_by=viewer)) == [other_post]
+    assert not Post.objects.filter(disliked_by=viewer).exists()
+
+def test_search_ranks_and_pages_matching_posts(client, db, user_factory):
+    # -- Set-up --
+    gardener = user_factory("gardener")
+    other = user_factory("other")
+    strong = Post.objects.create(poster=other, body="Tomatoes tomatoes tomatoes in the garden")
+    weak = [Post.objects.create(poster=other, body=f"A long post about many things, tomatoes among them {i}")
+            for i in range(3)]
+    by_username = Post.objects.create(poster=gardener, body="Nothing about vegetables")
+    Post.objects.create(poster=other, body="Unrelated post")
+    client.force_login(other)
+    url = reverse_django_url("search_posts")
+
+    # -- Act --
+    seen, cursor = [], ""
+    while cursor is not None:
+        page = client.get(url, data={"q": "tomato", "cursor": cursor, "batchSize": 2}).json()
+        seen += [post["id"] for post in page["posts"]]
+        cursor = page["next_cursor"]
+    gardener_hits = client.get(url, data={"q": "GARDENER"}).json()["posts"]
+    tomato_ids = sorted([strong.id] + [post.id for post in weak])
+    removed = weak[0].id
+    weak[0].delete()
+    after_delete = client.get(url, data={"q": "tomatoes", "batchSize": 10}).json()["posts"]
+
+    # -- Assert --
+    assert seen[0] == strong.id
+    assert sorted(seen) == tomato_ids
+    assert [post["id"] for post in gardener_hits] == [by_username.id]
+    assert gardener_hits[0].keys() == Post.objects.get(id=by_username.id).serialize().keys()
+    assert removed not in [post["id"] for post in after_delete]
+
+@pytest.mark.parametrize("params", [{"q": ""}, {"q": "?!*"}, {"q": "x", "cursor": "garbage"}, {"q": "x", "batchSize": 0}])
+def test_search_rejects_invalid_queries(client, db, user_factory, params):
+    # -- Set-up --
+    client.force_login(user_factory("viewer"))
+
+    # -- Act --
+    response = client.get(reverse_django_url("search_posts"), data=params)
+
+    # -- Assert --
+    assert response.status_code == 400
+
+def test_compose_indexes_hashtags_and_mentions(client, db, user_factory, post_data):
+    # -- Set-up --
+    poster = user_factory("poster")
+    friend = user_factory("friend.name")
+    client.force_login(poster)
+    bodies = ["Learning #Python with @friend.name.", "More #python and #django", "No tags, email a@b.com"]
+
+    # -- Act --
+    for body in bodies:
+        client.post(reverse_django_url("compose"), post_data(poster, body), content_type="application/json")
+    with CaptureQueriesContext(connection) as queries:
+        first_page = client.get(reverse_django_url("get_tag_posts", args=["PYTHON"]), data={"cursor": "", "batchSize": 1})
+    second_page = client.get(reverse_django_url("get_tag_posts", args=["python"]),
+                             data={"cursor": first_page.json()["next_cursor"], "batchSize": 1})
+    mentions = client.get(reverse_django_url("get_mention_posts", args=["friend.name"]))
+    trending = client.get(reverse_django_url("get_trending_tags"))
+
+    # -- Assert --
+    assert [post["body"] for post in first_page.json()["posts"]] == [bodies[1]]
+    assert [post["body"] for post in second_page.json()["posts"]] == [bodies[0]]
+    assert not any("LIKE" in q["sql"] for q in queries) # read off the side table, post bodies never scanned
+    assert [post["body"] for post in mentions.json()] == [bodies[0]]
+    assert trending.json() == {"tags": [{"name": "python", "count": 2}, {"name": "django", "count": 1}]}
+
+    Post.objects.get(body=bodies[1]).delete()
+    assert client.get(reverse_django_url("get_trending_tags")).json()["tags"] == [{"name": "python", "count": 1}]
+
+def test_compose_skips_hashtags_longer_than_the_name_column(client, db, user_factory, post_data):
+    # -- Set-up --
+    poster = user_factory("poster")
+    client.force_login(poster)
+    longest, too_long = "a" * 64, "b" * 65
+
+    # -- Act --
+    response = client.post(reverse_django_url("compose"), post_data(poster, f"#{longest} #{too_long}"),
+                           content_type="application/json")
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert list(Hashtag.objects.values_list("name", flat=True)) == [longest]  # not a truncated "#bbb..."
+
+def test_sqlite_connections_apply_configured_pragmas(db, settings):
+    # -- Act --
+    with connection.cursor() as cursor:
+        values = {name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                  for name in ["busy_timeout", "synchronous", "cache_size"]}
+
+    # -- Assert --
+    assert values == {"busy_timeout": settings.SQLITE_PRAGMAS["busy_timeout"],
+                      "synchronous": 1,  # NORMAL
+                      "cache_size": settings.SQLITE_PRAGMAS["cache_size"]}
+    assert connection.transaction_mode == "IMMEDIATE"
+
+@pytest.mark.parametrize("failures, error, expected_calls, raises", [
+    (2, "database is locked", 3, False),
+    (5, "database is locked", 4, True),   # gives up after NETWORK_WRITE_RETRIES
+    (1, "no such table: foo", 1, True),   # only lock errors are retried
+])
+def test_write_views_retry_lock_errors(rf, settings, failures, error, expected_calls, raises):
+    # -- Set-up --
+    settings.NETWORK_WRITE_RETRIES = 3
+    settings.NETWORK_WRITE_RETRY_BACKOFF_MS = 0
+    calls = []
+
+    @retry_on_lock
+    def view(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            raise OperationalError(error)
+        return "ok"
+
+    # -- Act / Assert --
+    if raises:
+        with pytest.raises(OperationalError):
+            view(rf.post("/"))
+    else:
+        assert view(rf.post("/")) == "ok"
+    assert len(calls) == expected_calls
+
+@pytest.fixture
+def buffered_reactions(settings, monkeypatch):
+    # write-behind mode with the background flusher held off, so tests flush explicitly
+    settings.NETWORK_REACTION_BUFFER_ENABLED = True
+    monkeypatch.setattr(reactions.flusher, "wake", lambda now=False: None)
+    yield
+    reaction_buffer.buffer.clear()
+
+def test_buffered_reactions_are_read_back_before_and_after_flush(client, db, user_factory, buffered_reactions,
+                                                                 django_capture_on_commit_callbacks):
+    # -- Set-up --
+    poster = user_factory("poster")
+    reactor = user_factory("reactor")
+    other = user_factory("other")
+    post = Post.objects.create(poster=poster, body="Hot post")
+    post.disliked_by.add(reactor)
+    client.force_login(reactor)
+    feed_url = reverse_django_url("get_posts")
+    feed_params = {"filter": "all-posts", "offset": 0, "batchSize": 5}
+    client.get(feed_url, data=feed_params) # warm the feed cache
+
+    # -- Act --
+    for _ in range(3):
+        toggled = client.post(reverse_django_url("toggle_like_status", args=[post.id]))
+    batched = client.post(reverse_django_url("batch_reactions"),
+                          {"operations": [{"post_id": post.id, "reaction": "dislike", "state": False}]},
+                          content_type="application/json")
+    client.force_login(other)
+    client.post(reverse_django_url("toggle_like_status", args=[post.id]))
+    buffered_feed = client.get(feed_url, data=feed_params).json()
+    post.refresh_from_db()
+    stored_before_flush = (post.like_count, post.dislike_count, post.liked_by.count())
+    with django_capture_on_commit_callbacks(execute=True):
+        flushed = reactions.flush_reactions()
+    post.refresh_from_db()
+    flushed_feed = client.get(feed_url, data=feed_params).json()
+
+    # -- Assert --
+    assert toggled.json()["post"] == {"id": post.id, "like_count": 1, "dislike_count": 1,
+                                      "liked": True, "disliked": True}
+    assert batched.json()["posts"] == [{"id": post.id, "like_count": 1, "dislike_count": 0,
+                                        "liked": True, "disliked": False}]
+    assert stored_before_flush == (0, 1, 0)
+    assert (buffered_feed[0]["like_count"], buffered_feed[0]["dislike_count"]) == (2, 0)
+    assert flushed == 3 # one entry per (user, post, reaction)
+    assert (post.like_count, post.dislike_count) == (2, 0)
+    assert set(post.liked_by.values_list("username", flat=True)) == {"reactor", "other"}
+    assert not post.disliked_by.exists()
+    assert flushed_feed == buffered_feed
+    assert len(reaction_buffer.buffer) == 0
+
+@pytest.mark.parametrize("reactor_count", [5, 50])
+def test_buffered_reactions_flush_in_constant_queries(db, user_factory, buffered_reactions, reactor_count):
+    # -- Set-up --
+    poster = user_factory("poster")
+    posts = [Post.objects.create(poster=poster, body=f"Post {i}") for i in range(3)]
+    reactors = User.objects.bulk_create([User(username=f"reactor{i}") for i in range(reactor_count)])
+    for reactor in reactors:
+        reactions.record_reactions(reactor, {(post.id, "like"): True for post in posts})
+
+    # -- Act --
+    with CaptureQueriesContext(connection) as queries:
+        reactions.flush_reactions()
+
+    # -- Assert --
+    assert len(queries) <= 10
+    assert list(Post.objects.filter(id__in=[p.id for p in posts]).values_list("like_count", flat=True)) == [reactor_count] * 3
+
+def test_reaction_buffer_counts_in_flight_batches_until_settled():
+    # -- Set-up --
+    buffer = reaction_buffer.ReactionBuffer()
+    post = {"id": 7, "like_count": 3, "dislike_count": 0, "liked": False, "disliked": False}
+    buffer.record(1, 7, "like", True, False)
+
+    # -- Act / Assert --
+    batch = buffer.drain()  # flushing: not in the database yet
+    assert buffer.adjust([post], viewer_id=1)[0]["like_count"] == 4
+    assert buffer.adjust([post], viewer_id=1)[0]["liked"] is True
+
+    buffer.record(1, 7, "like", False, False)  # unliked mid-flush, read against the pre-flush database
+    assert buffer.adjust([post], viewer_id=1)[0]["like_count"] == 3
+    assert buffer.adjust([post], viewer_id=1)[0]["liked"] is False
+
+    buffer.requeue(batch)  # the flush failed: the unlike now cancels the like that never got written
+    assert buffer.drain() == {(1, 7, "like"): (False, False)}
+    buffer.settle(batch)
+    post["like_count"] = 4  # a later flush that committed the like
+    buffer.record(1, 7, "like", True, True)
+    settled = buffer.drain()
+    buffer.settle(settled)
+    assert buffer.adjust([post], viewer_id=1)[0] == post
+
+def test_buffered_reactions_on_deleted_posts_are_dropped(transactional_db, user_factory, buffered_reactions):
+    # -- Set-up --
+    poster, reactor = user_factory("poster"), user_factory("reactor")
+    kept, deleted = [Post.objects.create(poster=poster, body=f"Post {i}") for i in range(2)]
+    reactions.record_reactions(reactor, {(kept.id, "like"): True, (deleted.id, "like"): True})
+    deleted.delete()
+
+    # -- Act --
+    flushed = reactions.flush_reactions()
+    flushed_again = reactions.flush_reactions()
+
+    # -- Assert --
+    kept.refresh_from_db()
+    assert (flushed, flushed_again) == (1, 0)
+    assert kept.like_count == 1
+    assert len(reaction_buffer.buffer) == 0
+    assert reaction_buffer.buffer.adjust([{"id": kept.id, "like_count": 1, "dislike_count": 0}])[0]["like_count"] == 1
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_json_responses_match_stdlib_encoding(monkeypatch, use_orjson):
+    # -- Set-up --
+    data = {"posts": [{"id": 1, "body": "Café ☕ \"quoted\"", "like_count": 0}], "next_cursor": None}
+    if not use_orjson:
+        monkeypatch.setattr(encoding, "orjson", None)
+
+    # -- Act --
+    response = encoding.JsonResponse(data)
+
+    # -- Assert --
+    assert response["Content-Type"] == "application/json"
+    assert json.loads(response.content) == data
+    if not use_orjson: # the fallback is byte-for-byte what django.http.JsonResponse produced
+        assert response.content == DjangoJsonResponse(data).content
+    with pytest.raises(TypeError):
+        encoding.JsonResponse([1, 2])
+
+@pytest.mark.parametrize("post_count", [0, 7])
+def test_export_streams_every_post_in_chunks(client, db, settings, user_factory, post_count):
+    # -- Set-up --
+    settings.NETWORK_EXPORT_CHUNK_SIZE = 3
+    viewer = user_factory("viewer")
+    other = user_factory("other")
+    for i in range(post_count):
+        Post.objects.create(poster=viewer, body=f"Post {i}")
+    Post.objects.create(poster=other, body="Not exported")
+    client.force_login(viewer)
+
+    # -- Act --
+    response = client.get(reverse_django_url("export_posts"))
+    chunks = list(response.streaming_content)
+
+    # -- Assert --
+    assert response.streaming
+    assert len(chunks) == -(-post_count // 3) + 1 # a chunk per 3 posts, then the closing bracket
+    expected = [post.serialize() for post in Post.objects.filter(poster=viewer).order_by('-timestamp', '-id')]
+    assert json.loads(b"".join(chunks)) == expected
+
+@pytest.fixture
+def cached_sessions(settings): # as with a shared cache backend; the tests' local-memory cache isn't one
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    settings.NETWORK_AUTH_CACHE_USERS = True
+
+def test_session_and_user_resolved_from_cache(client, db, user_factory, cached_sessions):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    Post.objects.create(poster=viewer, body="Test post body")
+    client.force_login(viewer)
+    url = reverse_django_url("get_posts")
+    client.get(url, data={"filter": "my-posts"})
+
+    # -- Act --
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, data={"filter": "my-posts"})
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert not any("django_session" in q["sql"] for q in queries)
+    assert not any(q["sql"].startswith('SELECT "network_user"."id", "network_user"."password"') for q in queries)
+
+def test_cached_user_dropped_on_password_change_and_logout(client, db, user_factory, cached_sessions):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    url = reverse_django_url("get_posts")
+    params = {"filter": "my-posts"}
+    client.force_login(viewer)
+    client.get(url, data=params)
+
+    # -- Act --
+    viewer.set_password("a-new-password")
+    viewer.save()
+    after_password_change = client.get(url, data=params)
+    client.force_login(viewer)
+    client.get(url, data=params)
+    client.get(reverse_django_url("logout"))
+    after_logout = client.get(url, data=params)
+
+    # -- Assert --
+    assert after_password_change.status_code == 302 # the session's password hash no longer matches
+    assert after_logout.status_code == 302
+    assert cache.get(user_key(viewer.id)) is None
+
+def test_users_not_cached_in_a_per_process_cache(client, db, user_factory):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    client.force_login(viewer)
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_posts"), data={"filter": "my-posts"})
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert cache.get(user_key(viewer.id)) is None
+
+@pytest.mark.parametrize("username", ["viewer", "nobody"])
+def test_failed_login_checks_the_password_once(client, db, user_factory, monkeypatch, username):
+    # -- Set-up --
+    user_factory("viewer")
+    checks = []
+    monkeypatch.setattr(User, "check_password", lambda self, raw: checks.append(raw) and False)
+    set_password = User.set_password
+    monkeypatch.setattr(User, "set_password", lambda self, raw: checks.append(raw) or set_password(self, raw))
+
+    # -- Act --
+    response = client.post(reverse_django_url("login"), **prepare_json({"username": username, "password": "guess"}))
+
+    # -- Assert --
+    assert response.status_code == 400
+    assert len(checks) == 1  # for an unknown username, the dummy hash run against timing attacks
+
+@pytest.fixture
+def built_assets(settings, tmp_path):
+    settings.NETWORK_ASSET_ROOT = str(tmp_path)
+    manifest = build_assets()
+    yield manifest
+    load_manifest.cache_clear()
+
+def test_layout_links_fingerprinted_assets(client, db, user_factory, built_assets):
+    # -- Set-up --
+    client.force_login(user_factory("viewer"))
+
+    # -- Act --
+    page = client.get(reverse_django_url("index")).content.decode()
+
+    # -- Assert --
+    for name in ["network/index.js", "network/styles.css"]:
+        assert f'"/assets/{built_assets[name]}"' in page
+        assert f"/static/{name}" not in page
+
+BEST_ENCODING = "br" if assets.brotli else "gzip" # brotli variants are only built with the package installed
+
+@pytest.mark.parametrize("accept_encoding, expected_encoding", [
+    ("gzip, deflate, br", BEST_ENCODING),
+    ("br;q=1.0, gzip;q=0.5", BEST_ENCODING),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0, deflate", None),
+    ("", None),
+])
+def test_assets_served_precompressed_with_far_future_caching(client, db, settings, built_assets,
+                                                             accept_encoding, expected_encoding):
+    # -- Set-up --
+    hashed = built_assets["network/index.js"]
+    with open(f"{settings.NETWORK_ASSET_ROOT}/{hashed}", "rb") as f:
+        minified = f.read()
+
+    # -- Act --
+    response = client.get(reverse_django_url("serve_asset", args=[hashed]), HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert "javascript" in response["Content-Type"]
+    assert response.get("Content-Encoding") == expected_encoding
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert response["Vary"] == "Accept-Encoding"
+    decompress = {"gzip": gzip.decompress, "br": lambda content: assets.brotli.decompress(content)}
+    body = decompress[expected_encoding](response.content) if expected_encoding else response.content
+    assert body == minified
+    assert len(minified) < len(open(finders.find("network/index.js"), "rb").read())
+
+@pytest.mark.parametrize("name", ["network/index.js", "manifest.json", "../settings.py", "network/index.000000000000.js"])
+def test_only_built_assets_are_served(client, db, built_assets, name):
+    # -- Act --
+    response = client.get(f"/assets/{name}")
+
+    # -- Assert --
+    assert response.status_code == 404
+
+def test_write_burst_is_throttled_before_the_view_runs(client, db, settings, user_factory, post_data):
+    # -- Set-up --
+    settings.NETWORK_THROTTLE_RATES = {"write": (3, 60)}
+    poster = user_factory("poster")
+    client.force_login(poster)
+    url = reverse_django_url("compose")
+
+    # -- Act --
+    responses = [client.post(url, **prepare_json(post_data(poster))) for _ in range(5)]
+
+    # -- Assert --
+    assert [response.status_code for response in responses] == [200, 200, 200, 429, 429]
+    assert responses[-1].json() == {"error": "Too many requests"}
+    assert 1 <= int(responses[-1]["Retry-After"]) <= 20  # one token refills every 20 seconds
+    assert Post.objects.count() == 3
+    assert client.get(reverse_django_url("get_posts"), {"filter": "all-posts"}).status_code == 200  # reads pass
+
+def test_write_buckets_are_per_user_and_per_ip(client, db, settings, user_factory, post_data):
+    # -- Set-up --
+    settings.NETWORK_THROTTLE_RATES = {"write": (2, 60)}
+    flooder, other, roaming = user_factory("flooder"), user_factory("other"), user_factory("roaming")
+    url = reverse_django_url("compose")
+
+    def post(user, ip):
+        client.force_login(user)
+        return client.post(url, REMOTE_ADDR=ip, **prepare_json(post_data(user))).status_code
+
+    # -- Act --
+    flood = [post(flooder, "10.0.0.1") for _ in range(3)]
+    same_user_new_ip = post(flooder, "10.0.0.2")
+    other_user_same_ip = post(other, "10.0.0.1")
+    other_user_other_ip = post(other, "10.0.0.3")
+    roaming_user = [post(roaming, ip) for ip in ["10.0.0.4", "10.0.0.5", "10.0.0.6"]]
+
+    # -- Assert --
+    assert flood == [200, 200, 429]
+    assert same_user_new_ip == 429      # the user's own bucket is empty
+    assert other_user_same_ip == 429    # so is the address's
+    assert other_user_other_ip == 200
+    assert roaming_user == [200, 200, 429]
+
+def test_login_attempts_throttled_per_username_before_authenticating(client, db, settings, user_factory,
+                                                                    monkeypatch):
+    # -- Set-up --
+    settings.NETWORK_THROTTLE_RATES = {"auth": (2, 60)}
+    user_factory("target")
+    url = reverse_django_url("login")
+    attempts = []
+    authenticate = views.authenticate
+    monkeypatch.setattr("network.views.authenticate",
+                        lambda request, **credentials: attempts.append(1) or authenticate(request, **credentials))
+
+    def login(ip, password="guess"):
+        return client.post(url, REMOTE_ADDR=ip, **prepare_json({"username": "target", "password": password}))
+
+    # -- Act --
+    responses = [login(f"10.0.1.{i}") for i in range(3)]  # a new address in the same network for every guess
+    owner = login("10.0.2.1", password="password123")
+
+    # -- Assert --
+    assert [response.status_code for response in responses] == [400, 400, 429]
+    assert len(attempts) == 3
+    assert "Retry-After" in responses[-1]
+    assert owner.status_code == 200  # the guesses don't lock the owner out from another network
+
+def test_throttling_disabled(client, db, settings, user_factory, post_data):
+    # -- Set-up --
+    settings.NETWORK_THROTTLE_RATES = {"write": (1, 60)}
+    settings.NETWORK_THROTTLE_ENABLED = False
+    poster = user_factory("poster")
+    client.force_login(poster)
+
+    # -- Act --
+    statuses = {client.post(reverse_django_url("compose"), **prepare_json(post_data(poster))).status_code
+                for _ in range(3)}
+
+    # -- Assert --
+    assert statuses == {200}
+
+def test_buckets_refill_and_fall_back_to_memory_without_cache(settings, monkeypatch):
+    # -- Set-up --
+    settings.NETWORK_THROTTLE_RATES = {"write": (2, 10)}
+    settings.NETWORK_THROTTLE_CACHE = "missing"  # not in CACHES, so every cache call raises
+    monkeypatch.setattr(throttling, "store", BucketStore())
+
+    # -- Act --
+    waits = [throttling.take("write", ["ip:1"], now=100) for _ in range(3)]
+    after_refill = throttling.take("write", ["ip:1"], now=105)
+    drained = throttling.take("write", ["ip:1"], now=105)
+
+    # -- Assert --
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(5)  # refills 0.2 tokens per second
+    assert after_refill == 0
+    assert drained == pytest.approx(5)
+
+@pytest.fixture
+def follow_network(user_factory): # viewer follows a and b; a follows c and d, b follows c and the viewer
+    users = {name: user_factory(name) for name in ["viewer", "a", "b", "c", "d"]}
+    for follower, followees in {"viewer": "ab", "a": "cd", "b": "c", "c": "a", "d": ""}.items():
+        users[follower].following.add(*[users[name] for name in followees])
+    users["b"].following.add(users["viewer"])
+    return users
+
+@pytest.mark.parametrize("graph_enabled", [True, False])
+def test_follow_suggestions_rank_friends_of_friends(client, db, settings, follow_network, graph_enabled):
+    # -- Set-up --
+    settings.NETWORK_FOLLOW_GRAPH_ENABLED = graph_enabled
+    client.force_login(follow_network["viewer"])
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_follow_suggestions"))
+    limited = client.get(reverse_django_url("get_follow_suggestions"), {"limit": 1})
+
+    # -- Assert --
+    assert response.status_code == 200
+    assert response.json()["suggestions"] == [
+        {"user_id": follow_network["c"].id, "username": "c", "mutual_count": 2},
+        {"user_id": follow_network["d"].id, "username": "d", "mutual_count": 1},
+    ]
+    assert [s["username"] for s in limited.json()["suggestions"]] == ["c"]
+    assert follow_graph.graph.loaded() is graph_enabled
+
+@pytest.mark.parametrize("limit", ["0", "51", "many"])
+def test_follow_suggestions_reject_bad_limits(client, db, user_factory, limit):
+    # -- Set-up --
+    client.force_login(user_factory("viewer"))
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_follow_suggestions"), {"limit": limit})
+
+    # -- Assert --
+    assert response.status_code == 400
+
+def test_profile_mutual_count_and_suggestions_follow_toggles(client, db, follow_network,
+                                                             django_capture_on_commit_callbacks):
+    # -- Set-up --
+    viewer, c, d = follow_network["viewer"], follow_network["c"], follow_network["d"]
+    client.force_login(viewer)
+    profile_url = reverse_django_url("get_profile", args=[c.id])
+    before = client.get(profile_url).json()
+
+    # -- Act --
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse_django_url("toggle_follow_status", args=[d.id]))  # d is followed by a
+    with django_capture_on_commit_callbacks(execute=True):
+        d.following.add(c)
+    after = client.get(profile_url).json()
+    suggestions = client.get(reverse_django_url("get_follow_suggestions")).json()["suggestions"]
+
+    # -- Assert --
+    assert before["mutual_count"] == 2       # a and b follow c
+    assert after["mutual_count"] == 3        # and now d, whom the viewer follows since
+    assert follow_graph.graph.loaded()       # answered from the snapshot, updated in place
+    assert suggestions == [{"user_id": c.id, "username": "c", "mutual_count": 3}]
+
+def test_relationships_report_follow_state_for_many_users_in_one_query(client, db, user_factory,
+                                                                      cached_sessions):
+    # -- Set-up --
+    viewer = user_factory("viewer")
+    others = [user_factory(f"user{i}") for i in range(60)]
+    viewer.following.add(*others[:20])               # user0-19: followed
+    for other in others[10:30]:                      # user10-29: following the viewer, 10-19 mutually
+        other.following.add(viewer)
+    others[40].following.add(others[41])             # unrelated to the viewer
+    client.force_login(viewer)
+    url = reverse_django_url("get_relationships")
+    client.get(url, {"ids": others[0].id}) # caches the logged-in user
+
+    def relationships(users):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"ids": ",".join(str(user.id) for user in users)})
+        return response, len(queries)
+
+    # -- Act --
+    few, few_queries = relationships(others[:2])
+    many, many_queries = relationships(others[::-1] + [viewer])
+
+    # -- Assert --
+    assert few.status_code == many.status_code == 200
+    assert few_queries == many_queries == 1
+    states = {item["user_id"]: item for item in many.json()["relationships"]}
+    assert [item["user_id"] for item in many.json()["relationships"]] == [user.id for user in others[::-1] + [viewer]]
+    for i, other in enumerate(others):
+        following, followed_by = i < 20, 10 <= i < 30
+        assert states[other.id] == {"user_id": other.id, "following": following, "followed_by": followed_by,
+                                    "mutual": following and followed_by}
+    assert states[viewer.id]["mutual"] is False
+
+@pytest.mark.parametrize("ids", ["", "1,two", ",".join(str(i) for i in range(1, 102))])
+def test_relationships_reject_bad_id_lists(client, db, user_factory, ids):
+    # -- Set-up --
+    client.force_login(user_factory("viewer"))
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_relationships"), {"ids": ids})
+
+    # -- Assert --
+    assert response.status_code == 400
+    assert response.json() == {"error": "Invalid ids parameter"}
+
+def test_relationships_skip_unknown_and_repeated_ids(client, db, user_factory):
+    # -- Set-up --
+    viewer, other = user_factory("viewer"), user_factory("other")
+    client.force_login(viewer)
+
+    # -- Act --
+    response = client.get(reverse_django_url("get_relationships"), {"ids": f"{other.id},999999,{other.id}"})
+
+    # -- Assert --
+    assert [item["user_id"] for item in response.json()["relationships"]] == [other.id]
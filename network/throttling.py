@@ -0,0 +1,127 @@
+import ipaddress
+import json
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .encoding import JsonResponse
+
+# Token-bucket throttling for the expensive endpoints. Each scope in NETWORK_THROTTLE_RATES, e.g.
+# "auth": (10, 60), gives every identity a bucket of 10 requests refilled at 10 per 60 seconds. A request
+# draws from the buckets of all of its identities (the client IP, the logged-in user, and for logins the
+# username being tried from the client's network) and is answered 429 with Retry-After, before the view
+# runs, if any of them is empty.
+# Buckets live in the NETWORK_THROTTLE_CACHE cache, or in process memory while that cache is unavailable.
+
+def enabled():
+    return getattr(settings, "NETWORK_THROTTLE_ENABLED", True)
+
+def rate(scope):
+    return getattr(settings, "NETWORK_THROTTLE_RATES", {}).get(scope)
+
+def client_ip(request):
+    if getattr(settings, "NETWORK_THROTTLE_TRUST_X_FORWARDED_FOR", False):
+        forwarded = request.headers.get("X-Forwarded-For", "")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+def client_network(request):
+    # the /24 (IPv4) or /64 (IPv6) the client address is in
+    ip = client_ip(request)
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    return str(ipaddress.ip_network(f"{address}/{24 if address.version == 4 else 64}", strict=False))
+
+
+class BucketStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._memory = {}
+
+    def get_many(self, keys):
+        try:
+            return caches[getattr(settings, "NETWORK_THROTTLE_CACHE", "default")].get_many(keys)
+        except Exception:  # cache backend down: fall back to this process's buckets
+            with self._lock:
+                return {key: self._memory[key] for key in keys if key in self._memory}
+
+    def set_many(self, buckets, timeout):
+        try:
+            caches[getattr(settings, "NETWORK_THROTTLE_CACHE", "default")].set_many(buckets, timeout)
+        except Exception:
+            with self._lock:
+                self._memory.update(buckets)
+
+
+store = BucketStore()
+# striped locks so that concurrent requests on the same buckets don't both spend their last token in this
+# process, without serializing every request's cache round-trips behind one lock
+_take_locks = [threading.Lock() for _ in range(64)]
+
+def bucket_locks(keys):
+    # in ascending stripe order, so two requests sharing stripes can't deadlock
+    return [_take_locks[index] for index in sorted({hash(key) % len(_take_locks) for key in keys})]
+
+def take(scope, identities, now=None):
+    # draw one token from every identity's bucket; returns 0 on success, else the seconds until all have one.
+    # Not atomic across processes: concurrent requests can each see the same last token, so a shared cache
+    # enforces the rate approximately.
+    capacity, period = rate(scope)
+    refill = capacity / period  # tokens per second
+    now = time.time() if now is None else now
+    keys = [f"throttle:{scope}:{identity}" for identity in identities]
+    locks = bucket_locks(keys)
+    for lock in locks:
+        lock.acquire()
+    try:
+        stored = store.get_many(keys)
+        buckets = {}
+        for key in keys:
+            tokens, updated = stored.get(key, (capacity, now))
+            buckets[key] = min(capacity, tokens + (now - updated) * refill)
+        short = [tokens for tokens in buckets.values() if tokens < 1]
+        if short:
+            return (1 - min(short)) / refill
+        store.set_many({key: (tokens - 1, now) for key, tokens in buckets.items()}, math.ceil(period))
+        return 0
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+
+def login_username(request):
+    # the username a login is for, from the client's network: guesses at an account from one network share a
+    # bucket, and can't lock its owner out from anywhere else
+    try:
+        username = json.loads(request.body).get("username")
+    except (ValueError, AttributeError):
+        return None
+    return f"{username}@{client_network(request)}" if username else None
+
+def throttle(scope, identity=None, methods=("POST",)):
+    # `identity(request)` adds a scope-specific identity, e.g. the username a login is for
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not enabled() or request.method not in methods or rate(scope) is None:
+                return view(request, *args, **kwargs)
+            identities = [f"ip:{client_ip(request)}"]
+            if request.user.is_authenticated:
+                identities.append(f"user:{request.user.id}")
+            extra = identity(request) if identity else None
+            if extra:
+                identities.append(f"{scope}:{extra}")
+            wait = take(scope, identities)
+            if wait:
+                response = JsonResponse({"error": "Too many requests"}, status=429)
+                response["Retry-After"] = str(math.ceil(wait))
+                return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
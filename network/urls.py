@@ -1,13 +1,14 @@
 
 from django.urls import path
 
-from . import views
+from . import assets, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
+    path("assets/<path:name>", assets.serve_asset, name="serve_asset"),
     # API routes
     path("new-post", views.compose, name="compose"),
     path("posts-data", views.get_posts, name="get_posts"),
@@ -16,4 +17,14 @@ urlpatterns = [
     path("follow-usernames/<str:option>", views.get_follow_usernames, name="get_follow_usernames"),
     path("like-update/<int:post_id>", views.toggle_like_status, name="toggle_like_status"),
     path("dislike-update/<int:post_id>", views.toggle_dislike_status, name="toggle_dislike_status"),
+    path("tag/<str:name>", views.get_tag_posts, name="get_tag_posts"),
+    path("mentions/<str:username>", views.get_mention_posts, name="get_mention_posts"),
+    path("tags/trending", views.get_trending_tags, name="get_trending_tags"),
+    path("follow-suggestions", views.get_follow_suggestions, name="get_follow_suggestions"),
+    path("relationships", views.get_relationships, name="get_relationships"),
+    path("posts-export", views.export_posts, name="export_posts"),
+    path("search", views.search_posts, name="search_posts"),
+    path("reactions", views.batch_reactions, name="batch_reactions"),
+    path("metrics-data", views.get_metrics, name="get_metrics"),
+    path("events", views.stream_events, name="stream_events"),
 ]
\ No newline at end of file
@@ -1,43 +1,134 @@
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 
+import base64
+import hashlib
 import json
-
-from .models import User, Post
+from datetime import datetime
+from functools import wraps
+
+from . import events, follow_graph, metrics, reaction_buffer
+from .db import retry_on_lock
+from .encoding import JsonResponse, StreamingJsonResponse
+from .feed_cache import (afeed_generation, afollow_generation, cached_feed_page, etags_enabled, feed_generation,
+                         follow_generation)
+from .models import User, Post, PostHashtag, Mention, serialize_rows
+from .reactions import record_reactions
+from .search import search_page
+from .tags import index_post, trending_hashtags
+from .throttling import login_username, throttle
+from .timeline import backfill_timeline, fan_out_post, following_keys, remove_from_timeline, seek
 
 def build_profile_dict(request,user_id):
-    offset, batch_size = parse_pagination_params(request)
+    page_params = parse_page_params(request)
 
     target_user = User.objects.get(id=user_id)
-    serialized_user = target_user.serialize()
-    follower_ids = serialized_user["follower_ids"]
-    following_ids = serialized_user["following_ids"]
-    follower_usernames = serialized_user["follower_usernames"]
-    following_usernames = serialized_user["following_usernames"]
     
-    posts = Post.objects.filter(poster = target_user).order_by('-timestamp')[offset:offset+batch_size]
-    serialized_posts = [post.serialize() for post in posts]
+    post_page = paginate_posts(Post.objects.filter(poster = target_user), page_params)
+    viewer_follows = request.user.following.filter(id=target_user.id).exists()
+    mutual_count = follow_graph.mutual_count(request.user.id, target_user.id)
+    return profile_dict(request, target_user, post_page, viewer_follows, mutual_count)
+
+def profile_dict(request, target_user, post_page, viewer_follows, mutual_count): # shared by the sync and async profile views
+    serialized_posts = post_page["posts"] if isinstance(post_page, dict) else post_page
     profile = {"user_id": target_user.id,
                 "username": target_user.username,
-                "follower_count": target_user.followers.count(),
-                "following_count": target_user.following.count(),
+                "follower_count": target_user.follower_count,
+                "following_count": target_user.following_count,
                 "posts": serialized_posts,
                 "viewer_id": request.user.id,
-                "follower_ids": follower_ids,
-                "following_ids": following_ids,
-                "follower_usernames": follower_usernames,
-                "following_usernames": following_usernames,
+                "viewer_follows": viewer_follows,
+                "mutual_count": mutual_count, # accounts the viewer follows that follow this user
     }
+    if isinstance(post_page, dict):
+        profile["next_cursor"] = post_page["next_cursor"]
     return profile
 
-def parse_pagination_params(request): # utility to parse incoming pagination params and check value range
+def encode_cursor(*key): # opaque token for the sort key of the last item on a page, e.g. a post's (timestamp, id)
+    raw = "|".join(part.isoformat() if isinstance(part, datetime) else str(part) for part in key)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor, *converters): # one converter per key part, e.g. (datetime.fromisoformat, int)
     try:
-        offset = (request.GET.get('offset', 0))
-        batch_size = (request.GET.get('batchSize',5))
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if len(parts) != len(converters):
+            raise ValueError
+        return tuple(convert(part) for convert, part in zip(converters, parts))
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError("Invalid pagination parameters")
+
+def parse_page_params(request): # cursor mode when a 'cursor' param is sent (empty for the first page), else offset mode
+    if 'cursor' not in request.GET:
+        offset, batch_size = parse_pagination_params(request)
+        return {"offset": offset, "batch_size": batch_size}
+    cursor = request.GET.get('cursor')
+    after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+    # offset is irrelevant in cursor mode, so validate batchSize alone
+    _, batch_size = parse_pagination_params(request, allow_offset=False)
+    return {"after": after, "batch_size": batch_size}
+
+def paginate_posts(posts, page_params): # list of posts in offset mode, {"posts", "next_cursor"} in cursor mode
+    if "after" in page_params:
+        return cursor_page(*posts.keyset_page(page_params["after"], page_params["batch_size"]))
+    return posts.serialize_page(page_params["offset"], page_params["batch_size"])
+
+def cursor_page(serialized_posts, last_key): # response shape of a cursor-mode page
+    return {"posts": serialized_posts,
+            "next_cursor": encode_cursor(*last_key) if last_key else None}
+
+def paginate_following(user, page_params): # same shapes as paginate_posts, read from the materialized timeline
+    batch_size = page_params["batch_size"]
+    if "after" in page_params:
+        keys = following_keys(user, batch_size, after=page_params["after"])
+    else:
+        offset = page_params["offset"]
+        keys = following_keys(user, offset+batch_size)[offset:]
+
+    serialized_posts = Post.objects.filter(id__in=[post_id for _, post_id in keys]).serialize_page(0, len(keys))
+    return following_page(keys, serialized_posts, page_params)
+
+def link_keys(links, after=None): # newest-first (timestamp, post_id) keys of a side table, past `after` if given
+    links = links.order_by("-timestamp", "-post_id").values_list("timestamp", "post_id")
+    return links if after is None else seek(links, after, "timestamp", "post_id")
+
+def paginate_links(links, page_params): # same shapes as paginate_posts, keyed off a (timestamp, post) side table
+    batch_size = page_params["batch_size"]
+    if "after" in page_params:
+        keys = list(link_keys(links, page_params["after"])[:batch_size])
+    else:
+        offset = page_params["offset"]
+        keys = list(link_keys(links)[offset:offset+batch_size])
+
+    serialized_posts = Post.objects.filter(id__in=[post_id for _, post_id in keys]).serialize_page(0, len(keys))
+    return following_page(keys, serialized_posts, page_params)
+
+def following_page(keys, serialized_posts, page_params):
+    if "after" in page_params:
+        return cursor_page(serialized_posts, keys[-1] if len(keys) == page_params["batch_size"] else None)
+    return serialized_posts
+
+def parse_ids(request): # ?ids=1,2,3 for fetching specific posts (e.g. those announced by /events) or users
+    try:
+        ids = [int(item_id) for item_id in request.GET.get('ids', '').split(',') if item_id]
+    except ValueError:
+        raise ValueError("Invalid ids parameter")
+    if not ids or len(ids) > 100:
+        raise ValueError("Invalid ids parameter")
+    return ids
+
+def parse_pagination_params(request, allow_offset=True, default_batch_size=5): # utility to parse incoming pagination params and check value range
+    try:
+        offset = (request.GET.get('offset', 0)) if allow_offset else 0
+        batch_size = (request.GET.get('batchSize',default_batch_size))
 
         if offset in [None, "", "None"] or batch_size in [None, "", "None"]:
             raise ValueError
@@ -51,6 +142,23 @@ def parse_pagination_params(request): # utility to parse incoming pagination par
         raise ValueError("Invalid pagination parameters")
     return offset, batch_size
 
+def wants_delta(request): # toggles answer with just the affected object's new state unless ?response=full
+    return request.GET.get('response') != 'full'
+
+def post_delta(request, post_id):
+    delta = (Post.objects.with_viewer_reactions(request.user)
+             .values("id", "like_count", "dislike_count", "liked", "disliked")
+             .get(id=post_id))
+    return reaction_buffer.buffer.adjust([delta], request.user.id)[0]
+
+def user_delta(request, user_id):
+    viewer_follows = User.following.through.objects.filter(from_user=request.user.id, to_user=OuterRef("pk"))
+    delta = (User.objects.annotate(viewer_follows=Exists(viewer_follows))
+             .values("id", "follower_count", "following_count", "viewer_follows")
+             .get(id=user_id))
+    delta["viewer_following_count"] = request.user.following_count # refreshed by the counter signal
+    return delta
+
 def toggle_post_reaction(request,post_id,reaction):
     if request.method == 'POST':
         try:
@@ -60,18 +168,24 @@ def toggle_post_reaction(request,post_id,reaction):
             elif reaction == "dislike":
                 field_to_toggle = target_post.disliked_by
 
-            if target_post.poster == request.user:
+            if target_post.poster_id == request.user.id:
                 return JsonResponse({"error": "Users cannot react to their own posts."}, status=400)
 
-            field_to_toggle.add(request.user)
+            if reaction_buffer.enabled():
+                record_reactions(request.user, {(target_post.id, reaction): True})
+            else:
+                with transaction.atomic(): # the M2M row and the stored counter change together
+                    field_to_toggle.add(request.user)
             user_id = request.user.id
 
+            if wants_delta(request):
+                return JsonResponse({"post": post_delta(request, post_id)}, status=200)
+
             try:
                 offset, batch_size = parse_pagination_params(request)
             except ValueError as e:
                 return JsonResponse({"error": str(e)}, status=400)
-            posts = Post.objects.all().order_by('-timestamp')[offset:offset+batch_size]
-            serialized_posts = [post.serialize() for post in posts]
+            serialized_posts = Post.objects.serialize_page(offset, batch_size)
             profile = build_profile_dict(request, user_id)
 
             return JsonResponse({"profile": profile, "posts":serialized_posts},status=200)
@@ -81,7 +195,74 @@ def toggle_post_reaction(request,post_id,reaction):
     else:
         return HttpResponse("Method Not Allowed", status=405)
 
+REACTION_FIELDS = {"like": "likes", "dislike": "dislikes"} # reaction -> reverse M2M accessor on User
+
+def parse_reaction_operations(request):
+    # {"operations": [{"post_id": 1, "reaction": "like", "state": true}, ...]} -> {(post_id, reaction): state};
+    # a later operation on the same post and reaction replaces an earlier one
+    try:
+        operations = json.loads(request.body)["operations"]
+        parsed = {}
+        for operation in operations:
+            post_id, reaction, state = operation["post_id"], operation["reaction"], operation["state"]
+            if type(post_id) is not int or reaction not in REACTION_FIELDS or type(state) is not bool:
+                raise ValueError
+            parsed[(post_id, reaction)] = state
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid reaction operations")
+    if not parsed or len(parsed) > 100:
+        raise ValueError("Invalid reaction operations")
+    return parsed
+
+def apply_reactions(user, operations):
+    with transaction.atomic(): # one INSERT or DELETE per reaction and state, counters follow via the M2M signal
+        for reaction, accessor in REACTION_FIELDS.items():
+            for state in (True, False):
+                ids = [post_id for (post_id, op_reaction), op_state in operations.items()
+                       if op_reaction == reaction and op_state == state]
+                if ids and state:
+                    getattr(user, accessor).add(*ids)
+                elif ids:
+                    getattr(user, accessor).remove(*ids)
+
 @login_required
+@throttle("write")
+@retry_on_lock
+def batch_reactions(request):
+    if request.method != "POST":
+        return HttpResponse("Method Not Allowed", status=405)
+    try:
+        operations = parse_reaction_operations(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # the batch carries whatever the user clicked lately, so one bad operation only fails itself
+    posters = dict(Post.objects.filter(id__in={post_id for post_id, _ in operations}).values_list("id", "poster_id"))
+    errors = []
+    for post_id, reaction in list(operations):
+        if post_id not in posters:
+            error = "Post not found"
+        elif posters[post_id] == request.user.id:
+            error = "Users cannot react to their own posts."
+        else:
+            continue
+        errors.append({"post_id": post_id, "reaction": reaction, "error": error})
+        del operations[(post_id, reaction)]
+
+    if operations and reaction_buffer.enabled():
+        record_reactions(request.user, operations)
+    elif operations:
+        apply_reactions(request.user, operations)
+
+    post_ids = {post_id for post_id, _ in operations}
+    posts = (Post.objects.with_viewer_reactions(request.user).filter(id__in=post_ids).order_by("id")
+             .values("id", "like_count", "dislike_count", "liked", "disliked"))
+    return JsonResponse({"posts": reaction_buffer.buffer.adjust(list(posts), request.user.id), "errors": errors},
+                        status=200)
+
+@login_required
+@throttle("write")
+@retry_on_lock
 def compose(request):
     if request.method != "POST":
         return JsonResponse({"error": "POST request required."}, status=400)
@@ -103,56 +284,233 @@ def compose(request):
     except User.DoesNotExist:
         return JsonResponse({"error": "User not found."}, status=404)
 
-    post = Post(poster=poster_user, 
-                body=post_body)
-    post.save()
+    with transaction.atomic():
+        post = Post(poster=poster_user, 
+                    body=post_body)
+        post.save()
+        fan_out_post(post)
+        index_post(post)
 
     try:
         offset, batch_size = parse_pagination_params(request)
     except ValueError as e:
         return JsonResponse({"error": str(e)}, status=400)
-    posts = Post.objects.all().order_by('-timestamp')[offset:offset+batch_size]
-    serialized_posts = [post.serialize() for post in posts]
+    serialized_posts = Post.objects.serialize_page(offset, batch_size)
     return JsonResponse(serialized_posts, safe=False)
 
 @login_required
 def get_follow_usernames(request,option):
-    user_id = request.user.id
-    profile = build_profile_dict(request,user_id)
+    try:
+        after, batch_size = parse_follow_page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = list(follow_rows(request.user, option, after, batch_size))
+    return JsonResponse(follow_listing(rows, option, batch_size))
 
+def parse_follow_page_params(request):
+    _, batch_size = parse_pagination_params(request, allow_offset=False, default_batch_size=50)
+    cursor = request.GET.get('cursor')
+    after = decode_cursor(cursor, int)[0] if cursor else None
+    return after, batch_size
+
+def follow_rows(user, option, after, batch_size):
+    # walk the follow rows newest first by their own id, reading only the two columns we ship
+    follows = User.following.through.objects
     if option == 'following':
-        usernames = profile["following_usernames"]
-        ids = profile["following_ids"]
+        follows = follows.filter(from_user=user).values_list('id', 'to_user_id', 'to_user__username')
     else:
-        usernames = profile["follower_usernames"]
-        ids = profile["follower_ids"]
+        follows = follows.filter(to_user=user).values_list('id', 'from_user_id', 'from_user__username')
+    if after is not None:
+        follows = follows.filter(id__lt=after)
+    return follows.order_by('-id')[:batch_size]
+
+def follow_listing(rows, option, batch_size):
+    return {"usernames": [username for _, _, username in rows],
+            "ids": [user_id for _, user_id, _ in rows],
+            "option": option,
+            "next_cursor": encode_cursor(rows[-1][0]) if len(rows) == batch_size else None,
+    }
+
+def event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no" # keep proxies from holding back events
+    return response
+
+@login_required
+def stream_events(request): # Server-Sent Events: new post ids and coalesced reaction counts, see network.events
+    try:
+        watched = events.parse_watched(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return event_stream_response(events.stream(events.start_seq(request), watched))
+
+@login_required
+def search_posts(request): # ranked full-text search, always cursor-paginated: {"posts", "next_cursor"}
+    try:
+        cursor = request.GET.get('cursor')
+        after = decode_cursor(cursor, float, int) if cursor else None
+        _, batch_size = parse_pagination_params(request, allow_offset=False)
+        return JsonResponse(cursor_page(*search_page(request.GET.get('q', ''), batch_size, after)))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+@login_required
+def get_tag_posts(request, name):
+    try:
+        page_params = parse_page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    links = PostHashtag.objects.filter(hashtag__name=name.lower())
+    return JsonResponse(paginate_links(links, page_params), safe=False)
+
+@login_required
+def get_mention_posts(request, username):
+    try:
+        page_params = parse_page_params(request)
+        mentioned_user = User.objects.get(username=username)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except User.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+    return JsonResponse(paginate_links(Mention.objects.filter(user=mentioned_user), page_params), safe=False)
+
+@login_required
+def get_trending_tags(request): # most used hashtags over the last ?hours= (default 24, up to a week)
+    try:
+        hours = int(request.GET.get('hours', 24))
+        limit = int(request.GET.get('limit', 10))
+        if not 1 <= hours <= 168 or not 1 <= limit <= 100:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "Invalid trending parameters"}, status=400)
+    return JsonResponse({"tags": [{"name": name, "count": count} for name, count in trending_hashtags(hours, limit)]})
 
-    return JsonResponse({"usernames": usernames,
-                         "ids": ids,
-                         "option": option
-    })
+@login_required
+def get_follow_suggestions(request): # accounts followed by the viewer's followees, most shared first (?limit=, up to 50)
+    try:
+        limit = int(request.GET.get('limit', 10))
+        if not 1 <= limit <= 50:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "Invalid suggestion parameters"}, status=400)
+    suggested = follow_graph.suggestions(request.user.id, limit)
+    usernames = dict(User.objects.filter(id__in=[user_id for user_id, _ in suggested]).values_list('id', 'username'))
+    return JsonResponse({"suggestions": [
+        {"user_id": user_id, "username": usernames[user_id], "mutual_count": mutual_count}
+        for user_id, mutual_count in suggested if user_id in usernames  # skip accounts deleted since the snapshot
+    ]})
+
+@login_required
+def get_relationships(request): # the viewer's follow state with each of ?ids= (up to 100), in one query
+    try:
+        user_ids = parse_ids(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    follows = User.following.through.objects
+    rows = (User.objects.filter(id__in=user_ids)
+            .annotate(viewer_follows=Exists(follows.filter(from_user=request.user.id, to_user=OuterRef("pk"))),
+                      follows_viewer=Exists(follows.filter(from_user=OuterRef("pk"), to_user=request.user.id)))
+            .values_list("id", "viewer_follows", "follows_viewer"))
+    states = {user_id: (following, followed_by) for user_id, following, followed_by in rows}
+    relationships = []
+    for user_id in dict.fromkeys(user_ids): # in the order asked, without repeats or unknown ids
+        if user_id in states:
+            following, followed_by = states[user_id]
+            relationships.append({"user_id": user_id, "following": following, "followed_by": followed_by,
+                                  "mutual": following and followed_by})
+    return JsonResponse({"relationships": relationships})
 
 @login_required
+def export_posts(request): # every post of the viewer, newest first, streamed rather than built in memory
+    rows = Post.objects.filter(poster=request.user).feed_rows()
+    chunk_size = getattr(settings, "NETWORK_EXPORT_CHUNK_SIZE", 500)
+    response = StreamingJsonResponse(rows.iterator(chunk_size=chunk_size), serialize_rows, chunk_size)
+    response["Content-Disposition"] = f'attachment; filename="{request.user.username}-posts.json"'
+    return response
+
+@login_required
+def get_metrics(request): # staff-only view of the rolling per-view percentiles from RequestMetricsMiddleware
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff access required."}, status=403)
+    return JsonResponse({"enabled": getattr(settings, "NETWORK_METRICS_ENABLED", False),
+                         "views": metrics.snapshot()})
+
+def feed_etag(request, user_id=None):
+    # built from cache-held write generations rather than the data itself, so a matching If-None-Match is
+    # answered with 304 before any query runs; any post, reaction or follow change yields a new tag
+    if not etags_enabled():
+        return None
+    return generations_etag(request, user_id, feed_generation(), follow_generation())
+
+async def afeed_etag(request, user_id=None):
+    if not etags_enabled():
+        return None
+    return generations_etag(request, user_id, await afeed_generation(), await afollow_generation())
+
+def generations_etag(request, user_id, *generations):
+    parts = [*generations, request.user.id, user_id, sorted(request.GET.lists())]
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+def tag_response(request, response, etag):
+    # error responses stay untagged: the generations don't cover what makes them fail (e.g. a 404 for a
+    # user who hasn't signed up yet)
+    if etag and request.method in ("GET", "HEAD") and response.status_code < 400:
+        response.headers.setdefault("ETag", etag)
+    return response
+
+def conditional_feed(view):
+    # answers a matching If-None-Match with 304 before the view runs, like condition(etag_func=feed_etag),
+    # but reading the generations with the async cache API when the view is async
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            etag = await afeed_etag(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag) or await view(request, *args, **kwargs)
+            return tag_response(request, response, etag)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag = feed_etag(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag) or view(request, *args, **kwargs)
+        return tag_response(request, response, etag)
+    return wrapper
+
+@login_required
+@conditional_feed
 def get_posts(request):
     try:
-        offset, batch_size = parse_pagination_params(request)
+        page_params = parse_page_params(request)
     except ValueError as e:
         return JsonResponse({"error": str(e)}, status=400)
     
     if request.GET.get('filter') == 'all-posts':
-        posts = Post.objects.all().order_by('-timestamp')[offset:offset+batch_size]
-        serialized_posts = [post.serialize() for post in posts]
-        return JsonResponse(serialized_posts, safe=False)
+        # identical for every viewer, so served from the generation-versioned cache
+        page = cached_feed_page('all-posts', page_params, lambda: paginate_posts(Post.objects.all(), page_params))
+        return JsonResponse(page, safe=False)
     
     elif request.GET.get('filter') == 'my-posts':
-        posts = Post.objects.filter(poster = request.user).order_by('-timestamp')[offset:offset+batch_size]
-        serialized_posts = [post.serialize() for post in posts]
-        return JsonResponse(serialized_posts, safe=False)
+        posts = Post.objects.filter(poster = request.user)
+
+    elif request.GET.get('filter') == 'following':
+        return JsonResponse(paginate_following(request.user, page_params), safe=False)
+
+    elif request.GET.get('filter') == 'ids':
+        try:
+            ids = parse_ids(request)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse(Post.objects.filter(id__in=ids).serialize_page(0, len(ids)), safe=False)
         
     else:
         return JsonResponse({"error": "Invalid filter parameter"}, status=400)
+
+    return JsonResponse(paginate_posts(posts, page_params), safe=False)
     
 @login_required
+@conditional_feed
 def get_profile(request,user_id):
     try:
         profile = build_profile_dict(request, user_id)
@@ -169,6 +527,7 @@ def index(request):
     
     return render(request, "network/index.html")
     
+@throttle("auth", identity=login_username)
 def login_view(request):
     if request.method == "POST":
         try:
@@ -198,6 +557,7 @@ def logout_view(request):
     logout(request)
     return HttpResponseRedirect(reverse("index"))
 
+@throttle("auth")
 def register(request):
     if request.method == "POST":
         username = request.POST["username"]
@@ -225,23 +585,32 @@ def register(request):
         return render(request, "network/register.html")
 
 @login_required
+@throttle("write")
+@retry_on_lock
 def toggle_follow_status(request, user_id):
     if request.method != 'POST':
         return HttpResponse("Method Not Allowed", status=405)
     try:
         target_user = User.objects.get(id=user_id)
         if request.user.id != target_user.id:
-            if not request.user.following.filter(id=target_user.id).exists():
-                request.user.following.add(target_user)
-            else:
-                request.user.following.remove(target_user)
+            with transaction.atomic():
+                if not request.user.following.filter(id=target_user.id).exists():
+                    request.user.following.add(target_user)
+                    backfill_timeline(request.user, target_user)
+                else:
+                    request.user.following.remove(target_user)
+                    remove_from_timeline(request.user, target_user)
                 
+        if wants_delta(request):
+            return JsonResponse({"user": user_delta(request, user_id)}, status=200)
         return JsonResponse({"profile": build_profile_dict(request, user_id)},status=200)
     
     except User.DoesNotExist:
         return JsonResponse({"error": "User not found"}, status=404)
 
 @login_required   
+@throttle("write")
+@retry_on_lock
 def toggle_like_status(request, post_id):
     if request.method == 'POST':
         try:
@@ -253,6 +622,8 @@ def toggle_like_status(request, post_id):
         return HttpResponse("Method Not Allowed", status=405)
 
 @login_required   
+@throttle("write")
+@retry_on_lock
 def toggle_dislike_status(request, post_id):
     if request.method == 'POST':
         try:
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.settings')
+# serve the read endpoints with their native async views (see NETWORK_ASYNC_READS in the settings)
+os.environ.setdefault('NETWORK_ASYNC_READS', '1')
 
 application = get_asgi_application()
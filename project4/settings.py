@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'network.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +53,10 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'project4.urls'
+# Route the read endpoints to their async twins in network.async_views. project4/asgi.py sets the variable
+# before loading the settings, so each entry point serves its own kind of views (under WSGI the async ones
+# would each run on a one-off event loop).
+NETWORK_ASYNC_READS = os.environ.get("NETWORK_ASYNC_READS", "0") == "1"
 
 TEMPLATES = [
     {
@@ -75,15 +80,116 @@ WSGI_APPLICATION = 'project4.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# Applied to every new SQLite connection. WAL lets readers run alongside the single writer, busy_timeout
+# (ms) makes a writer wait for the lock instead of failing at once, synchronous=NORMAL is durable under WAL
+# apart from the last transactions on power loss, cache_size is in KiB when negative, mmap_size in bytes.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "cache_size": -20000,
+    "mmap_size": 134217728,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # keep connections open between requests instead of reopening (and re-running the pragmas) each time
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ";".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            # take the write lock when a transaction begins, so a read-then-write transaction can't fail
+            # to upgrade its lock halfway through; busy_timeout only applies when acquiring it up front
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
 AUTH_USER_MODEL = "network.User"
 
+# The default local-memory cache is per process: fine for one worker, but anything that has to be dropped
+# everywhere at once (sessions on logout, users on a password change, feed generations) needs a shared
+# backend here when running several.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+LOCAL_CACHE_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",
+                        "django.core.cache.backends.dummy.DummyCache")
+
+# With a shared cache, sessions are read from it and written through to the database, and the logged-in
+# User is cached by network.auth, so an API request doesn't start with a session query and a user query.
+# With a per-process one a logout would only reach one worker's copy, so sessions stay in the database.
+SESSION_ENGINE = ("django.contrib.sessions.backends.db" if CACHES["default"]["BACKEND"] in LOCAL_CACHE_BACKENDS
+                  else "django.contrib.sessions.backends.cached_db")
+# The only backend, so a login checks its password once. Sessions created under ModelBackend before it
+# was introduced have to log in again.
+AUTHENTICATION_BACKENDS = [
+    "network.auth.CachedModelBackend",
+]
+# Cache alias holding resolved users, which are only cached there when it is shared between processes;
+# NETWORK_AUTH_CACHE_USERS = True forces caching them for a single-process deployment
+NETWORK_AUTH_CACHE = "default"
+NETWORK_AUTH_CACHE_USERS = None
+
+# Following feed: accounts with more followers than this are merged into timelines at read time
+# instead of being fanned out to every follower when they post
+NETWORK_FANOUT_THRESHOLD = 1000
+# Number of a followee's most recent posts copied into a timeline when following them
+NETWORK_TIMELINE_BACKFILL_LIMIT = 500
+# Cache alias and lifetime (seconds) for serialized all-posts feed pages. The default local-memory cache is
+# per process; point this at a shared CACHES backend when running several workers.
+NETWORK_FEED_CACHE = "default"
+NETWORK_FEED_CACHE_TIMEOUT = 300
+# None caches feed pages only when NETWORK_FEED_CACHE is shared between processes, as a write orphans the
+# pages of its own worker only and the others would serve stale ones until the timeout; True forces caching
+# on for a single-process deployment.
+NETWORK_FEED_CACHE_PAGES = None
+# Feed and profile responses carry ETags built from generations held in NETWORK_FEED_CACHE. None sends them
+# only when that cache is shared between processes (not local-memory), as otherwise a worker could answer
+# 304 for data another worker has changed; True forces them on for a single-process deployment.
+NETWORK_FEED_ETAGS = None
+# Per-request timing (Server-Timing header and /metrics-data percentiles over the last
+# NETWORK_METRICS_WINDOW requests per view). The middleware removes itself when disabled.
+NETWORK_METRICS_ENABLED = False
+NETWORK_METRICS_WINDOW = 1000
+# /events stream: how long a burst of writes settles before one batch is sent, keep-alive interval, and
+# how long a stream stays open before the browser's EventSource reconnects (bounds held WSGI threads)
+NETWORK_EVENTS_COALESCE_MS = 1000
+NETWORK_EVENTS_HEARTBEAT_SECONDS = 15
+NETWORK_EVENTS_MAX_SECONDS = 300
+# Write views retry a transaction that still finds the database locked after busy_timeout, sleeping
+# NETWORK_WRITE_RETRY_BACKOFF_MS, then twice that, and so on (with jitter) between attempts
+NETWORK_WRITE_RETRIES = 3
+NETWORK_WRITE_RETRY_BACKOFF_MS = 50
+# Write-behind reactions: likes/dislikes are buffered in process and written in one transaction every
+# NETWORK_REACTION_BUFFER_FLUSH_MS or once NETWORK_REACTION_BUFFER_MAX_ITEMS are pending. Reads include the
+# buffered deltas, but a crash loses what hasn't been flushed yet, so it's off by default.
+NETWORK_REACTION_BUFFER_ENABLED = False
+NETWORK_REACTION_BUFFER_FLUSH_MS = 200
+NETWORK_REACTION_BUFFER_MAX_ITEMS = 500
+# Rows fetched and encoded per chunk when /posts-export streams a user's posts
+NETWORK_EXPORT_CHUNK_SIZE = 500
+# Token-bucket limits per scope as (burst, seconds to refill it): every client IP, logged-in user and, for
+# logins, attempted username per client /24 or /64 network gets its own bucket, and a request finding one
+# empty is answered 429 with Retry-After before the view runs. Buckets live in NETWORK_THROTTLE_CACHE (in
+# process memory while it is unreachable), which must be shared between workers for the limits to be
+# global. Only trust X-Forwarded-For behind a proxy that sets it.
+NETWORK_THROTTLE_ENABLED = True
+NETWORK_THROTTLE_RATES = {
+    "auth": (10, 60),    # login and register
+    "write": (120, 60),  # posting, following and reacting
+}
+NETWORK_THROTTLE_CACHE = "default"
+NETWORK_THROTTLE_TRUST_X_FORWARDED_FOR = False
+# Follow suggestions and mutual-follow counts are answered from a per-process in-memory copy of the follow
+# graph, rebuilt from the database once it is NETWORK_FOLLOW_GRAPH_MAX_AGE seconds old (follows made in the
+# same process show up immediately). Disabled, or past NETWORK_FOLLOW_GRAPH_MAX_EDGES, they are queried.
+NETWORK_FOLLOW_GRAPH_ENABLED = True
+NETWORK_FOLLOW_GRAPH_MAX_AGE = 300
+NETWORK_FOLLOW_GRAPH_MAX_EDGES = 5_000_000
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -121,3 +227,8 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+# Page assets built by `manage.py build_assets` (minified, content-hashed, gzip/brotli variants) and served
+# from /assets/ with far-future cache headers; until built, templates link the plain static files
+NETWORK_ASSETS = ["network/index.js", "network/styles.css"]
+NETWORK_ASSET_ROOT = os.path.join(BASE_DIR, 'assets')